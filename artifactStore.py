@@ -0,0 +1,385 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+
+# One workspace per lecture, named by the SHA-256 of its audio (or of its transcript when there is no audio)
+STORE_PATH = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/Lectures"
+DEFAULT_QUOTA_MB = int(os.getenv("ARTIFACT_STORE_QUOTA_MB", "2048"))
+MANIFEST_FILE = "manifest.json"
+# Workspaces used this recently may belong to a running session or pipeline and are never collected
+GC_GRACE_SECONDS = int(os.getenv("ARTIFACT_STORE_GC_GRACE_SECONDS", "3600"))
+
+# Artifact name -> file name inside a workspace
+ARTIFACT_FILES = {
+    "transcript": "transcript.txt",
+    "segments": "transcript_segments.json",
+    "sections_online": "sections_online.json",
+    "sections_offline": "sections_offline.json",
+    "topics_online": "topics_online.json",
+    "topics_offline": "topics_offline.json",
+    "outline_online": "outline_online.json",
+    "outline_offline": "outline_offline.json",
+    "articles": "articles.json",
+    "embeddings_online": "embeddings_online.json",
+    "embeddings_offline": "embeddings_offline.json",
+}
+
+
+def file_hash(path, block_size=1024 * 1024):
+    """
+    Return the SHA-256 of a file's content, used as the lecture's content-addressed name.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# One lock per workspace directory, shared by every store and workspace object of the process
+_workspace_locks = {}
+_workspace_locks_lock = threading.Lock()
+
+
+def _workspace_lock(path):
+    with _workspace_locks_lock:
+        return _workspace_locks.setdefault(os.path.abspath(path), threading.RLock())
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class LectureWorkspace:
+    """
+    Directory holding every artifact of one lecture, with a manifest recording for each artifact
+    the hash of its content, the hashes of the artifacts it was built from, and its parameters.
+
+    An artifact is fresh while its file exists and its inputs and parameters are unchanged;
+    `produce` only rebuilds artifacts that aren't.
+    """
+
+    def __init__(self, store, lecture_id):
+        self.store = store
+        self.id = lecture_id
+        self.dir = os.path.join(store.root, lecture_id)
+        self._lock = store.lock_for(lecture_id)
+        self.manifest = self._read_manifest()
+        if self.manifest is None:
+            now = time.time()
+            self.manifest = {"id": lecture_id, "name": None, "audio": None, "created_at": now,
+                             "last_used": now, "artifacts": {}}
+
+    def _read_manifest(self):
+        manifest_path = os.path.join(self.dir, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+
+    @property
+    def name(self):
+        return self.manifest.get("name") or self.id[:12]
+
+    @property
+    def audio_path(self):
+        audio = self.manifest.get("audio")
+        return os.path.join(self.dir, audio["file"]) if audio else None
+
+    def path(self, name):
+        return os.path.join(self.dir, ARTIFACT_FILES.get(name, name))
+
+    def reload(self):
+        """
+        Pick up the artifacts recorded by other workspace objects of the same lecture.
+        """
+        with self._lock:
+            self.manifest = self._read_manifest() or self.manifest
+
+    def update(self, change):
+        """
+        Apply `change(manifest)` to the manifest on disk and write it back. Stages of one lecture
+        run concurrently with their own workspace objects, so changes are always merged into the
+        latest manifest instead of overwriting it with a stale copy.
+        """
+        with self._lock:
+            manifest = self._read_manifest() or self.manifest
+            change(manifest)
+            os.makedirs(self.dir, exist_ok=True)
+            _write_json_atomic(os.path.join(self.dir, MANIFEST_FILE), manifest)
+            self.manifest = manifest
+
+    def touch(self):
+        """
+        Mark the lecture as used, so that garbage collection evicts it last.
+        """
+        self.update(lambda manifest: manifest.update(last_used=time.time()))
+
+    def artifact_hash(self, name):
+        if name == "audio":
+            audio = self.manifest.get("audio")
+            return audio["sha256"] if audio else None
+        entry = self.manifest["artifacts"].get(name)
+        return entry["sha256"] if entry else None
+
+    def _input_hashes(self, inputs):
+        return {name: self.artifact_hash(name) for name in inputs}
+
+    def is_fresh(self, name, inputs=(), params=None):
+        entry = self.manifest["artifacts"].get(name)
+        return (
+            entry is not None
+            and os.path.exists(self.path(name))
+            and entry["inputs"] == self._input_hashes(inputs)
+            and entry["params"] == (params or {})
+        )
+
+    def record(self, name, inputs=(), params=None):
+        """
+        Register the file of artifact `name` as built from `inputs` with `params`.
+        """
+        with self._lock:
+            self.reload()
+            path = self.path(name)
+            entry = {
+                "file": os.path.basename(path),
+                "sha256": file_hash(path),
+                "bytes": os.path.getsize(path),
+                "inputs": self._input_hashes(inputs),
+                "params": params or {},
+                "created_at": time.time(),
+            }
+
+            def change(manifest):
+                manifest["artifacts"][name] = entry
+                manifest["last_used"] = time.time()
+
+            self.update(change)
+
+    def produce(self, name, build, inputs=(), params=None, force=False, also=()):
+        """
+        Return `(path, reused)` for artifact `name`, calling `build(path)` to write it unless it is
+        fresh. Other artifacts written by `build` (e.g. segments next to a transcript) can be
+        registered by listing them in `also`.
+
+        The lock is not held while building, so other stages of the lecture can run meanwhile.
+        """
+        with self._lock:
+            self.reload()
+            if not force and self.is_fresh(name, inputs, params):
+                self.touch()
+                return self.path(name), True
+        os.makedirs(self.dir, exist_ok=True)
+        build(self.path(name))
+        with self._lock:
+            self.record(name, inputs, params)
+            for other in also:
+                if os.path.exists(self.path(other)):
+                    self.record(other, inputs, params)
+        return self.path(name), False
+
+    def read_json(self, name):
+        with open(self.path(name), "r") as f:
+            return json.load(f)
+
+    def write_json(self, name, data, inputs=(), params=None):
+        with self._lock:
+            os.makedirs(self.dir, exist_ok=True)
+            _write_json_atomic(self.path(name), data)
+            self.record(name, inputs, params)
+
+    def size_bytes(self):
+        return _dir_size(self.dir)
+
+
+class ArtifactStore:
+    """
+    Content-addressed store of lecture workspaces with a size quota.
+
+    Adding the same recording twice returns the same workspace, so everything built for it
+    before is reused. When the store grows beyond its quota, the least recently used
+    workspaces are removed.
+    """
+
+    def __init__(self, root=STORE_PATH, quota_mb=DEFAULT_QUOTA_MB):
+        self.root = root
+        self.quota_bytes = quota_mb * 1024 * 1024
+        os.makedirs(root, exist_ok=True)
+
+    def lock_for(self, lecture_id):
+        return _workspace_lock(os.path.join(self.root, lecture_id))
+
+    def workspace(self, lecture_id):
+        """
+        Return the workspace of a stored lecture, or None if it doesn't exist (any more).
+        """
+        if not lecture_id or not os.path.isdir(os.path.join(self.root, lecture_id)):
+            return None
+        return LectureWorkspace(self, lecture_id)
+
+    def add_audio(self, source_path, name=None, move=False):
+        """
+        Store a recording and return its workspace. Known recordings are not copied again.
+        """
+        lecture_id = file_hash(source_path)
+        workspace = LectureWorkspace(self, lecture_id)
+        with workspace._lock:
+            if workspace.audio_path is None or not os.path.exists(workspace.audio_path):
+                os.makedirs(workspace.dir, exist_ok=True)
+                audio_file = "audio" + os.path.splitext(name or source_path)[1].lower()
+                target = os.path.join(workspace.dir, audio_file)
+                if move:
+                    shutil.move(source_path, target)
+                else:
+                    shutil.copyfile(source_path, target)
+                audio = {"file": audio_file, "sha256": lecture_id, "bytes": os.path.getsize(target)}
+                workspace.update(lambda manifest: manifest.update(audio=audio))
+            elif move:
+                os.remove(source_path)
+            workspace.update(lambda manifest: manifest.update(
+                name=manifest.get("name") or name or os.path.basename(source_path), last_used=time.time()))
+        self.gc(keep={lecture_id})
+        return workspace
+
+    def add_audio_bytes(self, data, name):
+        """
+        Store an uploaded recording (e.g. from Streamlit) and return its workspace.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".upload")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return self.add_audio(tmp_path, name=name, move=True)
+
+    def add_transcript(self, source_path, name=None):
+        """
+        Store an existing transcript (without audio) and return its workspace.
+        """
+        lecture_id = file_hash(source_path)
+        workspace = LectureWorkspace(self, lecture_id)
+        with workspace._lock:
+            if not workspace.is_fresh("transcript"):
+                os.makedirs(workspace.dir, exist_ok=True)
+                shutil.copyfile(source_path, workspace.path("transcript"))
+                workspace.record("transcript")
+            workspace.update(lambda manifest: manifest.update(
+                name=manifest.get("name") or name or os.path.basename(source_path), last_used=time.time()))
+        self.gc(keep={lecture_id})
+        return workspace
+
+    def workspaces(self):
+        """
+        Return all workspaces, least recently used first.
+        """
+        workspaces = [
+            LectureWorkspace(self, name) for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+        ]
+        return sorted(workspaces, key=lambda workspace: workspace.manifest.get("last_used", 0))
+
+    def remove(self, lecture_id):
+        path = os.path.join(self.root, lecture_id)
+        if not os.path.isdir(path):
+            return False
+        with self.lock_for(lecture_id):
+            shutil.rmtree(path)
+        print(f"[ArtifactStore] Removed {lecture_id[:12]}")
+        return True
+
+    def size_bytes(self):
+        return _dir_size(self.root)
+
+    def gc(self, quota_mb=None, keep=(), grace_seconds=GC_GRACE_SECONDS):
+        """
+        Remove leftover uploads and then the least recently used workspaces until the store fits
+        in its quota. Workspaces in `keep` and those used in the last `grace_seconds` (which
+        another session may still be working on) are never removed. Returns the removed lecture ids.
+        """
+        quota_bytes = self.quota_bytes if quota_mb is None else quota_mb * 1024 * 1024
+        for name in os.listdir(self.root):
+            if name.endswith(".upload") and time.time() - os.path.getmtime(os.path.join(self.root, name)) > 3600:
+                os.remove(os.path.join(self.root, name))
+
+        removed = []
+        workspaces = self.workspaces()
+        sizes = {workspace.id: workspace.size_bytes() for workspace in workspaces}
+        total = sum(sizes.values())
+        for workspace in workspaces:
+            if total <= quota_bytes:
+                break
+            if workspace.id in keep or time.time() - workspace.manifest.get("last_used", 0) < grace_seconds:
+                continue
+            self.remove(workspace.id)
+            total -= sizes[workspace.id]
+            removed.append(workspace.id)
+        return removed
+
+    def report(self):
+        return {
+            "lectures": len(self.workspaces()),
+            "used_mb": round(self.size_bytes() / 1024 / 1024, 1),
+            "quota_mb": round(self.quota_bytes / 1024 / 1024, 1),
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store():
+    """
+    Return the process-wide artifact store.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and clean up the lecture artifact store.")
+    parser.add_argument("--root", default=STORE_PATH, help="Directory of the store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List the stored lectures and their artifacts")
+    gc_parser = subparsers.add_parser("gc", help="Remove least recently used lectures above the quota")
+    gc_parser.add_argument("--quota-mb", type=int, default=DEFAULT_QUOTA_MB)
+    gc_parser.add_argument("--grace-seconds", type=int, default=GC_GRACE_SECONDS,
+                           help="Keep lectures used this recently")
+    remove_parser = subparsers.add_parser("remove", help="Remove one lecture")
+    remove_parser.add_argument("lecture_id")
+    args = parser.parse_args()
+
+    store = ArtifactStore(args.root)
+    if args.command == "list":
+        for workspace in store.workspaces():
+            artifacts = ", ".join(sorted(workspace.manifest["artifacts"]))
+            print(f"{workspace.id[:12]}  {workspace.size_bytes() / 1024 / 1024:8.1f} MB  {workspace.name}: {artifacts}")
+        print(store.report())
+    elif args.command == "gc":
+        removed = store.gc(args.quota_mb, grace_seconds=args.grace_seconds)
+        print(f"Removed {len(removed)} lectures: {store.report()}")
+    elif args.command == "remove":
+        store.remove(args.lecture_id)
+
+
+if __name__ == "__main__":
+    main()
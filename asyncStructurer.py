@@ -0,0 +1,188 @@
+import asyncio
+import queue
+import random
+import threading
+import time
+from structuredOutput import parse_section_output
+
+
+class TokenBucket:
+    """
+    Async token bucket: allows `rate` requests per second on average, with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def call_with_retries(call, retries=3, backoff=1.0):
+    """
+    Await `call()`, retrying failures with exponential backoff and jitter.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt) * (1 + random.random())
+            print(f"LLM call failed ({e}), retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+
+def make_runner(agenerate, concurrency=8, requests_per_second=None, retries=3, backoff=1.0):
+    """
+    Wrap `agenerate(request)` with a concurrency limit, optional token-bucket throttling and retries.
+    Must be called inside the event loop that runs the requests.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(requests_per_second) if requests_per_second else None
+
+    async def run_one(request):
+        async def attempt():
+            if bucket:
+                await bucket.acquire()
+            return await agenerate(request)
+
+        async with semaphore:
+            return await call_with_retries(attempt, retries=retries, backoff=backoff)
+
+    return run_one
+
+
+def iter_requests(requests, agenerate, concurrency=8, requests_per_second=None, retries=3, backoff=1.0):
+    """
+    Run `agenerate(request)` for all requests, with at most `concurrency` in flight and, if
+    `requests_per_second` is set, throttled by a token bucket (see `make_runner`).
+
+    The requests run in an event loop on a background thread and `(index, result)` pairs are
+    yielded in request order as soon as they are available. Closing the generator early
+    (e.g. when the user cancels) cancels all requests that are still pending.
+    """
+    requests = list(requests)
+    results = queue.Queue()
+    loop = asyncio.new_event_loop()
+
+    async def run_all():
+        run_one = make_runner(agenerate, concurrency, requests_per_second, retries, backoff)
+
+        async def run_indexed(index, request):
+            try:
+                results.put((index, await run_one(request), None))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                results.put((index, None, e))
+
+        await asyncio.gather(*(run_indexed(index, request) for index, request in enumerate(requests)))
+
+    main_task = loop.create_task(run_all())
+
+    def run_loop():
+        try:
+            loop.run_until_complete(main_task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run_loop, daemon=True)
+    thread.start()
+    try:
+        finished = {}
+        next_index = 0
+        while next_index < len(requests):
+            index, result, error = results.get()
+            if error is not None:
+                raise error
+            finished[index] = result
+            while next_index in finished:
+                yield next_index, finished.pop(next_index)
+                next_index += 1
+    finally:
+        if not main_task.done():
+            loop.call_soon_threadsafe(main_task.cancel)
+        thread.join()
+        loop.close()
+
+
+def iter_structure_chunks(chunks, chains, key_point_chunks, run_chain, single_pass=False, concurrency=8,
+                          requests_per_second=None, retries=3, stats=None):
+    """
+    Generate the sections of all chunks concurrently and yield `(index, section)` in chunk order.
+
+    Every chunk gets a title and a summary, and key points if its index is in `key_point_chunks`.
+    `chains` maps "title", "summary" and "key_points" (plus "combined" and "combined_key_points"
+    for `single_pass`) to whatever the coroutine `run_chain(chain, chunk)` expects.
+    In single-pass mode each chunk is one structured-output call; chunks whose answer can't be
+    parsed fall back to one call per field, counted in `stats["fallbacks"]`.
+    """
+    stats = stats if stats is not None else {}
+    start = time.perf_counter()
+
+    if single_pass:
+        stats.setdefault("fallbacks", 0)
+        runner = {}
+
+        async def run_limited(chain, chunk):
+            # Every call, fallbacks included, takes its own concurrency slot and rate-limit token
+            if "run" not in runner:
+                runner["run"] = make_runner(lambda request: run_chain(*request), concurrency,
+                                            requests_per_second, retries)
+            return await runner["run"]((chain, chunk))
+
+        async def agenerate_section(request):
+            idx, chunk = request
+            with_key_points = idx in key_point_chunks
+            chain = chains["combined_key_points" if with_key_points else "combined"]
+            section = parse_section_output(await run_limited(chain, chunk), with_key_points=with_key_points)
+            if section is not None:
+                return section
+
+            stats["fallbacks"] += 1
+            fields = ["title", "summary"] + (["key_points"] if with_key_points else [])
+            texts = await asyncio.gather(*(run_limited(chains[field], chunk) for field in fields))
+            return dict(zip(fields, texts))
+
+        # The limits apply to the single calls above, not to the sections
+        yield from iter_requests(list(enumerate(chunks)), agenerate_section, concurrency=max(1, len(chunks)),
+                                 retries=0)
+        print(f"Generated {len(chunks)} sections in one pass each in {time.perf_counter() - start:.1f}s "
+              f"({stats['fallbacks']} fell back to per-field calls)")
+        return
+
+    # One request per field, so that the concurrency limit and throttling apply to single calls
+    requests = []
+    for idx, chunk in enumerate(chunks):
+        requests.append((idx, "title", chunk))
+        requests.append((idx, "summary", chunk))
+        if idx in key_point_chunks:
+            requests.append((idx, "key_points", chunk))
+
+    async def agenerate_field(request):
+        _, field, chunk = request
+        return await run_chain(chains[field], chunk)
+
+    section = {}
+    for position, text in iter_requests(requests, agenerate_field, concurrency=concurrency,
+                                        requests_per_second=requests_per_second, retries=retries):
+        idx, field, _ = requests[position]
+        section[field] = text
+        # Requests come back in order, so a chunk is complete when the next request is for another chunk
+        if position + 1 == len(requests) or requests[position + 1][0] != idx:
+            yield idx, section
+            section = {}
+    print(f"Generated {len(requests)} fields for {len(chunks)} chunks in {time.perf_counter() - start:.1f}s")
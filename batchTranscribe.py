@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from generateTranscript import EXPORT_PATH, transcribe_audio, limit_torch_threads, segments_path_for
+from artifactStore import file_hash
+
+AUDIO_INPUT_PATH = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/Audio Input"
+TRANSCRIPTS_PATH = os.path.join(EXPORT_PATH, "Transcripts")
+MANIFEST_FILE = "batch_manifest.json"
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".flac", ".ogg", ".webm")
+
+
+def find_audio_files(directory):
+    """
+    Return all audio files in a directory (recursively), sorted by path.
+    """
+    audio_files = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                audio_files.append(os.path.join(root, name))
+    return sorted(audio_files)
+
+
+def load_manifest(output_dir):
+    """
+    Load the batch manifest (content hash -> job record). A missing or broken manifest is empty.
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    """
+    Write the manifest atomically so that a crash never leaves a half-written file behind.
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def _transcribe_job(audio_path, transcript_path):
+    """
+    Transcribe a single lecture in a worker process and measure how long it took.
+    Transcription errors are raised, so that their message ends up in the manifest.
+    """
+    start = time.perf_counter()
+    _, transcript = transcribe_audio(audio_path, transcript_path=transcript_path, raise_errors=True)
+    wall_seconds = time.perf_counter() - start
+
+    audio_seconds = None
+    segments_path = segments_path_for(transcript_path)
+    if transcript is not None and os.path.exists(segments_path):
+        with open(segments_path, "r") as f:
+            segments = json.load(f)
+        if segments:
+            audio_seconds = segments[-1]["end"]
+    return transcript is not None, wall_seconds, audio_seconds
+
+
+def run_batch(directory, output_dir=TRANSCRIPTS_PATH, workers=2, force=False):
+    """
+    Transcribe every audio file in `directory` into `output_dir`, one `<sha256>.txt` per lecture.
+
+    Finished lectures are recorded in a manifest, so running the batch again (for example after
+    a crash) only transcribes what is missing. Identical recordings are transcribed once.
+    Returns the manifest records of the lectures processed in this run.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+
+    jobs = {}
+    for audio_path in find_audio_files(directory):
+        content_hash = file_hash(audio_path)
+        transcript_path = os.path.join(output_dir, f"{content_hash}.txt")
+        record = manifest.get(content_hash)
+        if not force and record and record.get("status") == "done" and os.path.exists(transcript_path):
+            print(f"Skipping (already transcribed): {audio_path}")
+            continue
+        if content_hash in jobs:
+            print(f"Skipping (duplicate content): {audio_path}")
+            continue
+        jobs[content_hash] = (audio_path, transcript_path)
+
+    if not jobs:
+        print("Nothing to transcribe.")
+        return []
+
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+    print(f"Transcribing {len(jobs)} lectures with {workers} workers...")
+
+    results = []
+    batch_start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=limit_torch_threads, initargs=(max(1, cpu_count // workers),)) as pool:
+        futures = {}
+        for content_hash, (audio_path, transcript_path) in jobs.items():
+            manifest[content_hash] = {
+                "source": audio_path,
+                "transcript": transcript_path,
+                "status": "running",
+            }
+            futures[pool.submit(_transcribe_job, audio_path, transcript_path)] = content_hash
+        save_manifest(output_dir, manifest)
+
+        for future in as_completed(futures):
+            content_hash = futures[future]
+            record = manifest[content_hash]
+            try:
+                ok, wall_seconds, audio_seconds = future.result()
+            except Exception as e:
+                ok, wall_seconds, audio_seconds = False, None, None
+                record["error"] = str(e)
+
+            record["status"] = "done" if ok else "failed"
+            record["wall_seconds"] = round(wall_seconds, 2) if wall_seconds else None
+            record["audio_seconds"] = audio_seconds
+            if wall_seconds and audio_seconds:
+                record["realtime_factor"] = round(wall_seconds / audio_seconds, 3)
+            record["mb_per_second"] = (
+                round(os.path.getsize(record["source"]) / 1024 / 1024 / wall_seconds, 3) if wall_seconds else None
+            )
+            save_manifest(output_dir, manifest)
+            results.append(record)
+            print_record(record)
+
+    print(f"Batch finished in {time.perf_counter() - batch_start:.1f}s")
+    return results
+
+
+def print_record(record):
+    """
+    Print the throughput of one finished lecture.
+    """
+    name = os.path.basename(record["source"])
+    if record["status"] != "done":
+        print(f"[failed] {name} {record.get('error', '')}")
+        return
+    line = f"[done] {name}: {record['wall_seconds']}s"
+    if record.get("audio_seconds"):
+        line += f" for {record['audio_seconds']:.0f}s of audio (RTF {record['realtime_factor']})"
+    if record.get("mb_per_second"):
+        line += f", {record['mb_per_second']} MB/s"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe every lecture in a directory without Streamlit.")
+    parser.add_argument("directory", nargs="?", default=AUDIO_INPUT_PATH, help="Directory with audio files")
+    parser.add_argument("--output", default=TRANSCRIPTS_PATH, help="Directory for transcripts and the manifest")
+    parser.add_argument("--workers", type=int, default=2, help="Number of lectures transcribed at the same time")
+    parser.add_argument("--force", action="store_true", help="Transcribe again even if already done")
+    args = parser.parse_args()
+
+    run_batch(args.directory, args.output, workers=args.workers, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
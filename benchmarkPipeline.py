@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+from generateTranscript import EXPORT_PATH, SAMPLE_RATE
+from batchTranscribe import AUDIO_INPUT_PATH, find_audio_files
+
+BASELINE_PATH = os.path.join(EXPORT_PATH, "Benchmark", "pipeline_baseline.json")
+# Recordings are cut to this many seconds so that a full run stays short
+DEFAULT_AUDIO_SECONDS = 120
+# Relative slowdown (time) or growth (peak memory) tolerated before a stage is flagged
+DEFAULT_TOLERANCE = 0.2
+STUB_LATENCY = 0.05
+RETRIEVAL_QUERIES = 10
+
+STAGE_NAMES = ("transcribe", "structure_online", "structure_offline", "index", "retrieval", "articles")
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of the current process in MB (Linux reports kilobytes).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def lecture_paths(work_dir, audio_path):
+    stem = os.path.splitext(os.path.basename(audio_path))[0]
+    lecture_dir = os.path.join(work_dir, stem)
+    os.makedirs(lecture_dir, exist_ok=True)
+    return lecture_dir, os.path.join(lecture_dir, "transcript.txt")
+
+
+# --- stages (each runs in its own process, so peak memory is measured per stage) ---
+
+def stage_transcribe(audio_path, work_dir, options):
+    from generateTranscript import save_segments, segments_path_for
+    from transcriptionBackends import get_transcription_backend, load_audio
+
+    _, transcript_path = lecture_paths(work_dir, audio_path)
+    audio = load_audio(audio_path)[:int(options["audio_seconds"] * SAMPLE_RATE)]
+    engine = get_transcription_backend(options["transcription_backend"], options["model_size"])
+    start = time.perf_counter()
+    result = engine.transcribe(audio)
+    seconds = time.perf_counter() - start
+    with open(transcript_path, "w") as f:
+        f.write(result["text"].strip())
+    save_segments(result["segments"], segments_path_for(transcript_path))
+    return {
+        "seconds": seconds,
+        "calls": 1,
+        "tokens": len(result["text"].split()),
+        "audio_seconds": round(len(audio) / SAMPLE_RATE, 1),
+    }
+
+
+def stage_structure_online(audio_path, work_dir, options):
+    from structuredInfo import process_transcript
+    from llmStubs import StubLLM
+
+    _, transcript_path = lecture_paths(work_dir, audio_path)
+    llm = StubLLM(latency=options["stub_latency"])
+    stats = {}
+    start = time.perf_counter()
+    sections = process_transcript(llm=llm, transcript_path=transcript_path, use_cache=False, stats=stats)
+    return {"seconds": time.perf_counter() - start, "calls": llm.calls, "tokens": llm.prompt_tokens,
+            "sections": len(sections or [])}
+
+
+def stage_structure_offline(audio_path, work_dir, options):
+    from structuredInfoOff import process_transcript_offline
+
+    _, transcript_path = lecture_paths(work_dir, audio_path)
+    stats = {}
+    start = time.perf_counter()
+    sections = process_transcript_offline(transcript_path=transcript_path, use_cache=False, stats=stats)
+    return {"seconds": time.perf_counter() - start, "calls": stats.get("calls", 0),
+            "tokens": stats.get("input_tokens", 0) + stats.get("output_tokens", 0),
+            "sections": len(sections or [])}
+
+
+def _open_index(lecture_dir):
+    from lectureIndex import LectureIndex
+    from modelRegistry import get_minilm_embeddings, minilm_embedding_id
+
+    return LectureIndex(os.path.join(lecture_dir, "index"), get_minilm_embeddings(), minilm_embedding_id(),
+                        "index_offline")
+
+
+def stage_index(audio_path, work_dir, options):
+    from chunking import CHUNK_PROFILES, get_token_counter
+
+    lecture_dir, transcript_path = lecture_paths(work_dir, audio_path)
+    index = _open_index(lecture_dir)
+    start = time.perf_counter()
+    lecture_hash = index.add_transcript_file(transcript_path)
+    seconds = time.perf_counter() - start
+    chunks = [doc.page_content for _, doc in index.documents(lecture_hash)]
+    _, count = get_token_counter(CHUNK_PROFILES[index.chunk_profile]["tokenizer"])
+    return {"seconds": seconds, "calls": len(chunks), "tokens": sum(count(chunk) for chunk in chunks)}
+
+
+def stage_retrieval(audio_path, work_dir, options):
+    from hybridRetriever import build_retriever
+    from keywordExtraction import extract_keywords
+
+    lecture_dir, transcript_path = lecture_paths(work_dir, audio_path)
+    index = _open_index(lecture_dir)
+    lecture_hash = index.add_transcript_file(transcript_path)
+    with open(transcript_path, "r") as f:
+        queries = extract_keywords(f.read(), RETRIEVAL_QUERIES, mode="tfidf")
+    retriever = build_retriever(index, lecture_hash=lecture_hash)
+    retriever.invoke(queries[0])
+    start = time.perf_counter()
+    for query in queries:
+        retriever.invoke(query)
+    return {"seconds": time.perf_counter() - start, "calls": len(queries),
+            "tokens": sum(len(query.split()) for query in queries)}
+
+
+def stage_articles(audio_path, work_dir, options):
+    from keywordExtraction import extract_keywords
+    from httpClient import HttpClient, ResponseCache, serp_search, merge_results
+    from llmStubs import StubLLM, MockSerpServer
+
+    lecture_dir, transcript_path = lecture_paths(work_dir, audio_path)
+    with open(transcript_path, "r") as f:
+        transcript = f.read()
+    llm = StubLLM(latency=options["stub_latency"])
+    client = HttpClient(cache=ResponseCache(os.path.join(lecture_dir, "http_cache.sqlite")))
+    client.cache.clear()
+    with MockSerpServer(latency=options["stub_latency"]) as server:
+        start = time.perf_counter()
+        keywords = extract_keywords(transcript, mode="llm", llm=llm, use_cache=False)
+        articles = merge_results(serp_search(keywords, "benchmark", client=client, url=server.url), limit=10)
+        seconds = time.perf_counter() - start
+    return {"seconds": seconds, "calls": llm.calls + server.requests, "tokens": llm.prompt_tokens,
+            "articles": len(articles)}
+
+
+STAGES = {
+    "transcribe": stage_transcribe,
+    "structure_online": stage_structure_online,
+    "structure_offline": stage_structure_offline,
+    "index": stage_index,
+    "retrieval": stage_retrieval,
+    "articles": stage_articles,
+}
+
+
+def _run_stage(stage, audio_path, work_dir, options):
+    start = time.perf_counter()
+    result = STAGES[stage](audio_path, work_dir, options)
+    result["wall_seconds"] = time.perf_counter() - start
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_stage(stage, audio_path, work_dir, options):
+    """
+    Run one stage on one lecture in a fresh process and return its measurements:
+    `seconds` (the measured work), `wall_seconds` (including model loading), `peak_rss_mb`,
+    `calls` (model, API or embedding calls) and `tokens` processed.
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        result = pool.apply(_run_stage, (stage, audio_path, work_dir, options))
+    return {key: round(value, 3) if isinstance(value, float) else value for key, value in result.items()}
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare results with a baseline (both keyed by "lecture/stage"). Time and memory may grow by
+    `tolerance`; calls and tokens are deterministic with the stubs, so any increase counts.
+    Returns a list of regression messages.
+    """
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if reference.get(metric) and result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{key}: {metric} {reference[metric]} -> {result[metric]} "
+                                   f"(+{result[metric] / reference[metric] - 1:.0%})")
+        for metric in ("calls", "tokens"):
+            if metric in reference and result.get(metric, 0) > reference[metric]:
+                regressions.append(f"{key}: {metric} {reference[metric]} -> {result[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on the sample lectures.")
+    parser.add_argument("directory", nargs="?", default=AUDIO_INPUT_PATH, help="Directory with audio files")
+    parser.add_argument("--stages", nargs="+", choices=STAGE_NAMES, default=list(STAGE_NAMES),
+                        help="Stages to run (transcribe runs first if later stages have no transcript)")
+    parser.add_argument("--limit", type=int, default=2, help="Only use the first N recordings")
+    parser.add_argument("--audio-seconds", type=float, default=DEFAULT_AUDIO_SECONDS,
+                        help="Cut every recording to this length")
+    parser.add_argument("--transcription-backend", default="whisper")
+    parser.add_argument("--model-size", default="base")
+    parser.add_argument("--stub-latency", type=float, default=STUB_LATENCY,
+                        help="Per-call latency of the stub LLM and mock SerpAPI in seconds")
+    parser.add_argument("--work-dir", help="Where transcripts and indexes are written (default: a temp dir)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Record these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative growth of time and peak memory")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="benchmark_")
+    options = {
+        "audio_seconds": args.audio_seconds,
+        "transcription_backend": args.transcription_backend,
+        "model_size": args.model_size,
+        "stub_latency": args.stub_latency,
+    }
+
+    results = {}
+    for audio_path in find_audio_files(args.directory)[:args.limit]:
+        lecture = os.path.splitext(os.path.basename(audio_path))[0]
+        _, transcript_path = lecture_paths(work_dir, audio_path)
+        stages = [stage for stage in STAGE_NAMES if stage in args.stages]
+        if "transcribe" not in stages and not os.path.exists(transcript_path):
+            stages.insert(0, "transcribe")
+        for stage in stages:
+            result = run_stage(stage, audio_path, work_dir, options)
+            results[f"{lecture}/{stage}"] = result
+            print(f"{lecture[:36]:<36} {stage:<18} {result['seconds']:>8.2f}s ({result['wall_seconds']:>7.2f}s wall) "
+                  f"{result['peak_rss_mb']:>8.1f} MB {result['calls']:>6} calls {result['tokens']:>8} tokens")
+
+    record = {"options": options, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(record, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(record, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline yet, record one with --save-baseline.")
+        return
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    if baseline.get("options") != options:
+        print(f"Warning: the baseline was recorded with other options: {baseline.get('options')}")
+    regressions = compare(results, baseline["results"], args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regressions against {args.baseline}:")
+        for regression in regressions:
+            print(f"  REGRESSION {regression}")
+        raise SystemExit(1)
+    print(f"No regressions against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import argparse
+
+from structuredInfo import EXPORT_PATH, process_transcript
+from llmStubs import StubLLM
+
+
+def default_transcripts():
+    """
+    The current transcript and all batch transcripts in the Export Station.
+    """
+    transcripts = []
+    current = os.path.join(EXPORT_PATH, "transcript.txt")
+    if os.path.exists(current):
+        transcripts.append(current)
+    batch_dir = os.path.join(EXPORT_PATH, "Transcripts")
+    if os.path.isdir(batch_dir):
+        transcripts.extend(
+            os.path.join(batch_dir, name) for name in sorted(os.listdir(batch_dir)) if name.endswith(".txt")
+        )
+    return transcripts
+
+
+def run_online(transcript_path, single_pass, backend, latency):
+    """
+    Structure one transcript with the online pipeline and measure calls, prompt tokens and time.
+    """
+    stats = {}
+    start = time.perf_counter()
+    if backend == "stub":
+        llm = StubLLM(latency=latency)
+        sections = process_transcript(llm=llm, single_pass=single_pass, transcript_path=transcript_path,
+                                      use_cache=False, stats=stats)
+        stats["input_tokens"] = llm.prompt_tokens
+    else:
+        from langchain_community.callbacks import get_openai_callback
+        with get_openai_callback() as callback:
+            sections = process_transcript(single_pass=single_pass, transcript_path=transcript_path,
+                                          use_cache=False, stats=stats)
+        stats["input_tokens"] = callback.prompt_tokens
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    stats["sections"] = len(sections or [])
+    return stats
+
+
+def run_offline(transcript_path, single_pass, dedup_similarity=0.0):
+    """
+    Structure one transcript with the offline pipeline and measure generations, tokens and time.
+    """
+    from structuredInfoOff import process_transcript_offline
+
+    stats = {}
+    start = time.perf_counter()
+    sections = process_transcript_offline(single_pass=single_pass, transcript_path=transcript_path,
+                                          use_cache=False, stats=stats, dedup_similarity=dedup_similarity)
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    stats["sections"] = len(sections or [])
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare three-call and single-pass structuring.")
+    parser.add_argument("transcripts", nargs="*", help="Transcript files (default: the Export Station)")
+    parser.add_argument("--backend", choices=["stub", "openai", "offline"], default="stub",
+                        help="stub: local fake LLM, openai: real API calls, offline: local Flan-T5")
+    parser.add_argument("--latency", type=float, default=0.5, help="Per-call latency of the stub LLM in seconds")
+    parser.add_argument("--dedup-similarity", type=float, default=0.0,
+                        help="Offline only: skip chunks at least this similar to an earlier one (0: off)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for transcript_path in args.transcripts or default_transcripts():
+        for mode, single_pass in (("three-call", False), ("single-pass", True)):
+            if args.backend == "offline":
+                stats = run_offline(transcript_path, single_pass, args.dedup_similarity)
+            else:
+                stats = run_online(transcript_path, single_pass, args.backend, args.latency)
+            stats.update({"transcript": os.path.basename(transcript_path), "mode": mode})
+            results.append(stats)
+            print(f"{stats['transcript']:<40} {mode:<12} {stats['seconds']:>8.2f}s "
+                  f"{stats.get('calls', 0):>5} calls {stats.get('input_tokens', 0):>8} input tokens "
+                  f"{stats.get('fallbacks', 0):>3} fallbacks {stats['sections']:>4} sections "
+                  f"{len(stats.get('near_duplicates', [])):>3} skipped")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import re
+import json
+import time
+import argparse
+
+from generateTranscript import EXPORT_PATH, SAMPLE_RATE
+from batchTranscribe import AUDIO_INPUT_PATH, find_audio_files
+from transcriptionBackends import get_transcription_backend, load_audio
+
+# Reference transcripts of the current engine (openai-whisper base), computed once per recording
+REFERENCE_PATH = os.path.join(EXPORT_PATH, "Benchmark")
+REFERENCE_BACKEND = "whisper:base"
+
+
+def normalize_words(text):
+    """
+    Lowercase words without punctuation, so that WER only counts real recognition differences.
+    """
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """
+    Word-level Levenshtein distance between two transcripts, divided by the reference length.
+    """
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def parse_backend(spec):
+    """
+    Split a `backend:size` spec like `faster-whisper:small` (the size defaults to base).
+    """
+    name, _, size = spec.partition(":")
+    return name, size or "base"
+
+
+def run_backend(spec, audio, vad=True):
+    """
+    Transcribe `audio` with one backend, after a warm-up that loads the model.
+    Returns the text and the decoding time in seconds.
+    """
+    name, size = parse_backend(spec)
+    options = {"vad_filter": vad} if name == "faster-whisper" else {}
+    engine = get_transcription_backend(name, size, **options)
+    engine.transcribe(audio[:SAMPLE_RATE])
+    start = time.perf_counter()
+    text = engine.transcribe(audio)["text"].strip()
+    return text, time.perf_counter() - start
+
+
+def reference_transcript(audio_path, audio, refresh=False):
+    """
+    Return the reference transcript of a recording, transcribing it only on the first run.
+    """
+    os.makedirs(REFERENCE_PATH, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(audio_path))[0]
+    reference_path = os.path.join(REFERENCE_PATH, f"{stem}.{REFERENCE_BACKEND.replace(':', '-')}.txt")
+    if not refresh and os.path.exists(reference_path):
+        with open(reference_path, "r") as f:
+            return f.read(), None
+    text, seconds = run_backend(REFERENCE_BACKEND, audio)
+    with open(reference_path, "w") as f:
+        f.write(text)
+    return text, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare transcription backends on the lecture recordings.")
+    parser.add_argument("directory", nargs="?", default=AUDIO_INPUT_PATH, help="Directory with audio files")
+    parser.add_argument("--backends", nargs="+", default=["whisper:base", "faster-whisper:base"],
+                        help="Backends to benchmark as backend:size")
+    parser.add_argument("--no-vad", action="store_true", help="Decode silences too (faster-whisper)")
+    parser.add_argument("--limit", type=int, help="Only use the first N recordings")
+    parser.add_argument("--refresh-reference", action="store_true", help="Transcribe the reference again")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for audio_path in find_audio_files(args.directory)[:args.limit]:
+        audio = load_audio(audio_path)
+        audio_seconds = len(audio) / SAMPLE_RATE
+        reference, reference_seconds = reference_transcript(audio_path, audio, args.refresh_reference)
+
+        for spec in args.backends:
+            if spec == REFERENCE_BACKEND and reference_seconds is not None:
+                text, seconds = reference, reference_seconds
+            else:
+                text, seconds = run_backend(spec, audio, vad=not args.no_vad)
+            stats = {
+                "audio": os.path.basename(audio_path),
+                "backend": spec,
+                "audio_seconds": round(audio_seconds, 1),
+                "seconds": round(seconds, 2),
+                "realtime_factor": round(seconds / audio_seconds, 3) if audio_seconds else None,
+                "wer": round(word_error_rate(reference, text), 4),
+            }
+            results.append(stats)
+            print(f"{stats['audio'][:40]:<40} {spec:<22} {stats['seconds']:>8.2f}s "
+                  f"RTF {stats['realtime_factor']:>6} WER {stats['wer']:.2%}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
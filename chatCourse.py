@@ -1,87 +1,95 @@
 import os
-import json
+import uuid
 import streamlit as st
-from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import OpenAIEmbeddings
 from langchain_community.chat_models import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
+from langchain.memory import ConversationBufferWindowMemory
 from langchain.chains import ConversationalRetrievalChain
-import requests
+from lectureIndex import get_lecture_index, transcript_hash, add_workspace_transcript
+from historyStore import get_history_store, render_history
+from semanticCache import get_semantic_cache
+from hybridRetriever import build_retriever
+from httpClient import get_http_client, SERP_API_URL
 
 VECTORSTORE_PATH = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/vectorstore.faiss"
 EXPORT_PATH = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/Export Station"
 HISTORY_DIR = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/History"
-HISTORY_FILE = os.path.join(HISTORY_DIR, "askLectures.json")
+CHAT_MEMORY_TURNS = int(os.getenv("CHAT_MEMORY_TURNS", "5"))
 
-# Ensure the history directory and file exist
-if not os.path.exists(HISTORY_DIR):
-    os.makedirs(HISTORY_DIR)
-if not os.path.exists(HISTORY_FILE):
-    with open(HISTORY_FILE, "w") as f:
-        json.dump([], f)  # Initialize with an empty list
-w
-
-def load_history():
+def get_history():
     """
-    Load chat history from the JSON file. If the file is empty, return an empty list.
+    Return the chat history store (the old askLectures.json is migrated into it on first use).
     """
-    try:
-        with open(HISTORY_FILE, "r") as f:
-            content = f.read().strip()
-            if not content:
-                return []
-            return json.loads(content)
-    except json.JSONDecodeError:
-        return []
+    return get_history_store("askLectures", HISTORY_DIR)
 
 
-def save_to_history(question, answer):
+def load_history(limit=20, offset=0, lecture=None, session_id=None):
     """
-    Save a question-answer pair to the JSON file.
+    Load a page of the chat history, newest first.
     """
-    history = load_history()
-    history.append({"question": question, "answer": answer})
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(history, f, indent=2)
+    return get_history().page(limit=limit, offset=offset, lecture=lecture, session_id=session_id)
 
 
-def generate_embeddings(transcript_path):
+def save_to_history(question, answer, lecture=None, session_id=None, standalone=None):
     """
-    Generate embeddings for the given transcript and save them to FAISS.
+    Append a question-answer pair to the chat history.
     """
-    with open(transcript_path, "r") as f:
-        transcript = f.read()
+    get_history().append(question, answer, lecture=lecture, session_id=session_id, standalone=standalone)
+
 
-    # Generate embeddings and overwrite FAISS
+def get_index():
+    """
+    Return the persistent lecture index of the online chat (OpenAI embeddings).
+    """
     embeddings = OpenAIEmbeddings()
-    vectorstore = FAISS.from_texts([transcript], embeddings)
-    vectorstore.save_local(VECTORSTORE_PATH)
-    return vectorstore
+    return get_lecture_index(VECTORSTORE_PATH, embeddings, f"openai:{embeddings.model}", "index_online")
 
 
-def get_conversation_chain():
+def generate_embeddings(transcript_path, workspace=None):
+    """
+    Make sure the given transcript (and the batch transcripts) are in the persistent FAISS index.
+    Only transcripts that are not indexed yet are sent to the embedding API.
+    Returns the index and the lecture hash of the given transcript.
+    """
+    index = get_index()
+    index.add_directory(os.path.join(EXPORT_PATH, "Transcripts"))
+    if workspace is not None:
+        # The lecture's chunk embeddings are kept with its other artifacts
+        lecture_hash = add_workspace_transcript(index, workspace, "embeddings_online")
+    else:
+        lecture_hash = index.add_transcript_file(transcript_path)
+    if not index.has_lecture(lecture_hash):
+        raise ValueError("The transcript has no text to index.")
+    return index, lecture_hash
+
+
+def get_conversation_chain(transcript_path=None, workspace=None):
     """
     Create a conversational retrieval chain using LangChain.
-    Ensure embeddings are regenerated for every new session.
+    Embeddings are loaded from the persistent index and only computed for new transcripts.
     """
-    transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
+    if transcript_path is None:
+        transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
     if not os.path.exists(transcript_path):
         st.error("Transcript not found. Please generate the transcript first.")
         return None
 
-    st.info("Generating embeddings for the transcript...")
+    st.info("Loading embeddings for the transcripts...")
     try:
-        vectorstore = generate_embeddings(transcript_path)
-        st.success("Embeddings generated successfully!")
+        index, lecture_hash = generate_embeddings(transcript_path, workspace)
+        st.success("Embeddings ready!")
     except Exception as e:
         st.error(f"Failed to generate embeddings: {e}")
         return None
 
     llm = ChatOpenAI(temperature=0)
-    memory = ConversationBufferMemory(memory_key='chat_history', return_messages=True)
+    # Only the last few turns are sent back to the model, so prompts don't grow with the chat
+    memory = ConversationBufferWindowMemory(k=CHAT_MEMORY_TURNS, memory_key='chat_history', return_messages=True)
     return ConversationalRetrievalChain.from_llm(
         llm=llm,
-        retriever=vectorstore.as_retriever(),
+        # BM25 + FAISS, so exact terms (names, formulas, course codes) are found as well;
+        # only chunks of this lecture, although the index holds all lectures
+        retriever=build_retriever(index, lecture_hash=lecture_hash),
         memory=memory
     )
 
@@ -91,7 +99,6 @@ def fetch_additional_info(answer):
     Fetch more information about the provided answer from the internet using SERP API.
     """
     SERP_API_KEY = os.getenv("SERP_API_KEY")
-    SERP_API_URL = "https://serpapi.com/search"
 
     if not SERP_API_KEY:
         return "SERP API key not set. Please configure it in the environment variables."
@@ -103,9 +110,10 @@ def fetch_additional_info(answer):
     }
 
     try:
-        response = requests.get(SERP_API_URL, params=params)
-        response.raise_for_status()
-        search_results = response.json()
+        # Pooled, with timeouts and retries; asking again about the same answer hits the cache
+        search_results = get_http_client().get_json(SERP_API_URL, params)
+        if search_results.get("error"):
+            raise RuntimeError(search_results["error"])
 
         additional_info = []
         for result in search_results.get("organic_results", []):
@@ -136,15 +144,37 @@ def display_additional_info(info):
         st.write("No additional information found.")
 
 
-def app():
+def get_session_conversation_chain(lecture, transcript_path=None, workspace=None):
+    """
+    Return this user's conversation chain, building it only once per session and again
+    when the transcript changes, so that reruns keep the retriever, LLM client and memory.
+    """
+    session = st.session_state.get("chat_session_online")
+    if session is None or session["lecture"] != lecture:
+        chain = get_conversation_chain(transcript_path, workspace)
+        if chain is None:
+            return None, None
+        session = {"lecture": lecture, "chain": chain, "last": None}
+        st.session_state["chat_session_online"] = session
+    return session["chain"], session
+
+
+def app(transcript_path=None, workspace=None):
     """
     Streamlit app to chat with the course and save the history.
+    By default it chats about the transcript in the Export Station; `transcript_path` and
+    `workspace` select the lecture of the current session instead.
     """
     st.title("💬 Chat with Course")
     st.info("Chat with the transcript and get answers to your questions.")
 
-    # Initialize conversation chain
-    conversation_chain = get_conversation_chain()
+    # Initialize the conversation chain of this session
+    session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    if transcript_path is None:
+        transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
+    lecture = transcript_hash(transcript_path)
+
+    conversation_chain, session = get_session_conversation_chain(lecture, transcript_path, workspace)
     if conversation_chain is None:
         return
 
@@ -153,17 +183,33 @@ def app():
 
     if user_question:
         try:
-            # Generate answer using embeddings
-            answer = conversation_chain.run(user_question)
+            # Reruns (e.g. from the "More Info" button) show the last answer instead of asking again
+            if session["last"] and session["last"][0] == user_question:
+                answer = session["last"][1]
+            else:
+                # Answer repeated questions from the semantic cache, generate the others using embeddings
+                answer_cache = get_semantic_cache("online", OpenAIEmbeddings(), "openai", history_store=get_history())
+                # Follow-ups ("can you explain more?") depend on the conversation, so only the first
+                # question of a conversation is looked up in and added to the cache
+                standalone = not conversation_chain.memory.chat_memory.messages
+                answer, question_embedding = answer_cache.lookup(lecture, user_question) if standalone else (None, None)
+                if answer is None:
+                    answer = conversation_chain.run(user_question)
+                    if standalone:
+                        answer_cache.add(lecture, user_question, answer, question_embedding)
+                else:
+                    conversation_chain.memory.save_context({"question": user_question}, {"answer": answer})
+                    st.caption("Answered from the cache of earlier questions.")
+
+                # Save the interaction to history
+                save_to_history(user_question, answer, lecture=lecture, session_id=session_id, standalone=standalone)
+                session["last"] = (user_question, answer)
 
             # Display the interaction
             st.markdown(f"**You:** {user_question}")
             st.markdown(f"**Lecture:** {answer}")
             st.markdown("---")
 
-            # Save the interaction to history
-            save_to_history(user_question, answer)
-
             # Add the "More Info from Internet" button only if the answer exists
             if answer:
                 if st.button(f"More Info for: {user_question}", key=f"more_info_{user_question}"):
@@ -173,10 +219,4 @@ def app():
             st.error(f"Error generating answer: {e}")
 
     # Display chat history under the input box
-    history = load_history()
-    if history:
-        st.markdown("### Chat History")
-        for interaction in reversed(history):
-            st.markdown(f"**You:** {interaction['question']}")
-            st.markdown(f"**Lecture:** {interaction['answer']}")
-            st.markdown("---")
+    render_history(get_history(), "history_online", lecture=lecture)
@@ -1,84 +1,112 @@
 import os
-import json
+import uuid
 import streamlit as st
 
-from langchain_community.vectorstores import FAISS
-from langchain.memory import ConversationBufferMemory
+from langchain.memory import ConversationBufferWindowMemory
 from langchain.chains import ConversationalRetrievalChain
 
-from sentence_transformers import SentenceTransformer
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.llms import HuggingFacePipeline
+from modelRegistry import get_flan_t5_llm, get_minilm_embeddings, minilm_embedding_id
+from lectureIndex import get_lecture_index, transcript_hash, add_workspace_transcript
+from historyStore import get_history_store, render_history
+from semanticCache import get_semantic_cache
+from hybridRetriever import build_retriever
 
 VECTORSTORE_PATH = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/vectorstore_offline.faiss"
 EXPORT_PATH = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/Export Station"
 HISTORY_DIR = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/History"
-HISTORY_FILE = os.path.join(HISTORY_DIR, "askLecturesOffline.json")
-
-os.makedirs(HISTORY_DIR, exist_ok=True)
-if not os.path.exists(HISTORY_FILE):
-    with open(HISTORY_FILE, "w") as f:
-        json.dump([], f)
-
-def load_history():
-    try:
-        with open(HISTORY_FILE, "r") as f:
-            content = f.read().strip()
-            if not content:
-                return []
-            return json.loads(content)
-    except json.JSONDecodeError:
-        return []
-
-def save_to_history(question, answer):
-    history = load_history()
-    history.append({"question": question, "answer": answer})
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(history, f, indent=2)
-
-def generate_offline_embeddings(transcript_path):
-    with open(transcript_path, "r") as f:
-        transcript = f.read()
-
-    embed_model = SentenceTransformer('all-MiniLM-L6-v2')
-    embeddings = HuggingFaceEmbeddings(model_name='sentence-transformers/all-MiniLM-L6-v2')
-    vectorstore = FAISS.from_texts([transcript], embeddings)
-    vectorstore.save_local(VECTORSTORE_PATH)
-    return vectorstore
-
-def get_conversation_chain_offline():
-    transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
+CHAT_MEMORY_TURNS = int(os.getenv("CHAT_MEMORY_TURNS", "5"))
+
+def get_history():
+    """
+    Return the chat history store (the old askLecturesOffline.json is migrated into it on first use).
+    """
+    return get_history_store("askLecturesOffline", HISTORY_DIR)
+
+
+def load_history(limit=20, offset=0, lecture=None, session_id=None):
+    """
+    Load a page of the chat history, newest first.
+    """
+    return get_history().page(limit=limit, offset=offset, lecture=lecture, session_id=session_id)
+
+
+def save_to_history(question, answer, lecture=None, session_id=None, standalone=None):
+    """
+    Append a question-answer pair to the chat history.
+    """
+    get_history().append(question, answer, lecture=lecture, session_id=session_id, standalone=standalone)
+
+
+def get_index():
+    # Persistent lecture index of the offline chat (MiniLM embeddings)
+    return get_lecture_index(VECTORSTORE_PATH, get_minilm_embeddings(), minilm_embedding_id(), "index_offline")
+
+def generate_offline_embeddings(transcript_path, workspace=None):
+    # Only transcripts that are not in the persistent index yet get embedded; returns the index
+    # and the lecture hash of the given transcript
+    index = get_index()
+    index.add_directory(os.path.join(EXPORT_PATH, "Transcripts"))
+    if workspace is not None:
+        # The lecture's chunk embeddings are kept with its other artifacts
+        lecture_hash = add_workspace_transcript(index, workspace, "embeddings_offline")
+    else:
+        lecture_hash = index.add_transcript_file(transcript_path)
+    if not index.has_lecture(lecture_hash):
+        raise ValueError("The transcript has no text to index.")
+    return index, lecture_hash
+
+def get_conversation_chain_offline(transcript_path=None, workspace=None):
+    if transcript_path is None:
+        transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
     if not os.path.exists(transcript_path):
         st.error("Transcript not found. Please generate the transcript first.")
         return None
 
-    st.info("Generating offline embeddings...")
+    st.info("Loading offline embeddings...")
     try:
-        vectorstore = generate_offline_embeddings(transcript_path)
-        st.success("Embeddings generated successfully!")
+        index, lecture_hash = generate_offline_embeddings(transcript_path, workspace)
+        st.success("Embeddings ready!")
     except Exception as e:
         st.error(f"Failed to generate embeddings: {e}")
         return None
 
-    # Load Flan-T5 for offline generation
-    tokenizer = AutoTokenizer.from_pretrained("google/flan-t5-base")
-    model = AutoModelForSeq2SeqLM.from_pretrained("google/flan-t5-base")
-    pipe = pipeline("text2text-generation", model=model, tokenizer=tokenizer, max_new_tokens=256)
-    llm = HuggingFacePipeline(pipeline=pipe)
+    # Shared Flan-T5 for offline generation (loaded once per process)
+    llm = get_flan_t5_llm()
 
-    memory = ConversationBufferMemory(memory_key='chat_history', return_messages=True)
+    # Only the last few turns are sent back to the model, so prompts don't grow with the chat
+    memory = ConversationBufferWindowMemory(k=CHAT_MEMORY_TURNS, memory_key='chat_history', return_messages=True)
     return ConversationalRetrievalChain.from_llm(
         llm=llm,
-        retriever=vectorstore.as_retriever(),
+        # BM25 + FAISS, so exact terms (names, formulas, course codes) are found as well;
+        # only chunks of this lecture, although the index holds all lectures
+        retriever=build_retriever(index, lecture_hash=lecture_hash),
         memory=memory
     )
 
-def app():
+def get_session_conversation_chain(lecture, transcript_path=None, workspace=None):
+    """
+    Return this user's conversation chain, building it only once per session and again
+    when the transcript changes, so that reruns keep the retriever, LLM client and memory.
+    """
+    session = st.session_state.get("chat_session_offline")
+    if session is None or session["lecture"] != lecture:
+        chain = get_conversation_chain_offline(transcript_path, workspace)
+        if chain is None:
+            return None, None
+        session = {"lecture": lecture, "chain": chain, "last": None}
+        st.session_state["chat_session_offline"] = session
+    return session["chain"], session
+
+def app(transcript_path=None, workspace=None):
     st.title("💬 Offline Chat with Course")
     st.info("Chat with the transcript using fully offline models (no internet).")
 
-    conversation_chain = get_conversation_chain_offline()
+    session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    if transcript_path is None:
+        transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
+    lecture = transcript_hash(transcript_path)
+
+    conversation_chain, session = get_session_conversation_chain(lecture, transcript_path, workspace)
     if conversation_chain is None:
         return
 
@@ -86,18 +114,31 @@ def app():
 
     if user_question:
         try:
-            answer = conversation_chain.run(user_question)
+            # Reruns show the last answer instead of asking again
+            if session["last"] and session["last"][0] == user_question:
+                answer = session["last"][1]
+            else:
+                # Answer repeated questions from the semantic cache
+                answer_cache = get_semantic_cache("offline", get_minilm_embeddings(), "minilm",
+                                                  history_store=get_history())
+                # Follow-ups ("can you explain more?") depend on the conversation, so only the first
+                # question of a conversation is looked up in and added to the cache
+                standalone = not conversation_chain.memory.chat_memory.messages
+                answer, question_embedding = answer_cache.lookup(lecture, user_question) if standalone else (None, None)
+                if answer is None:
+                    answer = conversation_chain.run(user_question)
+                    if standalone:
+                        answer_cache.add(lecture, user_question, answer, question_embedding)
+                else:
+                    conversation_chain.memory.save_context({"question": user_question}, {"answer": answer})
+                    st.caption("Answered from the cache of earlier questions.")
+                save_to_history(user_question, answer, lecture=lecture, session_id=session_id, standalone=standalone)
+                session["last"] = (user_question, answer)
             st.markdown(f"**You:** {user_question}")
             st.markdown(f"**Lecture:** {answer}")
             st.markdown("---")
-            save_to_history(user_question, answer)
         except Exception as e:
             st.error(f"Error generating answer: {e}")
 
-    history = load_history()
-    if history:
-        st.markdown("### Chat History")
-        for interaction in reversed(history):
-            st.markdown(f"**You:** {interaction['question']}")
-            st.markdown(f"**Lecture:** {interaction['answer']}")
-            st.markdown("---")
+    # Display chat history under the input box
+    render_history(get_history(), "history_offline", lecture=lecture)
@@ -0,0 +1,288 @@
+import os
+import re
+import json
+import hashlib
+import threading
+
+from generateTranscript import segments_path_for
+
+# How each stage sizes its chunks: tokenizer of the model that reads them, maximum and overlap in tokens.
+# Flan-T5 reads at most 512 tokens, so offline chunks leave room for the longest prompt template;
+# MiniLM truncates its input at 256 word pieces.
+CHUNK_PROFILES = {
+    "structure_online": {"tokenizer": "openai", "max_tokens": 500, "overlap_tokens": 50},
+    "structure_offline": {"tokenizer": "flan-t5", "max_tokens": 400, "overlap_tokens": 40},
+    "keywords": {"tokenizer": "openai", "max_tokens": 1500, "overlap_tokens": 0},
+    "index_online": {"tokenizer": "openai", "max_tokens": 250, "overlap_tokens": 25},
+    "index_offline": {"tokenizer": "minilm", "max_tokens": 200, "overlap_tokens": 20},
+}
+
+# Chunks already computed, per (transcript content, profile), shared by all stages of the process
+_chunk_cache = {}
+_chunk_cache_lock = threading.Lock()
+MAX_CACHED_TRANSCRIPTS = 32
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def load_segments(transcript_path, transcript=None):
+    """
+    Load the Whisper segments saved next to a transcript.
+
+    Returns None if there are none, or if they don't belong to the current transcript text
+    (for example when the transcript was edited by hand).
+    """
+    segments_path = segments_path_for(transcript_path)
+    if not os.path.exists(segments_path):
+        return None
+    with open(segments_path, "r") as f:
+        segments = json.load(f)
+    if transcript is None:
+        with open(transcript_path, "r") as f:
+            transcript = f.read()
+    if not segments or _normalize(" ".join(s["text"] for s in segments)) != _normalize(transcript):
+        return None
+    return segments
+
+
+def _load_counter(tokenizer):
+    if tokenizer == "openai":
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding("cl100k_base")
+            return "cl100k", lambda text: len(encoding.encode(text))
+        except ImportError:
+            pass
+    elif tokenizer in ("flan-t5", "minilm"):
+        try:
+            from transformers import AutoTokenizer
+            from modelRegistry import FLAN_T5_MODEL, MINILM_MODEL
+            model = FLAN_T5_MODEL if tokenizer == "flan-t5" else MINILM_MODEL
+            hf_tokenizer = AutoTokenizer.from_pretrained(model)
+            return model, lambda text: len(hf_tokenizer(text, add_special_tokens=False)["input_ids"])
+        except (ImportError, OSError):
+            pass
+    else:
+        raise ValueError(f"Unknown tokenizer: {tokenizer}")
+    print(f"[Chunking] Tokenizer for {tokenizer} not available, approximating tokens from words.")
+    return "approx", lambda text: int(len(text.split()) * 1.3 + 0.5)
+
+
+def get_token_counter(tokenizer):
+    """
+    Return `(tokenizer_id, count)` where `count(text)` is the number of tokens of `text` for
+    "openai" (tiktoken cl100k), "flan-t5" or "minilm". Without the tokenizer installed,
+    tokens are approximated from the number of words.
+    """
+    with _counters_lock:
+        if tokenizer not in _counters:
+            _counters[tokenizer] = _load_counter(tokenizer)
+        return _counters[tokenizer]
+
+
+def chunking_id(profile):
+    """
+    Identifier of how a profile chunks text; stored with derived artifacts so they are
+    rebuilt when the chunking changes.
+    """
+    settings = CHUNK_PROFILES[profile]
+    tokenizer_id, _ = get_token_counter(settings["tokenizer"])
+    return f"{profile}:{tokenizer_id}:{settings['max_tokens']}/{settings['overlap_tokens']}"
+
+
+def sentence_segments(transcript):
+    """
+    Split a transcript without Whisper segments into sentence segments (without timestamps).
+    """
+    return [
+        {"text": sentence, "start": None, "end": None}
+        for sentence in _SENTENCE_END.split(transcript.strip()) if sentence.strip()
+    ]
+
+
+def _split_long_segment(segment, max_size, length):
+    """
+    Cut a segment longer than `max_size` at sentence ends, then between words, interpolating
+    its timestamps by character position.
+    """
+    text = segment["text"]
+    pieces = []
+    for sentence in _SENTENCE_END.split(text):
+        if length(sentence) <= max_size:
+            pieces.append(sentence)
+            continue
+        words, current = sentence.split(), []
+        for word in words:
+            if current and length(" ".join(current + [word])) > max_size:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+
+    # Merge sentences back together as long as they fit
+    merged = []
+    for piece in pieces:
+        if merged and length(merged[-1] + " " + piece) <= max_size:
+            merged[-1] += " " + piece
+        else:
+            merged.append(piece)
+
+    start, end = segment.get("start"), segment.get("end")
+    result, position = [], 0
+    for piece in merged:
+        piece_segment = {"text": piece, "start": None, "end": None}
+        if start is not None and end is not None:
+            share = (end - start) / max(1, len(text))
+            piece_segment["start"] = round(start + position * share, 2)
+            piece_segment["end"] = round(start + min(len(text), position + len(piece)) * share, 2)
+        result.append(piece_segment)
+        position += len(piece) + 1
+    return result
+
+
+def _char_length(text):
+    return len(text) + 1
+
+
+class SegmentChunker:
+    """
+    Incremental form of `chunk_segments`: feed segments one by one with `add` and get every
+    chunk as soon as it is complete, then the last one from `finish`. The chunks are exactly
+    the ones `chunk_segments` returns for the whole list, so streaming and batch runs agree.
+
+    Sizes are in characters by default; with `length` (e.g. a token counter) they are measured
+    with it instead. Segments longer than a whole chunk are cut at sentence ends or between words.
+    """
+
+    def __init__(self, max_chars=1000, overlap_chars=100, length=None):
+        self.max_chars = max_chars
+        self.overlap_chars = overlap_chars
+        self.length = length or _char_length
+        self.current = []
+        self.sizes = []
+        self.size = 0
+
+    def add(self, segment):
+        """
+        Add a segment and return the list of chunks it completed.
+        """
+        if self.length(segment["text"]) > self.max_chars:
+            finished = []
+            for piece in _split_long_segment(segment, self.max_chars, self.length):
+                finished.extend(self._add(piece))
+            return finished
+        return self._add(segment)
+
+    def _add(self, segment):
+        finished = []
+        length = self.length(segment["text"])
+        if self.current and self.size + length > self.max_chars:
+            finished.append(_make_chunk(self.current))
+            # Carry the tail of the finished chunk over as overlap
+            overlap, overlap_sizes = [], []
+            overlap_size = 0
+            for previous, previous_length in zip(reversed(self.current), reversed(self.sizes)):
+                if overlap_size + previous_length > self.overlap_chars or len(overlap) + 1 == len(self.current):
+                    break
+                overlap.insert(0, previous)
+                overlap_sizes.insert(0, previous_length)
+                overlap_size += previous_length
+            # The overlap never pushes the next chunk over the maximum
+            while overlap and overlap_size + length > self.max_chars:
+                overlap.pop(0)
+                overlap_size -= overlap_sizes.pop(0)
+            self.current, self.sizes = overlap, overlap_sizes
+            self.size = overlap_size
+        self.current.append(segment)
+        self.sizes.append(length)
+        self.size += length
+        return finished
+
+    def finish(self):
+        """
+        Return the last, possibly short chunk (if any) and reset the chunker.
+        """
+        finished = [_make_chunk(self.current)] if self.current else []
+        self.current = []
+        self.sizes = []
+        self.size = 0
+        return finished
+
+
+def _make_chunk(segments):
+    return {
+        "text": " ".join(segment["text"] for segment in segments),
+        "start": segments[0]["start"],
+        "end": segments[-1]["end"],
+    }
+
+
+def chunk_segments(segments, max_chars=1000, overlap_chars=100):
+    """
+    Group consecutive Whisper segments into chunks of at most `max_chars` characters,
+    never cutting inside a segment. Each chunk repeats the last segments of the previous one,
+    up to `overlap_chars` characters.
+
+    Returns a list of dicts with the chunk `text` and its `start`/`end` timestamps in seconds.
+    """
+    chunker = SegmentChunker(max_chars, overlap_chars)
+    chunks = []
+    for segment in segments:
+        chunks.extend(chunker.add(segment))
+    return chunks + chunker.finish()
+
+
+def make_chunker(profile):
+    """
+    Return a `SegmentChunker` sizing chunks in tokens as configured by `CHUNK_PROFILES[profile]`.
+    """
+    settings = CHUNK_PROFILES[profile]
+    _, count = get_token_counter(settings["tokenizer"])
+    return SegmentChunker(settings["max_tokens"], settings["overlap_tokens"], length=count)
+
+
+def chunk_transcript(transcript, segments=None, profile="structure_online"):
+    """
+    Chunk a transcript for one stage: along Whisper segments when available (chunks then carry
+    `start`/`end` timestamps), otherwise along sentences, sized in the tokens of the model
+    that reads the chunks. The result is computed once per transcript and profile and then
+    shared by every stage of the process.
+
+    Returns a list of dicts with `text`, `start` and `end` (None without segments).
+    """
+    digest = hashlib.sha256(transcript.encode("utf-8"))
+    if segments:
+        digest.update(json.dumps([(s["start"], s["end"], s["text"]) for s in segments]).encode("utf-8"))
+    key = (digest.hexdigest(), profile)
+    with _chunk_cache_lock:
+        if key in _chunk_cache:
+            return [dict(chunk) for chunk in _chunk_cache[key]]
+
+    chunker = make_chunker(profile)
+    chunks = []
+    for segment in segments or sentence_segments(transcript):
+        chunks.extend(chunker.add(segment))
+    chunks.extend(chunker.finish())
+
+    with _chunk_cache_lock:
+        if len(_chunk_cache) >= MAX_CACHED_TRANSCRIPTS:
+            _chunk_cache.pop(next(iter(_chunk_cache)))
+        _chunk_cache[key] = chunks
+    return [dict(chunk) for chunk in chunks]
+
+
+def load_chunks(transcript_path, profile="structure_online"):
+    """
+    Chunk a transcript file (with its saved Whisper segments, if they still match it).
+    """
+    with open(transcript_path, "r") as f:
+        transcript = f.read()
+    return chunk_transcript(transcript, load_segments(transcript_path, transcript), profile)
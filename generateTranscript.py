@@ -1,23 +1,33 @@
 import os
-import whisper
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from transcriptionBackends import get_transcription_backend, load_audio
 
 # Define the export path for saving the transcript
 EXPORT_PATH = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/Export Station"
+SEGMENTS_FILE = "transcript_segments.json"
 
-def transcribe_audio(file_path):
+# Whisper works on 16 kHz mono audio
+SAMPLE_RATE = 16000
 
-    try:
-        # Check if the Whisper library is properly installed
-        if not hasattr(whisper, "load_model"):
-            raise AttributeError("The Whisper library does not have 'load_model'. Ensure openai-whisper is installed.")
+def transcribe_audio(file_path, transcript_path=None, backend=None, model_size=None, raise_errors=False):
+    """
+    Transcribe an audio file with Whisper and save the transcript.
 
-        # Load the Whisper model
-        print("Loading Whisper model...")
-        model = whisper.load_model("base")
-        print("Transcribing audio...")
+    By default the transcript goes to the shared `transcript.txt` in the Export Station;
+    pass `transcript_path` to write it (and its segments) somewhere else. `backend` and
+    `model_size` pick the engine (see transcriptionBackends), defaulting to the environment.
+    Errors are printed and `(None, None)` is returned, unless `raise_errors` is set (headless runs
+    that record the reason).
+    """
+    try:
+        # The backend's model is shared through the model registry (loaded once per process)
+        engine = get_transcription_backend(backend, model_size)
+        print(f"Transcribing audio with {engine.name} ({engine.model_size})...")
 
         # Perform the transcription
-        result = model.transcribe(file_path)
+        result = engine.transcribe(file_path)
         transcript = result["text"]
 
         # Ensure the export directory exists
@@ -25,9 +35,11 @@ def transcribe_audio(file_path):
             os.makedirs(EXPORT_PATH)
 
         # Save the transcript as a text file
-        transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
+        if transcript_path is None:
+            transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
         with open(transcript_path, "w") as f:
             f.write(transcript)
+        save_segments(simplify_segments(result.get("segments", [])), segments_path_for(transcript_path))
 
         print(f"Transcript saved to {transcript_path}")
         return transcript_path, transcript
@@ -35,7 +47,183 @@ def transcribe_audio(file_path):
     except AttributeError as e:
         print(f"Error: {e}")
         print("Please ensure the correct version of Whisper is installed using 'pip install -U openai-whisper'.")
+        if raise_errors:
+            raise
         return None, None
     except Exception as e:
         print(f"Error during transcription: {e}")
+        if raise_errors:
+            raise
+        return None, None
+
+
+def simplify_segments(segments, offset=0.0):
+    """
+    Keep only the start/end timestamps (shifted by `offset` seconds) and text of Whisper segments.
+    """
+    return [
+        {
+            "start": round(segment["start"] + offset, 2),
+            "end": round(segment["end"] + offset, 2),
+            "text": segment["text"].strip(),
+        }
+        for segment in segments
+    ]
+
+
+def segments_path_for(transcript_path):
+    """
+    Return where the timestamped segments of a transcript are stored: `transcript_segments.json`
+    for the shared transcript, `<name>.segments.json` next to any other transcript.
+    """
+    if os.path.basename(transcript_path) == "transcript.txt":
+        return os.path.join(os.path.dirname(transcript_path), SEGMENTS_FILE)
+    return os.path.splitext(transcript_path)[0] + ".segments.json"
+
+
+def save_segments(segments, segments_path=None):
+    """
+    Save the timestamped segments, by default next to the transcript in the Export Station.
+    """
+    if segments_path is None:
+        os.makedirs(EXPORT_PATH, exist_ok=True)
+        segments_path = os.path.join(EXPORT_PATH, SEGMENTS_FILE)
+    with open(segments_path, "w") as f:
+        json.dump(segments, f, indent=2)
+    return segments_path
+
+
+def find_split_points(audio, chunk_seconds=300, first_chunk_seconds=60, search_seconds=20,
+                      frame_seconds=0.03):
+    """
+    Find sample positions to cut the audio at, one near every chunk boundary.
+
+    The first boundary comes after `first_chunk_seconds` so that the first text shows up quickly,
+    the following ones every `chunk_seconds`. Each cut is moved to the quietest frame within
+    `search_seconds` of its target, so that words are not split in half.
+    """
+    import numpy as np
+
+    frame = int(SAMPLE_RATE * frame_seconds)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return []
+
+    # Per-frame RMS energy, smoothed over ~0.3 s so that a single quiet frame inside a word doesn't win
+    energy = np.sqrt(np.mean(audio[:n_frames * frame].reshape(n_frames, frame) ** 2, axis=1))
+    smooth = max(1, int(0.3 / frame_seconds))
+    energy = np.convolve(energy, np.ones(smooth) / smooth, mode="same")
+
+    duration = len(audio) / SAMPLE_RATE
+    split_points = []
+    target = first_chunk_seconds
+    while target < duration - search_seconds:
+        lo = max(0, int((target - search_seconds) / frame_seconds))
+        hi = min(n_frames, int((target + search_seconds) / frame_seconds))
+        if split_points:
+            lo = max(lo, split_points[-1] // frame + 1)
+        if lo < hi:
+            quietest = lo + int(np.argmin(energy[lo:hi]))
+            split_points.append(quietest * frame)
+        target += chunk_seconds
+    return split_points
+
+
+def limit_torch_threads(num_threads):
+    """
+    Limit torch (and CTranslate2) threads per worker so that the pool doesn't oversubscribe the CPU.
+    """
+    # Read by CTranslate2 when faster-whisper loads its model in this worker
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(num_threads)
+
+
+def _transcribe_piece(index, offset, samples, backend, model_size):
+    """
+    Transcribe one piece of audio in a worker process and shift its timestamps by `offset`.
+    """
+    result = get_transcription_backend(backend, model_size).transcribe(samples)
+    return index, result["text"].strip(), simplify_segments(result["segments"], offset)
+
+
+def iter_transcribe_chunked(file_path, workers=None, chunk_seconds=300, first_chunk_seconds=60,
+                            backend=None, model_size=None):
+    """
+    Split the audio at silences and transcribe the pieces in a process pool.
+
+    Yields dictionaries with `index`, `total`, `text` and `segments` for every piece,
+    in audio order, as soon as a piece and all pieces before it are finished.
+    """
+    audio = load_audio(file_path)
+    cuts = [0] + find_split_points(audio, chunk_seconds, first_chunk_seconds) + [len(audio)]
+    pieces = [(cuts[i], cuts[i + 1]) for i in range(len(cuts) - 1) if cuts[i + 1] > cuts[i]]
+
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(workers or cpu_count, len(pieces)))
+    threads_per_worker = max(1, cpu_count // workers)
+    print(f"Transcribing {len(pieces)} pieces with {workers} workers...")
+
+    # "spawn" avoids forking a parent that may already hold torch thread pools
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=limit_torch_threads, initargs=(threads_per_worker,)) as pool:
+        pending = {
+            pool.submit(_transcribe_piece, index, start / SAMPLE_RATE, audio[start:end], backend, model_size)
+            for index, (start, end) in enumerate(pieces)
+        }
+        finished = {}
+        next_index = 0
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, text, segments = future.result()
+                finished[index] = (text, segments)
+
+            # Emit in order so that the stitched text is always a clean prefix
+            while next_index in finished:
+                text, segments = finished.pop(next_index)
+                yield {"index": next_index, "total": len(pieces), "text": text, "segments": segments}
+                next_index += 1
+
+
+def transcribe_audio_chunked(file_path, workers=None, on_partial=None, chunk_seconds=300, backend=None,
+                             model_size=None, transcript_path=None):
+    """
+    Transcribe a long lecture in parallel pieces.
+
+    `on_partial(transcript_so_far, piece)` is called after every finished piece. The transcript
+    file is rewritten after every piece too, so partial text is available on disk as well.
+    Returns the same `(transcript_path, transcript)` pair as `transcribe_audio`.
+    """
+    try:
+        if transcript_path is None:
+            os.makedirs(EXPORT_PATH, exist_ok=True)
+            transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
+
+        texts = []
+        segments = []
+        for piece in iter_transcribe_chunked(file_path, workers=workers, chunk_seconds=chunk_seconds,
+                                             backend=backend, model_size=model_size):
+            if piece["text"]:
+                texts.append(piece["text"])
+            segments.extend(piece["segments"])
+            transcript = " ".join(texts)
+
+            with open(transcript_path, "w") as f:
+                f.write(transcript)
+            print(f"Transcribed piece {piece['index'] + 1}/{piece['total']}")
+            if on_partial:
+                on_partial(transcript, piece)
+
+        transcript = " ".join(texts)
+        save_segments(segments, segments_path_for(transcript_path))
+        print(f"Transcript saved to {transcript_path}")
+        return transcript_path, transcript
+
+    except Exception as e:
+        print(f"Error during chunked transcription: {e}")
         return None, None
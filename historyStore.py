@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+HISTORY_DIR = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/History"
+
+# Open stores, shared by all sessions of the process
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class HistoryStore:
+    """
+    Append-only chat history in SQLite.
+
+    Every question/answer pair is one inserted row, so saving is O(1) and atomic, and several
+    sessions can write at the same time. Rows can be paged, filtered by lecture or session and
+    searched by full text (FTS5 when the SQLite build has it, LIKE otherwise).
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS qa (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT,
+                lecture TEXT,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                standalone INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_qa_lecture ON qa (lecture, id);
+            CREATE INDEX IF NOT EXISTS idx_qa_session ON qa (session_id, id);
+            CREATE TABLE IF NOT EXISTS imports (path TEXT PRIMARY KEY, sha256 TEXT, rows INTEGER);
+            """
+        )
+        self._add_missing_columns()
+        self.full_text = self._create_fts()
+        self._conn.commit()
+
+    def _add_missing_columns(self):
+        # Stores created before the standalone flag get the column, their rows stay NULL (unknown)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(qa)")}
+        if "standalone" not in columns:
+            self._conn.execute("ALTER TABLE qa ADD COLUMN standalone INTEGER")
+
+    def _create_fts(self):
+        try:
+            self._conn.executescript(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS qa_fts USING fts5(
+                    question, answer, content='qa', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS qa_fts_insert AFTER INSERT ON qa BEGIN
+                    INSERT INTO qa_fts (rowid, question, answer) VALUES (new.id, new.question, new.answer);
+                END;
+                """
+            )
+            return True
+        except sqlite3.OperationalError:
+            print("SQLite has no FTS5, history search falls back to LIKE.")
+            return False
+
+    def append(self, question, answer, lecture=None, session_id=None, standalone=None):
+        """
+        Append one question/answer pair and return its id. `standalone` tells whether the question
+        was asked without earlier turns in the conversation (None when unknown).
+        """
+        if standalone is not None:
+            standalone = int(bool(standalone))
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO qa (session_id, lecture, question, answer, created_at, standalone) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, lecture, question, answer, time.time(), standalone),
+            )
+            return cursor.lastrowid
+
+    def _where(self, lecture=None, session_id=None):
+        clauses, params = [], []
+        if lecture is not None:
+            clauses.append("qa.lecture = ?")
+            params.append(lecture)
+        if session_id is not None:
+            clauses.append("qa.session_id = ?")
+            params.append(session_id)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def page(self, limit=20, offset=0, lecture=None, session_id=None):
+        """
+        Return up to `limit` interactions, newest first, skipping the `offset` newest ones.
+        """
+        where, params = self._where(lecture, session_id)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM qa{where} ORDER BY id DESC LIMIT ? OFFSET ?", params + [limit, offset]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def standalone_answers(self, limit=500, since=None):
+        """
+        Return up to `limit` of the newest standalone interactions that belong to a lecture (and
+        were created after `since`), newest first. Only those can seed an answer cache.
+        """
+        clauses, params = ["lecture IS NOT NULL", "standalone = 1"], []
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM qa WHERE {' AND '.join(clauses)} ORDER BY id DESC LIMIT ?", params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, lecture=None, session_id=None):
+        where, params = self._where(lecture, session_id)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM qa{where}", params).fetchone()[0]
+
+    def search(self, query, limit=20, lecture=None, session_id=None):
+        """
+        Full-text search over past questions and answers, best matches first.
+        """
+        where, params = self._where(lecture, session_id)
+        with self._lock:
+            if self.full_text:
+                # Quote every term so that user input can't break the FTS query syntax
+                terms = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+                if not terms:
+                    return []
+                match = "qa_fts MATCH ?" + (" AND " + where[len(" WHERE "):] if where else "")
+                rows = self._conn.execute(
+                    f"SELECT qa.* FROM qa_fts JOIN qa ON qa.id = qa_fts.rowid WHERE {match} "
+                    "ORDER BY rank LIMIT ?",
+                    [terms] + params + [limit],
+                ).fetchall()
+            else:
+                like = f"%{query}%"
+                match = "(qa.question LIKE ? OR qa.answer LIKE ?)" + (" AND " + where[len(" WHERE "):] if where else "")
+                rows = self._conn.execute(
+                    f"SELECT * FROM qa WHERE {match} ORDER BY id DESC LIMIT ?", [like, like] + params + [limit]
+                ).fetchall()
+        return [dict(row) for row in rows]
+
+    def import_json(self, json_path, lecture=None):
+        """
+        Import an old `askLectures*.json` history file. Each file version is imported only once.
+        Returns the number of imported interactions.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, "rb") as f:
+            content = f.read()
+        sha256 = hashlib.sha256(content).hexdigest()
+
+        with self._lock, self._conn:
+            imported = self._conn.execute("SELECT sha256, rows FROM imports WHERE path = ?", (json_path,)).fetchone()
+            if imported and imported[0] == sha256:
+                return 0
+            try:
+                history = json.loads(content.decode("utf-8").strip() or "[]")
+            except json.JSONDecodeError:
+                history = []
+
+            # The old files were append-only, so a changed file only adds entries after the imported ones
+            already_imported = imported[1] if imported else 0
+
+            # The old files keep no timestamps, keep their order with increasing fake ones
+            created_at = os.path.getmtime(json_path) - len(history)
+            rows = [
+                (None, lecture, item["question"], item["answer"], created_at + i)
+                for i, item in enumerate(history)
+                if i >= already_imported and "question" in item and "answer" in item
+            ]
+            self._conn.executemany(
+                "INSERT INTO qa (session_id, lecture, question, answer, created_at) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.execute("INSERT OR REPLACE INTO imports (path, sha256, rows) VALUES (?, ?, ?)",
+                               (json_path, sha256, max(len(history), already_imported)))
+        print(f"Imported {len(rows)} interactions from {json_path}")
+        return len(rows)
+
+
+def get_history_store(name, history_dir=HISTORY_DIR):
+    """
+    Return the process-wide store `<history_dir>/<name>.sqlite`, migrating `<name>.json` into it
+    the first time it is opened.
+    """
+    path = os.path.join(history_dir, f"{name}.sqlite")
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = HistoryStore(path)
+            store.import_json(os.path.join(history_dir, f"{name}.json"))
+            _stores[path] = store
+        return store
+
+
+def render_history(store, key_prefix, lecture=None, page_size=10):
+    """
+    Streamlit view of a history store: search box, lecture/session filters and pagination.
+    """
+    import streamlit as st
+
+    st.markdown("### Chat History")
+    query = st.text_input("Search past questions and answers:", key=f"{key_prefix}_search")
+    col_lecture, col_session = st.columns(2)
+    only_lecture = col_lecture.checkbox("This lecture only", key=f"{key_prefix}_only_lecture")
+    only_session = col_session.checkbox("This session only", key=f"{key_prefix}_only_session")
+    filters = {
+        "lecture": lecture if only_lecture else None,
+        "session_id": st.session_state.get("session_id") if only_session else None,
+    }
+
+    if query:
+        interactions = store.search(query, limit=page_size * 5, **filters)
+        total = len(interactions)
+    else:
+        pages_key = f"{key_prefix}_pages"
+        pages = st.session_state.setdefault(pages_key, 1)
+        interactions = store.page(limit=page_size * pages, **filters)
+        total = store.count(**filters)
+
+    for interaction in interactions:
+        st.markdown(f"**You:** {interaction['question']}")
+        st.markdown(f"**Lecture:** {interaction['answer']}")
+        st.markdown("---")
+
+    if not query and len(interactions) < total:
+        if st.button(f"Show more ({total - len(interactions)} older)", key=f"{key_prefix}_more"):
+            st.session_state[pages_key] += 1
+            st.rerun()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate old JSON chat histories into the SQLite history store.")
+    parser.add_argument("json_files", nargs="*", help="JSON history files (default: the askLectures*.json files)")
+    parser.add_argument("--history-dir", default=HISTORY_DIR, help="Directory holding the history stores")
+    args = parser.parse_args()
+
+    json_files = args.json_files or [
+        os.path.join(args.history_dir, name) for name in ("askLectures.json", "askLecturesOffline.json")
+    ]
+    for json_path in json_files:
+        name = os.path.splitext(os.path.basename(json_path))[0]
+        store = get_history_store(name, args.history_dir)
+        store.import_json(json_path)
+        print(f"{store.path}: {store.count()} interactions")
+
+
+if __name__ == "__main__":
+    main()
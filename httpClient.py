@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from llmCache import CACHE_DIR
+
+SERP_API_URL = os.getenv("SERP_API_URL", "https://serpapi.com/search")
+HTTP_CACHE_PATH = os.path.join(CACHE_DIR, "http_cache.sqlite")
+# (connect, read) timeouts in seconds
+HTTP_TIMEOUT = (float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")), float(os.getenv("HTTP_READ_TIMEOUT", "20")))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+# Search results change slowly, so identical queries are answered from the cache for a day
+SERP_CACHE_TTL_HOURS = float(os.getenv("SERP_CACHE_TTL_HOURS", "24"))
+SERP_MAX_WORKERS = int(os.getenv("SERP_MAX_WORKERS", "4"))
+
+# Parameters that don't change the response (and must not end up in the cache)
+_UNCACHED_PARAMS = {"api_key"}
+
+
+def request_key(url, params):
+    """
+    Hash of the URL and the query parameters that affect the response.
+    """
+    relevant = {key: str(value) for key, value in params.items() if key not in _UNCACHED_PARAMS}
+    payload = json.dumps([url, relevant], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of JSON responses that expire after `ttl_hours`.
+    """
+
+    def __init__(self, path=HTTP_CACHE_PATH, ttl_hours=SERP_CACHE_TTL_HOURS):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_hours * 3600
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, url TEXT, value TEXT, created_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or time.time() - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, url, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, url, value, created_at) VALUES (?, ?, ?, ?)",
+                (key, url, json.dumps(value), time.time()),
+            )
+            self._conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+class HttpClient:
+    """
+    Shared HTTP client: one pooled keep-alive session with timeouts and retries on
+    rate limits and server errors, and a persistent cache for GET requests returning JSON.
+    """
+
+    def __init__(self, cache=None, timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES, pool_size=SERP_MAX_WORKERS):
+        self.cache = cache
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.requests = 0
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get_json(self, url, params, use_cache=True):
+        """
+        GET `url` with `params` and return the decoded JSON, from the cache when possible.
+        """
+        key = request_key(url, params)
+        if use_cache and self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        self.requests += 1
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        # Don't keep error payloads (e.g. exhausted quota) around for a day
+        if self.cache is not None and not (isinstance(data, dict) and data.get("error")):
+            self.cache.set(key, url, data)
+        return data
+
+    def get_many(self, url, params_list, use_cache=True):
+        """
+        Run several GET requests concurrently over the pooled connections.
+        Returns one `(data, error)` pair per request, in order.
+        """
+        def fetch(params):
+            try:
+                return self.get_json(url, params, use_cache=use_cache), None
+            except Exception as e:
+                return None, e
+
+        if len(params_list) <= 1:
+            return [fetch(params) for params in params_list]
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(params_list))) as pool:
+            return list(pool.map(fetch, params_list))
+
+
+def merge_results(result_lists, limit=None, key="link"):
+    """
+    Merge ranked result lists round-robin (first results of every list first), dropping
+    results whose `key` was already seen. Results without a `key` are compared by title.
+    """
+    merged = []
+    seen = set()
+    for rank in range(max((len(results) for results in result_lists), default=0)):
+        for results in result_lists:
+            if rank >= len(results):
+                continue
+            result = results[rank]
+            identity = (result.get(key) or result.get("title") or "").strip().lower().rstrip("/")
+            if not identity or identity in seen:
+                continue
+            seen.add(identity)
+            merged.append(result)
+            if limit is not None and len(merged) >= limit:
+                return merged
+    return merged
+
+
+def serp_search(queries, api_key, engine="google_scholar", num_results=5, client=None, use_cache=True, url=None):
+    """
+    Send one SerpAPI search per query concurrently and return the `organic_results` of each
+    (an empty list for failed queries), in the order of `queries`.
+    """
+    client = client or get_http_client()
+    # Repeated queries are only sent once
+    unique = list(dict.fromkeys(queries))
+    params_list = [{"q": query, "api_key": api_key, "num": num_results, "engine": engine} for query in unique]
+    results = {}
+    responses = client.get_many(url or SERP_API_URL, params_list, use_cache=use_cache)
+    for query, (data, error) in zip(unique, responses):
+        if error is None and data.get("error"):
+            error = data["error"]
+        if error is not None:
+            print(f"[HttpClient] Search failed for {query!r}: {error}")
+            results[query] = []
+        else:
+            results[query] = data.get("organic_results", [])
+    return [results[query] for query in queries]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """
+    Return the process-wide HTTP client (and its response cache).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient(cache=ResponseCache())
+        return _client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the cached search responses or run a test search.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show the size of the response cache")
+    subparsers.add_parser("purge", help="Remove expired responses")
+    subparsers.add_parser("clear", help="Remove all cached responses")
+    search_parser = subparsers.add_parser("search", help="Search the given queries concurrently")
+    search_parser.add_argument("queries", nargs="+")
+    search_parser.add_argument("--engine", default="google_scholar")
+    search_parser.add_argument("--mock", action="store_true", help="Use a local mock SerpAPI server")
+    args = parser.parse_args()
+
+    if args.command == "search":
+        from dotenv import load_dotenv
+        load_dotenv()
+        api_key, url, client = os.getenv("SERP_API_KEY"), None, get_http_client()
+        if args.mock:
+            import tempfile
+            from llmStubs import MockSerpServer
+            server = MockSerpServer(latency=0.2).start()
+            api_key, url = "mock", server.url
+            client = HttpClient(cache=ResponseCache(os.path.join(tempfile.mkdtemp(), "mock_cache.sqlite")))
+        for attempt in ("cold", "warm"):
+            start = time.perf_counter()
+            results = serp_search(args.queries, api_key, engine=args.engine, client=client, url=url)
+            merged = merge_results(results)
+            print(f"{attempt}: {len(merged)} results in {time.perf_counter() - start:.2f}s, "
+                  f"{client.requests} requests so far")
+        for result in merged:
+            print(f"- {result.get('title')}: {result.get('link')}")
+        if args.mock:
+            server.stop()
+        return
+
+    cache = get_http_client().cache
+    if args.command == "stats":
+        print(cache.stats())
+    elif args.command == "purge":
+        print(f"Removed {cache.purge_expired()} expired responses")
+    elif args.command == "clear":
+        cache.clear()
+        print("Response cache cleared")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import os
+import re
+import math
+import threading
+from typing import Optional
+from collections import Counter
+
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from modelRegistry import get_cross_encoder
+
+# Retrieval settings: "hybrid" fuses BM25 and FAISS scores, "dense" is plain FAISS search
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+# Weight of the dense score in the fusion (1 - alpha goes to BM25)
+RETRIEVAL_ALPHA = float(os.getenv("RETRIEVAL_ALPHA", "0.5"))
+RETRIEVAL_RERANK = os.getenv("RETRIEVAL_RERANK", "0") == "1"
+
+STOPWORDS = set(
+    "a an and are as at be but by do does for from has have how i in is it its of on or so that the "
+    "this to was we what when where which who why will with you your they them then there these".split()
+)
+
+# BM25 indexes built from lecture indexes, rebuilt when the lecture index changes
+_bm25_indexes = {}
+_bm25_lock = threading.Lock()
+
+
+def tokenize(text):
+    return [token for token in re.findall(r"\w+", text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Sparse inverted index with Okapi BM25 scoring.
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        """
+        `documents` is a list of `(doc_id, text)` pairs.
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.doc_lengths = []
+        self.postings = {}  # term -> list of (document number, term frequency)
+        for number, (doc_id, text) in enumerate(documents):
+            counts = Counter(tokenize(text))
+            self.doc_ids.append(doc_id)
+            self.doc_lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, []).append((number, frequency))
+        self.average_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    def search(self, query, k=20):
+        """
+        Return the `k` best `(doc_id, score)` pairs for the query.
+        """
+        n = len(self.doc_ids)
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for number, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[number] / (self.average_length or 1))
+                scores[number] = scores.get(number, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[number], score) for number, score in best]
+
+
+def get_bm25_index(lecture_index, lecture_hash=None):
+    """
+    Return the BM25 index over the chunks of a lecture index (or of one lecture in it),
+    rebuilding it only after the lecture index has changed.
+    """
+    key = (lecture_index.index_path, lecture_hash)
+    with _bm25_lock:
+        cached = _bm25_indexes.get(key)
+        if cached is None or cached[0] != lecture_index.version or cached[1] is not lecture_index:
+            documents = [(doc_id, doc.page_content) for doc_id, doc in lecture_index.documents(lecture_hash)]
+            cached = (lecture_index.version, lecture_index, BM25Index(documents))
+            _bm25_indexes[key] = cached
+        return cached[2]
+
+
+def _min_max(scores):
+    if not scores:
+        return {}
+    low, high = min(scores.values()), max(scores.values())
+    if high == low:
+        return {key: 1.0 for key in scores}
+    return {key: (value - low) / (high - low) for key, value in scores.items()}
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    LangChain retriever fusing BM25 and FAISS scores over the chunks of a lecture index,
+    with optional cross-encoder re-ranking of the fused candidates. With `lecture_hash`, only
+    the chunks of that lecture are retrieved, although the index holds many lectures.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    lecture_index: object
+    lecture_hash: Optional[str] = None
+    k: int = RETRIEVAL_K
+    fetch_k: int = RETRIEVAL_FETCH_K
+    alpha: float = RETRIEVAL_ALPHA
+    rerank: bool = RETRIEVAL_RERANK
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        vectorstore = self.lecture_index.vectorstore
+        if vectorstore is None:
+            return []
+
+        # FAISS returns L2 distances (smaller is better), turn them into similarities
+        dense = {}
+        documents = {}
+        search_kwargs = {}
+        if self.lecture_hash is not None:
+            # FAISS filters after the search, so every chunk is a candidate
+            search_kwargs = {"filter": {"lecture": self.lecture_hash}, "fetch_k": vectorstore.index.ntotal}
+        for doc, distance in vectorstore.similarity_search_with_score(query, k=self.fetch_k, **search_kwargs):
+            doc_id = f"{doc.metadata.get('lecture')}:{doc.metadata.get('chunk')}"
+            dense[doc_id] = -float(distance)
+            documents[doc_id] = doc
+
+        sparse = dict(get_bm25_index(self.lecture_index, self.lecture_hash).search(query, k=self.fetch_k))
+        for doc_id in sparse:
+            if doc_id not in documents:
+                doc = vectorstore.docstore.search(doc_id)
+                if hasattr(doc, "page_content"):
+                    documents[doc_id] = doc
+
+        dense, sparse = _min_max(dense), _min_max(sparse)
+        fused = {
+            doc_id: self.alpha * dense.get(doc_id, 0.0) + (1 - self.alpha) * sparse.get(doc_id, 0.0)
+            for doc_id in documents
+        }
+        candidates = sorted(fused, key=fused.get, reverse=True)
+
+        if self.rerank and candidates:
+            candidates = candidates[:self.fetch_k]
+            cross_encoder = get_cross_encoder()
+            scores = cross_encoder.predict([(query, documents[doc_id].page_content) for doc_id in candidates])
+            candidates = [doc_id for _, doc_id in sorted(zip(scores, candidates), key=lambda pair: pair[0], reverse=True)]
+
+        return [documents[doc_id] for doc_id in candidates[:self.k]]
+
+
+def build_retriever(lecture_index, mode=RETRIEVAL_MODE, lecture_hash=None, **options):
+    """
+    Return the retriever for the chat chains: hybrid BM25 + FAISS by default, plain FAISS with
+    `mode="dense"`. With `lecture_hash`, only chunks of that lecture are retrieved.
+    """
+    if mode == "dense":
+        return lecture_index.as_retriever(lecture_hash, k=options.get("k", RETRIEVAL_K))
+    return HybridRetriever(lecture_index=lecture_index, lecture_hash=lecture_hash, **options)
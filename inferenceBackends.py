@@ -0,0 +1,232 @@
+import os
+import time
+import difflib
+import argparse
+
+from llmCache import CACHE_DIR
+
+# Inference backend of the offline models: "torch" (fp32 eager), "int8" (dynamic quantization)
+# or "onnx" (ONNX Runtime export, needs `optimum[onnxruntime]`)
+BACKENDS = ("torch", "int8", "onnx")
+OFFLINE_BACKEND = os.getenv("OFFLINE_BACKEND", "torch")
+# CPU threads used by torch / ONNX Runtime (0 keeps the library default)
+NUM_THREADS = int(os.getenv("OFFLINE_NUM_THREADS", "0"))
+ONNX_DIR = os.path.join(CACHE_DIR, "onnx")
+
+PARITY_TEXT = (
+    "Cloud computing delivers computing resources such as servers, storage and databases over the internet. "
+    "Instead of owning data centers, companies rent capacity from providers and pay only for what they use. "
+    "The main service models are infrastructure, platform and software as a service, and each one moves "
+    "more of the operational work from the customer to the provider."
+)
+
+
+def check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+def _onnx_session_options(num_threads):
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    if num_threads:
+        options.intra_op_num_threads = num_threads
+    return options
+
+
+def _quantize(module):
+    """
+    Replace the Linear layers of a torch module by int8 dynamically quantized ones (in place).
+    """
+    import torch
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_seq2seq(model_name, backend=OFFLINE_BACKEND, num_threads=NUM_THREADS):
+    """
+    Return `(tokenizer, model)` of a seq2seq model (e.g. Flan-T5) served by the given backend.
+    All backends expose the same `generate` interface and accept torch tensors.
+    """
+    from transformers import AutoTokenizer
+
+    check_backend(backend)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        # Export once, later loads read the exported graphs from the cache directory
+        export_path = os.path.join(ONNX_DIR, model_name.replace("/", "--"))
+        session_options = _onnx_session_options(num_threads)
+        if os.path.isdir(export_path):
+            model = ORTModelForSeq2SeqLM.from_pretrained(export_path, session_options=session_options)
+        else:
+            print(f"[Inference] Exporting {model_name} to ONNX...")
+            model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, session_options=session_options)
+            model.save_pretrained(export_path)
+        return tokenizer, model
+
+    import torch
+    from transformers import AutoModelForSeq2SeqLM
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model.eval()
+    if backend == "int8":
+        model = _quantize(model)
+    return tokenizer, model
+
+
+def load_sentence_embeddings(model_name, backend=OFFLINE_BACKEND, num_threads=NUM_THREADS):
+    """
+    Return a LangChain `HuggingFaceEmbeddings` for a sentence-transformers model served by the
+    given backend. The ONNX backend needs sentence-transformers >= 3.2.
+    """
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    check_backend(backend)
+    if backend == "onnx":
+        model_kwargs = {"backend": "onnx"}
+        if num_threads:
+            model_kwargs["model_kwargs"] = {"session_options": _onnx_session_options(num_threads)}
+        return HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs)
+
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
+    embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    if backend == "int8":
+        _quantize(embeddings.client)
+    return embeddings
+
+
+def warm_up_seq2seq(tokenizer, model):
+    """
+    Run one short generation so that the first real request doesn't pay for lazy initialization.
+    """
+    start = time.perf_counter()
+    encoded = tokenizer(["Summarize: warm up."], return_tensors="pt")
+    model.generate(**encoded, max_new_tokens=4)
+    return time.perf_counter() - start
+
+
+def warm_up_embeddings(embeddings):
+    start = time.perf_counter()
+    embeddings.embed_query("warm up")
+    return time.perf_counter() - start
+
+
+def _generate(tokenizer, model, prompts, max_new_tokens):
+    import torch
+
+    start = time.perf_counter()
+    encoded = tokenizer(prompts, padding=True, truncation=True, max_length=512, return_tensors="pt")
+    with torch.inference_mode():
+        generated = model.generate(**encoded, max_new_tokens=max_new_tokens)
+    outputs = tokenizer.batch_decode(generated, skip_special_tokens=True)
+    return outputs, time.perf_counter() - start
+
+
+def seq2seq_parity(model_name, prompts, backend, reference="torch", max_new_tokens=64, num_threads=NUM_THREADS):
+    """
+    Compare the generations of `backend` with the ones of `reference` on the same prompts.
+    Returns exact-match rate, mean text similarity, and the time taken by each backend.
+    """
+    results = {}
+    for name in (reference, backend):
+        tokenizer, model = load_seq2seq(model_name, name, num_threads)
+        warm_up_seq2seq(tokenizer, model)
+        results[name] = _generate(tokenizer, model, prompts, max_new_tokens)
+        del model
+
+    (expected, reference_seconds), (actual, backend_seconds) = results[reference], results[backend]
+    similarities = [difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(expected, actual)]
+    return {
+        "model": model_name,
+        "backend": backend,
+        "reference": reference,
+        "prompts": len(prompts),
+        "exact_match": round(sum(a == b for a, b in zip(expected, actual)) / len(prompts), 3),
+        "mean_similarity": round(sum(similarities) / len(similarities), 3),
+        "reference_seconds": round(reference_seconds, 2),
+        "backend_seconds": round(backend_seconds, 2),
+        "speedup": round(reference_seconds / backend_seconds, 2) if backend_seconds else None,
+        "mismatches": [
+            {"prompt": prompt[:80], "reference": a, "backend": b}
+            for prompt, a, b in zip(prompts, expected, actual) if a != b
+        ],
+    }
+
+
+def embeddings_parity(model_name, texts, backend, reference="torch", num_threads=NUM_THREADS):
+    """
+    Compare the sentence embeddings of `backend` with the ones of `reference` (cosine similarity).
+    """
+    import numpy as np
+
+    results = {}
+    for name in (reference, backend):
+        embeddings = load_sentence_embeddings(model_name, name, num_threads)
+        warm_up_embeddings(embeddings)
+        start = time.perf_counter()
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype="float32")
+        results[name] = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True), time.perf_counter() - start)
+
+    (expected, reference_seconds), (actual, backend_seconds) = results[reference], results[backend]
+    cosines = (expected * actual).sum(axis=1)
+    return {
+        "model": model_name,
+        "backend": backend,
+        "reference": reference,
+        "texts": len(texts),
+        "min_cosine": round(float(cosines.min()), 4),
+        "mean_cosine": round(float(cosines.mean()), 4),
+        "reference_seconds": round(reference_seconds, 2),
+        "backend_seconds": round(backend_seconds, 2),
+        "speedup": round(reference_seconds / backend_seconds, 2) if backend_seconds else None,
+    }
+
+
+def parity_samples(transcript_path=None, samples=4, chunk_chars=1500):
+    """
+    Return up to `samples` text chunks of a transcript (or a built-in paragraph) for the parity check.
+    """
+    if transcript_path and os.path.exists(transcript_path):
+        with open(transcript_path, "r") as f:
+            transcript = f.read()
+        chunks = [transcript[i:i + chunk_chars] for i in range(0, len(transcript), chunk_chars)]
+        chunks = [chunk for chunk in chunks if chunk.strip()]
+        if chunks:
+            step = max(1, len(chunks) // samples)
+            return chunks[::step][:samples]
+    return [PARITY_TEXT]
+
+
+def main():
+    from modelRegistry import FLAN_T5_MODEL, MINILM_MODEL
+    from structuredInfoOff import TITLE_TEMPLATE, SUMMARY_TEMPLATE, KEY_POINTS_TEMPLATE
+
+    parser = argparse.ArgumentParser(description="Check an offline inference backend against fp32 PyTorch.")
+    parser.add_argument("--backend", choices=BACKENDS, default="int8")
+    parser.add_argument("--reference", choices=BACKENDS, default="torch")
+    parser.add_argument("--transcript", help="Transcript to take sample chunks from")
+    parser.add_argument("--samples", type=int, default=4, help="Number of sample chunks")
+    parser.add_argument("--threads", type=int, default=NUM_THREADS, help="CPU threads (0 = library default)")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    chunks = parity_samples(args.transcript, args.samples)
+    prompts = [template.format(chunk=chunk) for chunk in chunks
+               for template in (TITLE_TEMPLATE, SUMMARY_TEMPLATE, KEY_POINTS_TEMPLATE)]
+
+    report = seq2seq_parity(FLAN_T5_MODEL, prompts, args.backend, args.reference, args.max_new_tokens, args.threads)
+    for mismatch in report.pop("mismatches"):
+        print(f"- {mismatch['prompt']!r}\n  {args.reference}: {mismatch['reference']!r}\n  {args.backend}: {mismatch['backend']!r}")
+    print(f"Flan-T5: {report}")
+    print(f"MiniLM: {embeddings_parity(MINILM_MODEL, chunks, args.backend, args.reference, args.threads)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import os
+import re
+import math
+import argparse
+from collections import Counter
+
+from chunking import chunk_transcript
+
+# "llm": keywords proposed by the LLM for every chunk, ranked locally
+# "tfidf": no LLM at all, ranked by TF-IDF across the chunks
+# "embedding": TF-IDF candidates re-ranked by MiniLM similarity to the whole lecture (KeyBERT-style)
+KEYWORD_MODE = os.getenv("KEYWORD_MODE", "llm")
+NUM_KEYWORDS = 7
+KEYWORD_CONCURRENCY = int(os.getenv("KEYWORD_CONCURRENCY", "8"))
+# Keywords asked from the LLM per chunk, more than needed so that the ranking has a choice
+KEYWORDS_PER_CHUNK = 10
+# TF-IDF candidates re-ranked by the embedding mode
+EMBEDDING_CANDIDATES = 30
+# With fewer chunks than this (a typical lecture has about 3 "keywords" chunks) every phrase is in
+# most chunks and the IDF carries no information, so phrases are ranked by their frequency alone
+MIN_IDF_CHUNKS = 5
+
+KEYWORD_TEMPLATE = (
+    "Extract {num_keywords} academic and research-oriented keywords from this text. "
+    "Answer with the keywords only, separated by commas.\n\n{text}\n\nKeywords:"
+)
+
+_ENGLISH_STOPWORDS = set("""
+a about above after again against all also am an and any are aren't as at be because been before being below
+between both but by can can't cannot could couldn't did didn't do does doesn't doing don't down during each
+even every few for from further get gets getting go goes going gonna got had hadn't has hasn't have haven't
+having he he'd he'll he's her here here's hers herself him himself his how how's i i'd i'll i'm i've if in into
+is isn't it it's its itself just kind know let's like lot make many may maybe me might more most much must
+mustn't my myself need no nor not now of off okay on once one only or other ought our ours ourselves out over
+own really right said same say says see shan't she she'd she'll she's should shouldn't so some something such
+sure take than that that's the their theirs them themselves then there there's these they they'd they'll
+they're they've thing things think this those through to too two uh um under until up us use used using very
+want was wasn't way we we'd we'll we're we've well were weren't what what's when when's where where's which
+while who who's whom why why's will with won't would wouldn't yeah yes you you'd you'll you're you've your
+yours yourself yourselves
+""".split())
+
+# Spoken filler that is frequent in lecture transcripts but never a topic
+_SPOKEN_FILLER = set("""
+actually alright anyway basically bit check come comes coming course definitely doing done everybody everyone
+example forget gonna guys hello hey hopefully kinda literally little look looking looks mean means obviously ok
+oh people pretty quick quite saying sort start started stuff talk talked talking thank thanks time today trying
+video wanna welcome whatever words working
+""".split())
+
+STOPWORDS = _ENGLISH_STOPWORDS | _SPOKEN_FILLER
+
+_WORD = re.compile(r"[a-z][a-z0-9'\-]*")
+
+
+def split_chunks(text):
+    """
+    Split text into the large "keywords" chunks (see chunking.CHUNK_PROFILES), which keep
+    the number of LLM calls low; they all run concurrently.
+    """
+    return [chunk["text"] for chunk in chunk_transcript(text, profile="keywords")]
+
+
+def normalize_keyword(keyword):
+    keyword = re.sub(r"^\s*(\d+[.)]|[-*•])\s*", "", keyword)
+    return re.sub(r"\s+", " ", keyword.strip(" \t\n\"'.;:")).lower()
+
+
+def parse_keywords(reply):
+    """
+    Split an LLM reply into normalized keywords (commas, semicolons, new lines or numbered lists).
+    """
+    keywords = (normalize_keyword(part) for part in re.split(r"[,;\n]", reply))
+    return [keyword for keyword in keywords if keyword and len(keyword) <= 60]
+
+
+def candidate_phrases(text, max_words=3):
+    """
+    Count the phrases of 1 to `max_words` words without stopwords.
+    """
+    counts = Counter()
+    for run in re.split(r"[.!?,;:()\n]", text.lower()):
+        words = _WORD.findall(run)
+        for size in range(1, max_words + 1):
+            for i in range(len(words) - size + 1):
+                phrase = words[i:i + size]
+                if any(word in STOPWORDS for word in phrase) or len(phrase[-1]) < 3:
+                    continue
+                counts[" ".join(phrase)] += 1
+    return counts
+
+
+def count_phrase(phrase, text):
+    """
+    Count the whole-word occurrences of `phrase` in lowercase `text` (so "ai" isn't found in "said").
+    """
+    return len(re.findall(r"\b" + re.escape(phrase) + r"\b", text))
+
+
+def tfidf_scores(chunks, phrases=None):
+    """
+    Score phrases by their TF-IDF summed over the chunks (each chunk is one document), or by their
+    frequency alone with fewer than MIN_IDF_CHUNKS chunks.
+    Multi-word phrases get a small bonus since they are more specific than single words.
+    """
+    counts = [candidate_phrases(chunk) for chunk in chunks]
+    if phrases is not None:
+        # Phrases proposed elsewhere (e.g. by the LLM) are counted where they appear
+        counts = [Counter({phrase: count_phrase(phrase, chunk.lower()) for phrase in phrases}) for chunk in chunks]
+    document_frequency = Counter(phrase for chunk_counts in counts for phrase in chunk_counts
+                                 if chunk_counts[phrase])
+    scores = Counter()
+    for chunk_counts in counts:
+        total = sum(chunk_counts.values()) or 1
+        for phrase, count in chunk_counts.items():
+            if not count:
+                continue
+            idf = 1
+            if len(chunks) >= MIN_IDF_CHUNKS:
+                idf = math.log((1 + len(chunks)) / (1 + document_frequency[phrase])) + 1
+            scores[phrase] += count / total * idf * (1 + 0.25 * (len(phrase.split()) - 1))
+    return scores
+
+
+def select_keywords(ranked, num_keywords):
+    """
+    Take the best keywords in order. A phrase containing already chosen keywords replaces them
+    (e.g. "gradient descent" replaces "gradient"), and keywords that are only a part of a chosen
+    phrase are skipped (e.g. "descent" after "gradient descent").
+    """
+    chosen = []
+    for keyword in ranked:
+        words = set(keyword.split())
+        if any(words <= set(other.split()) for other in chosen):
+            continue
+        parts = [other for other in chosen if set(other.split()) < words]
+        if parts:
+            position = chosen.index(parts[0])
+            chosen = [other for other in chosen if other not in parts]
+            chosen.insert(position, keyword)
+        else:
+            chosen.append(keyword)
+        if len(chosen) == num_keywords:
+            break
+    return chosen
+
+
+def extract_keywords_tfidf(transcript, num_keywords=NUM_KEYWORDS):
+    chunks = split_chunks(transcript)
+    scores = tfidf_scores(chunks)
+    return select_keywords([phrase for phrase, _ in scores.most_common()], num_keywords)
+
+
+def extract_keywords_embedding(transcript, num_keywords=NUM_KEYWORDS):
+    """
+    KeyBERT-style: the TF-IDF candidates closest to the embedding of the whole lecture win.
+    """
+    import numpy as np
+    from modelRegistry import get_minilm_embeddings
+
+    chunks = split_chunks(transcript)
+    candidates = [phrase for phrase, _ in tfidf_scores(chunks).most_common(EMBEDDING_CANDIDATES)]
+    if not candidates:
+        return []
+    embeddings = get_minilm_embeddings()
+    chunk_vectors = np.array(embeddings.embed_documents(chunks))
+    lecture_vector = chunk_vectors.mean(axis=0)
+    candidate_vectors = np.array(embeddings.embed_documents(candidates))
+    similarity = candidate_vectors @ lecture_vector / (
+        np.linalg.norm(candidate_vectors, axis=1) * np.linalg.norm(lecture_vector) + 1e-9
+    )
+    ranked = [candidates[i] for i in np.argsort(-similarity)]
+    return select_keywords(ranked, num_keywords)
+
+
+def extract_keywords_llm(transcript, num_keywords=NUM_KEYWORDS, llm=None, concurrency=KEYWORD_CONCURRENCY,
+                         use_cache=True, stats=None):
+    """
+    Ask the LLM for keywords of every chunk concurrently, then rank them by how many chunks
+    proposed them and by their TF-IDF in the transcript.
+    """
+    from langchain.prompts import PromptTemplate
+    from langchain.chains import LLMChain
+    from llmCache import get_llm_cache
+    from asyncStructurer import iter_requests
+
+    if llm is None:
+        from langchain_community.llms import OpenAI
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not openai_api_key:
+            raise ValueError("OPENAI_API_KEY is not set in the .env file.")
+        llm = OpenAI(openai_api_key=openai_api_key, temperature=0)
+
+    chain = LLMChain(llm=llm, prompt=PromptTemplate(template=KEYWORD_TEMPLATE))
+    template = KEYWORD_TEMPLATE.replace("{num_keywords}", str(KEYWORDS_PER_CHUNK))
+    cache = get_llm_cache()
+    model_id = f"openai:{llm.model_name}:t{llm.temperature}"
+    stats = stats if stats is not None else {}
+    stats.setdefault("calls", 0)
+
+    async def agenerate(chunk):
+        reply = cache.get(model_id, template, chunk) if use_cache else None
+        if reply is None:
+            stats["calls"] += 1
+            reply = (await chain.arun({"text": chunk, "num_keywords": KEYWORDS_PER_CHUNK})).strip()
+            if use_cache:
+                cache.set(model_id, template, chunk, reply)
+        return reply
+
+    chunks = split_chunks(transcript)
+    proposals = Counter()
+    for _, reply in iter_requests(chunks, agenerate, concurrency=concurrency):
+        proposals.update(set(parse_keywords(reply)))
+    stats["chunks"] = len(chunks)
+
+    tfidf = tfidf_scores(chunks, phrases=list(proposals))
+    top_tfidf = max(tfidf.values(), default=0) or 1
+    ranked = sorted(proposals, key=lambda keyword: (proposals[keyword] + tfidf[keyword] / top_tfidf, keyword),
+                    reverse=True)
+    return select_keywords(ranked, num_keywords)
+
+
+def extract_keywords(transcript, num_keywords=NUM_KEYWORDS, mode=None, **options):
+    """
+    Extract the `num_keywords` most relevant keywords of a transcript with the given mode
+    ("llm", "tfidf" or "embedding"; default from KEYWORD_MODE).
+    """
+    mode = mode or KEYWORD_MODE
+    if mode == "tfidf":
+        return extract_keywords_tfidf(transcript, num_keywords)
+    if mode == "embedding":
+        return extract_keywords_embedding(transcript, num_keywords)
+    if mode == "llm":
+        return extract_keywords_llm(transcript, num_keywords, **options)
+    raise ValueError(f"Unknown keyword mode: {mode}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the academic keywords of a transcript.")
+    parser.add_argument("transcript", help="Transcript file")
+    parser.add_argument("--mode", choices=["llm", "tfidf", "embedding"], default=KEYWORD_MODE)
+    parser.add_argument("--num", type=int, default=NUM_KEYWORDS, help="Number of keywords")
+    args = parser.parse_args()
+
+    with open(args.transcript, "r") as f:
+        transcript = f.read()
+    stats = {}
+    options = {"stats": stats} if args.mode == "llm" else {}
+    keywords = extract_keywords(transcript, args.num, mode=args.mode, **options)
+    print(", ".join(keywords))
+    if stats:
+        print(stats)
+
+
+if __name__ == "__main__":
+    main()
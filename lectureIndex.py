@@ -0,0 +1,246 @@
+import os
+import json
+import hashlib
+import threading
+from langchain_community.vectorstores import FAISS
+from chunking import chunk_transcript, chunking_id, load_segments
+
+MANIFEST_FILE = "lectures.json"
+
+# Loaded indexes, shared by all sessions of the process
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def text_hash(text):
+    """
+    Return the SHA-256 of a transcript, used as the lecture key in the index.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def transcript_hash(transcript_path):
+    """
+    Return the lecture key of a transcript file, or None if it doesn't exist.
+    """
+    if not os.path.exists(transcript_path):
+        return None
+    with open(transcript_path, "r") as f:
+        return text_hash(f.read())
+
+
+class LectureIndex:
+    """
+    Persistent FAISS index holding chunk-level embeddings of many lectures.
+
+    Every lecture is keyed by the hash of its transcript, so syncing a transcript that is
+    already indexed costs one hash, and only new transcripts are embedded and appended.
+    Chunks are sized in the tokens of the embedding model (`chunk_profile`, see
+    chunking.CHUNK_PROFILES). Transcripts with Whisper segments are chunked along segment
+    boundaries and their chunks carry `start`/`end` timestamps.
+    """
+
+    def __init__(self, index_path, embeddings, embedding_id, chunk_profile="index_online"):
+        self.index_path = index_path
+        self.embeddings = embeddings
+        self.embedding_id = embedding_id
+        self.chunk_profile = chunk_profile
+        self.chunking_id = chunking_id(chunk_profile)
+        # Increases whenever lectures are added or removed, so derived indexes know when to rebuild
+        self.version = 0
+        self.vectorstore = None
+        self.manifest = {"embedding": embedding_id, "chunking": self.chunking_id, "lectures": {}}
+        self._lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        """
+        Load the index and its manifest from disk. Indexes built with another embedding model or
+        chunking, or without a manifest (the old single-vector stores), are ignored and rebuilt.
+        """
+        manifest_path = os.path.join(self.index_path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("embedding") != self.embedding_id:
+            print(f"Index at {self.index_path} uses another embedding model, rebuilding it.")
+            return
+        if manifest.get("chunking") != self.chunking_id:
+            print(f"Index at {self.index_path} was chunked differently, rebuilding it.")
+            return
+        self.vectorstore = FAISS.load_local(
+            self.index_path, self.embeddings, allow_dangerous_deserialization=True
+        )
+        self.manifest = manifest
+
+    def save(self):
+        os.makedirs(self.index_path, exist_ok=True)
+        self.vectorstore.save_local(self.index_path)
+        manifest_path = os.path.join(self.index_path, MANIFEST_FILE)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def has_lecture(self, lecture_hash):
+        return lecture_hash in self.manifest["lectures"]
+
+    def split_transcript(self, transcript, segments=None):
+        """
+        Return the chunks of a transcript as dicts with `text` (and `start`/`end` with segments).
+        """
+        chunks = chunk_transcript(transcript, segments, self.chunk_profile)
+        return [{key: value for key, value in chunk.items() if value is not None} for chunk in chunks]
+
+    def add_transcript(self, transcript, source=None, segments=None, embedded=None):
+        """
+        Embed and append a transcript unless its content is already indexed.
+        `embedded` optionally holds `(chunk, vector)` pairs computed beforehand (e.g. while the
+        lecture was still being transcribed); they are used if they match the transcript's chunks.
+        Returns the lecture hash; transcripts without text are not indexed (see `has_lecture`).
+        """
+        lecture_hash = text_hash(transcript)
+        with self._lock:
+            if self.has_lecture(lecture_hash):
+                return lecture_hash
+
+            # A changed transcript file replaces its earlier version in the index
+            if source is not None:
+                for old_hash, lecture in list(self.manifest["lectures"].items()):
+                    if lecture["source"] == source:
+                        print(f"{source} changed, removing its earlier version from the index.")
+                        self.remove_lecture(old_hash)
+
+            timed_chunks = self.split_transcript(transcript, segments)
+            chunks = [chunk["text"] for chunk in timed_chunks]
+            if not chunks:
+                return lecture_hash
+            ids = [f"{lecture_hash}:{i}" for i in range(len(chunks))]
+            metadatas = [
+                dict({"lecture": lecture_hash, "source": source, "chunk": i},
+                     **{key: chunk[key] for key in ("start", "end") if key in chunk})
+                for i, chunk in enumerate(timed_chunks)
+            ]
+
+            if embedded and [chunk["text"] for chunk, _ in embedded] == chunks:
+                vectors = [vector for _, vector in embedded]
+            else:
+                print(f"Embedding {len(chunks)} chunks of {source or lecture_hash[:12]}...")
+                vectors = self.embeddings.embed_documents(chunks)
+            text_embeddings = list(zip(chunks, vectors))
+            if self.vectorstore is None:
+                self.vectorstore = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=ids)
+            else:
+                self.vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+            self.manifest["lectures"][lecture_hash] = {"source": source, "ids": ids}
+            self.version += 1
+            self.save()
+            return lecture_hash
+
+    def add_transcript_file(self, transcript_path, embedded=None):
+        with open(transcript_path, "r") as f:
+            transcript = f.read()
+        if self.has_lecture(text_hash(transcript)):
+            return text_hash(transcript)
+        segments = load_segments(transcript_path, transcript)
+        return self.add_transcript(transcript, source=transcript_path, segments=segments, embedded=embedded)
+
+    def add_directory(self, directory):
+        """
+        Index every `.txt` transcript of a directory (e.g. the batch transcripts).
+        """
+        if not os.path.isdir(directory):
+            return []
+        return [
+            self.add_transcript_file(os.path.join(directory, name))
+            for name in sorted(os.listdir(directory))
+            if name.endswith(".txt")
+        ]
+
+    def remove_lecture(self, lecture_hash):
+        """
+        Remove all chunks of a lecture from the index.
+        """
+        with self._lock:
+            lecture = self.manifest["lectures"].pop(lecture_hash, None)
+            if lecture is None:
+                return False
+            self.vectorstore.delete(lecture["ids"])
+            self.version += 1
+            self.save()
+            return True
+
+    def lecture_embeddings(self, lecture_hash):
+        """
+        Return the `(chunk, vector)` pairs of an indexed lecture, in the form `add_transcript`
+        accepts, so that they can be kept with the lecture's other artifacts. Lectures that are not
+        indexed (e.g. empty transcripts) have none.
+        """
+        with self._lock:
+            if self.vectorstore is None or lecture_hash not in self.manifest["lectures"]:
+                return []
+            positions = {doc_id: position for position, doc_id in self.vectorstore.index_to_docstore_id.items()}
+            embedded = []
+            for doc_id in self.manifest["lectures"][lecture_hash]["ids"]:
+                doc = self.vectorstore.docstore.search(doc_id)
+                chunk = {"text": doc.page_content}
+                chunk.update({key: doc.metadata[key] for key in ("start", "end") if key in doc.metadata})
+                embedded.append((chunk, self.vectorstore.index.reconstruct(positions[doc_id]).tolist()))
+            return embedded
+
+    def documents(self, lecture_hash=None):
+        """
+        Return the indexed chunks as `(id, Document)` pairs, all of them or those of one lecture.
+        """
+        with self._lock:
+            if self.vectorstore is None:
+                return []
+            lectures = self.manifest["lectures"]
+            if lecture_hash is not None:
+                lectures = {lecture_hash: lectures[lecture_hash]} if lecture_hash in lectures else {}
+            return [
+                (doc_id, self.vectorstore.docstore.search(doc_id))
+                for lecture in lectures.values()
+                for doc_id in lecture["ids"]
+            ]
+
+    def as_retriever(self, lecture_hash=None, k=4):
+        """
+        Plain FAISS retriever, restricted to the chunks of one lecture when `lecture_hash` is given.
+        """
+        if self.vectorstore is None:
+            raise ValueError("The lecture index is empty, add a transcript with text first.")
+        search_kwargs = {"k": k}
+        if lecture_hash is not None:
+            # FAISS filters after the search, so every chunk is a candidate
+            search_kwargs.update(filter={"lecture": lecture_hash}, fetch_k=self.vectorstore.index.ntotal)
+        return self.vectorstore.as_retriever(search_kwargs=search_kwargs)
+
+
+def add_workspace_transcript(index, workspace, artifact):
+    """
+    Add the transcript of a lecture workspace (see artifactStore) to an index. The chunk embeddings
+    are kept in the workspace as `artifact`, so a rebuilt index gets them back without embedding again.
+    Returns the lecture hash.
+    """
+    params = {"embedding": index.embedding_id, "chunking": index.chunking_id}
+    fresh = workspace.is_fresh(artifact, ["transcript"], params)
+    embedded = [tuple(pair) for pair in workspace.read_json(artifact)] if fresh else None
+    lecture_hash = index.add_transcript_file(workspace.path("transcript"), embedded=embedded)
+    if not fresh and index.has_lecture(lecture_hash):
+        workspace.write_json(artifact, index.lecture_embeddings(lecture_hash), ["transcript"], params)
+    return lecture_hash
+
+
+def get_lecture_index(index_path, embeddings, embedding_id, chunk_profile="index_online"):
+    """
+    Return the process-wide index stored at `index_path`, loading it from disk once.
+    """
+    with _indexes_lock:
+        index = _indexes.get(index_path)
+        if index is None or index.embedding_id != embedding_id or index.chunk_profile != chunk_profile:
+            index = LectureIndex(index_path, embeddings, embedding_id, chunk_profile)
+            _indexes[index_path] = index
+        return index
@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Everything heavy (Whisper, LangChain, transformers) is imported inside the stages, so that
+# importing this module or running `--help` stays fast.
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".flac", ".ogg", ".webm")
+RESULT_FILE = "pipeline.json"
+
+
+def transcribe_stage(lecture, options):
+    workspace = options["store"].workspace(lecture["id"])
+    if workspace.audio_path is None:
+        # Imported transcripts are used as they are
+        return {"transcript": workspace.path("transcript"), "reused": True}
+
+    from generateTranscript import transcribe_audio
+    from transcriptionBackends import TRANSCRIPTION_BACKEND, WHISPER_MODEL_SIZE
+
+    backend = options.get("transcription_backend") or TRANSCRIPTION_BACKEND
+    model_size = options.get("model_size") or WHISPER_MODEL_SIZE
+
+    def build(transcript_path):
+        _, transcript = transcribe_audio(workspace.audio_path, transcript_path=transcript_path,
+                                         backend=backend, model_size=model_size)
+        if transcript is None:
+            raise RuntimeError("Transcription failed")
+
+    transcript_path, reused = workspace.produce(
+        "transcript", build, inputs=["audio"], params={"backend": backend, "model_size": model_size},
+        force=options["force"], also=["segments"],
+    )
+    return {"transcript": transcript_path, "reused": reused}
+
+
+def structure_stage(lecture, options):
+    workspace = options["store"].workspace(lecture["id"])
+    if options.get("structure_mode") == "mapreduce":
+        return outline_stage(workspace, options)
+    if options["structure_backend"] == "offline":
+        import structuredInfoOff as structuring
+        iterate = structuring.iter_process_transcript_offline
+        artifact = "sections_offline"
+        params = structuring.artifact_params()
+    else:
+        import structuredInfo as structuring
+        iterate = structuring.iter_process_transcript
+        artifact = "sections_online"
+        params = structuring.artifact_params()
+
+    stats = {}
+
+    def build(sections_path):
+        sections = [section for _, _, section in iterate(transcript_path=workspace.path("transcript"), stats=stats)]
+        if not sections:
+            raise RuntimeError("No sections were generated")
+        write_json(sections_path, sections)
+
+    sections_path, reused = workspace.produce(artifact, build, inputs=["transcript"], params=params,
+                                              force=options["force"])
+    return {"sections": sections_path, "reused": reused, "stats": stats}
+
+
+def outline_stage(workspace, options):
+    """
+    Map-reduce structuring: one section per topic (the "topics" artifact) plus the lecture outline.
+    """
+    import mapReduceSummary
+
+    backend = options["structure_backend"]
+    params = mapReduceSummary.artifact_params(backend)
+    stats = {}
+
+    def build_topics(topics_path):
+        sections = [section for _, _, section in mapReduceSummary.iter_summarize_lecture(
+            backend, workspace.path("transcript"), stats=stats)]
+        if not sections:
+            raise RuntimeError("No sections were generated")
+        write_json(topics_path, sections)
+
+    def build_outline(outline_path):
+        sections = workspace.read_json(f"topics_{backend}")
+        write_json(outline_path, dict(mapReduceSummary.make_outline(sections, backend, stats=stats), sections=sections))
+
+    force = options["force"]
+    sections_path, reused = workspace.produce(f"topics_{backend}", build_topics, inputs=["transcript"],
+                                              params=params, force=force)
+    outline_path, outline_reused = workspace.produce(f"outline_{backend}", build_outline,
+                                                     inputs=[f"topics_{backend}"], force=force)
+    return {"sections": sections_path, "outline": outline_path, "reused": reused and outline_reused, "stats": stats}
+
+
+def articles_stage(lecture, options):
+    from relatedArticles import get_related_articles
+
+    workspace = options["store"].workspace(lecture["id"])
+
+    def build(articles_path):
+        # get_related_articles returns [] when the search fails, which must not be recorded as fresh
+        articles = get_related_articles(workspace.path("transcript"))
+        if not articles:
+            raise RuntimeError("No related articles found")
+        write_json(articles_path, articles)
+
+    articles_path, reused = workspace.produce("articles", build, inputs=["transcript"], force=options["force"])
+    return {"articles": articles_path, "reused": reused}
+
+
+# Stage name -> (stages it depends on, function)
+STAGES = {
+    "transcribe": ((), transcribe_stage),
+    "structure": (("transcribe",), structure_stage),
+    "articles": (("transcribe",), articles_stage),
+}
+
+
+def write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def expand_inputs(inputs):
+    """
+    Turn files and directories into a sorted list of audio files and `.txt` transcripts.
+    """
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name) for name in names
+                    if name.lower().endswith(AUDIO_EXTENSIONS + (".txt",))
+                )
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            print(f"Skipping missing input: {path}")
+    return sorted(dict.fromkeys(files))
+
+
+def to_markdown(result):
+    """
+    Render the outputs of one lecture (sections and related articles) as Markdown.
+    """
+    lines = [f"# {result['name']}", ""]
+    outputs = result["outputs"]
+    if "structure" in outputs:
+        if "outline" in outputs["structure"]:
+            outline = read_json(outputs["structure"]["outline"])
+            lines += [outline["overview"], ""]
+        for section in read_json(outputs["structure"]["sections"]):
+            lines += [f"## {section['title']}", "", section["summary"], ""]
+            if section.get("key_points"):
+                lines += ["**Key Points:**", "", section["key_points"], ""]
+    if "articles" in outputs:
+        lines += ["## Related Articles", ""]
+        for article in read_json(outputs["articles"]["articles"]):
+            lines.append(f"- [{article['title']}]({article['link']}): {article['description']}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def run_pipeline(inputs, store=None, stages=tuple(STAGES), structure_backend="online", structure_mode="flat",
+                 workers=2, force=False, formats=("json", "md"), transcription_backend=None, model_size=None):
+    """
+    Run the selected stages for every input (audio files, transcripts or directories of them).
+
+    Stages form a DAG per lecture (transcribe -> structure, transcribe -> articles). Every stage
+    starts as soon as its dependencies are done, so structuring one lecture overlaps with
+    transcribing the next. Each lecture's outputs and its `pipeline.json` record go to its
+    workspace in the artifact store; outputs whose inputs and parameters are unchanged are reused
+    unless `force` is set. Returns the records of all lectures.
+    """
+    from artifactStore import get_artifact_store
+
+    store = store or get_artifact_store()
+    options = {
+        "store": store,
+        "force": force,
+        "structure_backend": structure_backend,
+        "structure_mode": structure_mode,
+        "transcription_backend": transcription_backend,
+        "model_size": model_size,
+    }
+    # Dependencies of a selected stage always run too
+    selected = set()
+    for stage in stages:
+        selected.add(stage)
+        selected.update(STAGES[stage][0])
+
+    lectures = []
+    for input_path in expand_inputs(inputs):
+        if input_path.lower().endswith(".txt"):
+            workspace = store.add_transcript(input_path)
+        else:
+            workspace = store.add_audio(input_path)
+        lectures.append({
+            "id": workspace.id,
+            "name": workspace.name,
+            "input": input_path,
+            "dir": workspace.dir,
+            "status": {stage: "pending" for stage in STAGES if stage in selected},
+            "outputs": {},
+            "errors": {},
+            "seconds": {},
+        })
+    if not lectures:
+        print("Nothing to process.")
+        return []
+
+    # Transcription is CPU-bound and holds its model, so it runs one lecture at a time
+    transcribe_lock = threading.Lock()
+
+    def run_stage(lecture, stage):
+        start = time.perf_counter()
+        if stage == "transcribe":
+            with transcribe_lock:
+                output = STAGES[stage][1](lecture, options)
+        else:
+            output = STAGES[stage][1](lecture, options)
+        lecture["seconds"][stage] = round(time.perf_counter() - start, 2)
+        return output
+
+    def ready(lecture):
+        for stage, status in lecture["status"].items():
+            if status != "pending":
+                continue
+            dependencies = STAGES[stage][0]
+            if any(lecture["status"][d] in ("failed", "skipped") for d in dependencies):
+                lecture["status"][stage] = "skipped"
+            elif all(lecture["status"][d] == "done" for d in dependencies):
+                lecture["status"][stage] = "running"
+                yield stage
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        running = {}
+        for lecture in lectures:
+            for stage in ready(lecture):
+                running[pool.submit(run_stage, lecture, stage)] = (lecture, stage)
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                lecture, stage = running.pop(future)
+                try:
+                    lecture["outputs"][stage] = future.result()
+                    lecture["status"][stage] = "done"
+                    print(f"[{lecture['name']}] {stage} done in {lecture['seconds'][stage]}s")
+                except Exception as e:
+                    lecture["status"][stage] = "failed"
+                    lecture["errors"][stage] = str(e)
+                    print(f"[{lecture['name']}] {stage} failed: {e}")
+                for next_stage in ready(lecture):
+                    running[pool.submit(run_stage, lecture, next_stage)] = (lecture, next_stage)
+
+    for lecture in lectures:
+        if "json" in formats:
+            write_json(os.path.join(lecture["dir"], RESULT_FILE), lecture)
+        if "md" in formats:
+            with open(os.path.join(lecture["dir"], "lecture.md"), "w") as f:
+                f.write(to_markdown(lecture))
+    return lectures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="lecture-pipeline",
+        description="Transcribe, structure and find related articles for lectures without Streamlit.",
+    )
+    parser.add_argument("inputs", nargs="+", help="Audio files, transcripts (.txt) or directories")
+    parser.add_argument("--store", help="Directory of the artifact store (default: the app's lecture store)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES),
+                        help="Stages to run (their dependencies run too)")
+    parser.add_argument("--structure-backend", choices=["online", "offline"], default="online",
+                        help="online: OpenAI, offline: local Flan-T5")
+    parser.add_argument("--structure-mode", choices=["flat", "mapreduce"], default="flat",
+                        help="flat: one section per chunk, mapreduce: one section per topic and an outline")
+    parser.add_argument("--transcription-backend", help="whisper or faster-whisper (default from environment)")
+    parser.add_argument("--model-size", help="Whisper model size (default from environment)")
+    parser.add_argument("--workers", type=int, default=2, help="Stages running at the same time")
+    parser.add_argument("--format", nargs="+", choices=["json", "md"], default=["json", "md"], dest="formats")
+    parser.add_argument("--force", action="store_true", help="Run stages again even if their outputs exist")
+    args = parser.parse_args()
+
+    store = None
+    if args.store:
+        from artifactStore import ArtifactStore
+        store = ArtifactStore(args.store)
+    lectures = run_pipeline(
+        args.inputs, store, stages=args.stages, structure_backend=args.structure_backend,
+        structure_mode=args.structure_mode, workers=args.workers,
+        force=args.force, formats=args.formats,
+        transcription_backend=args.transcription_backend, model_size=args.model_size,
+    )
+    for lecture in lectures:
+        statuses = ", ".join(f"{stage}: {status}" for stage, status in lecture["status"].items())
+        print(f"{lecture['name']} ({lecture['id'][:12]}): {statuses}")
+    if any(status == "failed" for lecture in lectures for status in lecture["status"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
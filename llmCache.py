@@ -0,0 +1,139 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+CACHE_DIR = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/Cache"
+CACHE_PATH = os.path.join(CACHE_DIR, "llm_cache.sqlite")
+DEFAULT_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "256"))
+
+
+def cache_key(model, template, text):
+    """
+    Hash of the model id, the prompt template and the text it is filled with.
+    """
+    digest = hashlib.sha256()
+    for part in (model, template, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """
+    Persistent on-disk cache for LLM generations.
+
+    Entries are keyed by model, prompt template and chunk text, and the least recently used
+    entries are evicted once the cache grows beyond `max_mb`.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_mb=DEFAULT_MAX_MB):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            " key TEXT PRIMARY KEY, model TEXT, value TEXT, size INTEGER, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON generations (last_used)")
+        self._conn.commit()
+        # Running size of the cache, so that inserts don't sum the whole table
+        self._size = self._total_size()
+
+    def get(self, model, template, text):
+        key = cache_key(model, template, text)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM generations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE generations SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, model, template, text, value):
+        key = cache_key(model, template, text)
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM generations WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generations (key, model, value, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, value, size, time.time()),
+            )
+            self._size += size - (replaced[0] if replaced else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def cached(self, model, template, text, generate):
+        """
+        Return the cached generation for (model, template, text), calling `generate()` on a miss.
+        """
+        value = self.get(model, template, text)
+        if value is None:
+            value = generate()
+            self.set(model, template, text, value)
+        return value
+
+    def _total_size(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM generations").fetchone()[0]
+
+    def _evict(self):
+        # Other processes write to the same file, so the running size is re-synced before evicting
+        self._size = self._total_size()
+        if self._size <= self.max_bytes:
+            return
+        # Drop least recently used entries until the cache is back under 90% of its budget
+        excess = self._size - int(self.max_bytes * 0.9)
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM generations ORDER BY last_used").fetchall():
+            if freed >= excess:
+                break
+            self._conn.execute("DELETE FROM generations WHERE key = ?", (key,))
+            freed += size
+        self._size -= freed
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM generations")
+            self._conn.commit()
+            self._size = 0
+
+    def stats(self):
+        """
+        Return hit/miss counters of this process together with the size of the cache.
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generations"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "size_mb": round(size / 1024 / 1024, 2),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """
+    Return the process-wide LLM cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
@@ -0,0 +1,147 @@
+import time
+import json
+import asyncio
+import hashlib
+
+try:
+    from langchain_core.language_models.llms import LLM
+except ImportError:
+    # The mock SerpAPI server and the stub completions work without LangChain, only StubLLM needs it
+    LLM = None
+
+
+def stub_completion(prompt):
+    """
+    Deterministic fake completion: a hash tag followed by the first words of the prompt's text.
+    Prompts asking for JSON get a JSON section object back.
+    """
+    tag = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    words = prompt.split("\n\n", 1)[-1].split()
+    if prompt.rstrip().endswith("Keywords:"):
+        # Keyword prompts get the longest distinct words of the text, separated by commas
+        text_words = prompt.rsplit("\n\n", 1)[0].split("\n\n", 1)[-1].split()
+        candidates = sorted({word.strip(".,;:!?\"'()").lower() for word in text_words}, key=lambda w: (-len(w), w))
+        return ", ".join(candidates[:10])
+    text = f"[{tag}] " + " ".join(words[:12])
+    if "JSON" in prompt:
+        section = {"title": f"[{tag}] " + " ".join(words[:6]), "summary": text}
+        if '"key_points"' in prompt:
+            section["key_points"] = [" ".join(words[i:i + 4]) for i in range(0, 12, 4)]
+        return json.dumps(section)
+    return text
+
+
+def count_tokens(text):
+    """
+    Count tokens with tiktoken's cl100k encoding, or approximate by words if it isn't installed.
+    """
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    except ImportError:
+        return int(len(text.split()) * 1.3)
+
+
+if LLM is not None:
+    class StubLLM(LLM):
+        """
+        Local stand-in for the OpenAI LLM with a fixed per-call latency, for tests and benchmarks.
+        It works with LLMChain (sync and async) and counts the calls and prompt tokens it receives.
+        """
+
+        latency: float = 0.0
+        model_name: str = "stub"
+        temperature: float = 0.0
+        calls: int = 0
+        prompt_tokens: int = 0
+
+        @property
+        def _llm_type(self):
+            return "stub"
+
+        def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+            self.calls += 1
+            self.prompt_tokens += count_tokens(prompt)
+            time.sleep(self.latency)
+            return stub_completion(prompt)
+
+        async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+            self.calls += 1
+            self.prompt_tokens += count_tokens(prompt)
+            await asyncio.sleep(self.latency)
+            return stub_completion(prompt)
+
+
+class MockSerpServer:
+    """
+    Local stand-in for the SerpAPI search endpoint with a fixed latency, for tests and benchmarks.
+    Every query gets `num` deterministic results, some of them shared between queries (as
+    overlapping keywords do in real searches). `requests` counts the searches it answered.
+    The first `failures` requests get a 503 error, to exercise retries.
+    """
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0, failures=0):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        from urllib.parse import urlparse, parse_qs
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                server.requests += 1
+                time.sleep(server.latency)
+                if server.failures > 0:
+                    server.failures -= 1
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = json.dumps(mock_serp_response(params.get("q", ""), int(params.get("num", 5))))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body.encode("utf-8"))
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.failures = failures
+        self.requests = 0
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self._httpd.server_address[1]}/search"
+        self._thread = None
+
+    def start(self):
+        import threading
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def mock_serp_response(query, num=5):
+    """
+    Deterministic SerpAPI-like response: results 0-1 are shared by all queries, the rest are specific.
+    """
+    tag = hashlib.sha256(query.encode("utf-8")).hexdigest()[:8]
+    results = []
+    for rank in range(num):
+        key = "shared" if rank < 2 else tag
+        results.append({
+            "title": f"Article {key}-{rank}",
+            "link": f"https://example.org/{key}/{rank}",
+            "snippet": f"About {query} ({rank}).",
+        })
+    return {"search_parameters": {"q": query}, "organic_results": results}
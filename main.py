@@ -1,14 +1,16 @@
+import time
+_startup = time.perf_counter()
+
 import streamlit as st
 from streamlit_option_menu import option_menu
 import os
-import shutil
+import hashlib
+from contextlib import closing
 
-from generateTranscript import transcribe_audio
-from structuredInfo import process_transcript
-from relatedArticles import get_related_articles
-from chatCourse import app as chat_course_app
-from structuredInfoOff import process_transcript_offline
-from chatCourseOff import app as chat_course_off_app
+# Page modules (and with them Whisper, LangChain, FAISS, transformers) are imported on first use
+from startupTiming import timed_import, record as record_startup, report as startup_report
+from modelRegistry import registry as model_registry
+from artifactStore import get_artifact_store
 
 EXPORT_PATH = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/Export Station"
 
@@ -40,13 +42,43 @@ class MultiApp:
                 }
             )
 
+            with st.expander("Loaded Models"):
+                st.json(model_registry.report())
+            with st.expander("Startup Timing"):
+                st.json(startup_report())
+            with st.expander("Lecture Store"):
+                workspace = current_workspace()
+                st.write(f"Current lecture: {workspace.name if workspace else 'none'}")
+                st.json(store_report())
+
         for app in self.apps:
             if app["title"] == selected_app:
                 app["function"]()
 
 
+@st.cache_data(ttl=30, show_spinner=False)
+def store_report():
+    # Walking the store reads every manifest, so reruns within 30 seconds reuse the last report
+    return get_artifact_store().report()
+
+
 # === Online Tabs ===
 
+def current_workspace():
+    """
+    Return the workspace of the lecture this session works on, or None before an upload.
+    """
+    return get_artifact_store().workspace(st.session_state.get("lecture_id"))
+
+
+def current_transcript_path():
+    # Sessions without a lecture fall back to the shared transcript of the Export Station
+    workspace = current_workspace()
+    if workspace is not None:
+        return workspace.path("transcript")
+    return os.path.join(EXPORT_PATH, "transcript.txt")
+
+
 def transcript_page():
     st.title("🎤 Transcribe MP3 Lecture")
     st.info("Upload an MP3 file and generate its transcript.")
@@ -54,42 +86,189 @@ def transcript_page():
     uploaded_file = st.file_uploader("Upload MP3 Lecture", type=["mp3"])
 
     if uploaded_file:
-        file_path = os.path.join(EXPORT_PATH, uploaded_file.name)
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.read())
-        st.success(f"File uploaded: {file_path}")
+        # Each recording gets its own workspace, named by its content
+        upload_key = (uploaded_file.name, uploaded_file.size)
+        if st.session_state.get("upload_key") != upload_key or current_workspace() is None:
+            workspace = get_artifact_store().add_audio_bytes(uploaded_file.getvalue(), uploaded_file.name)
+            st.session_state["upload_key"] = upload_key
+            st.session_state["lecture_id"] = workspace.id
+        workspace = current_workspace()
+        file_path = workspace.audio_path
+        st.success(f"File uploaded: {workspace.name} ({workspace.id[:12]})")
+
+        long_lecture = st.checkbox("Long lecture mode (parallel pieces, text appears as it is ready)")
+        if long_lecture:
+            workers = st.number_input("Worker processes", min_value=1, max_value=os.cpu_count() or 1,
+                                      value=os.cpu_count() or 1)
 
         if st.button("Generate Transcript"):
-            transcript_path, transcript = transcribe_audio(file_path)
-            if transcript:
-                st.success(f"Transcript generated successfully! File saved at: {transcript_path}")
+            generate_transcript = timed_import("generateTranscript")
+            backends = timed_import("transcriptionBackends")
+            params = {"backend": backends.TRANSCRIPTION_BACKEND, "model_size": backends.WHISPER_MODEL_SIZE}
+
+            def build(transcript_path):
+                if long_lecture:
+                    progress = st.progress(0.0)
+                    partial_text = st.empty()
+
+                    def show_partial(transcript_so_far, piece):
+                        progress.progress((piece["index"] + 1) / piece["total"])
+                        partial_text.text_area("Transcript (in progress)", transcript_so_far, height=300,
+                                               key=f"partial_{piece['index']}")
+
+                    _, transcript = generate_transcript.transcribe_audio_chunked(
+                        file_path, workers=int(workers), on_partial=show_partial, transcript_path=transcript_path)
+                    partial_text.empty()
+                else:
+                    _, transcript = generate_transcript.transcribe_audio(file_path, transcript_path=transcript_path)
+                if transcript is None:
+                    raise RuntimeError("Transcription failed")
+
+            try:
+                transcript_path, reused = workspace.produce("transcript", build, inputs=["audio"], params=params,
+                                                            also=["segments"])
+                with open(transcript_path, "r") as f:
+                    transcript = f.read()
+                if reused:
+                    st.success("This recording was transcribed before, reusing its transcript.")
+                else:
+                    st.success(f"Transcript generated successfully! File saved at: {transcript_path}")
                 st.text_area("Transcript", transcript, height=300)
-            else:
-                st.error("Failed to generate transcript.")
+            except Exception as e:
+                st.error(f"Failed to generate transcript. ({e})")
 
     if st.button("Reset"):
-        if os.path.exists(EXPORT_PATH):
-            shutil.rmtree(EXPORT_PATH)
-            os.makedirs(EXPORT_PATH)
-        st.success("All files in Export Station have been deleted.")
+        # Only this session's lecture is deleted, other lectures and sessions keep their files
+        workspace = current_workspace()
+        if workspace is not None:
+            get_artifact_store().remove(workspace.id)
+        for key in ("lecture_id", "upload_key", "structured_info", "structured_info_offline"):
+            st.session_state.pop(key, None)
+        st.success("The files of this lecture have been deleted.")
+
+
+def render_section(section):
+    if section.get("start") is not None:
+        # Merged topics (map-reduce mode) show where they start in the recording
+        timestamp = timed_import("mapReduceSummary").format_timestamp(section["start"])
+        st.markdown(f"### {section['title']} `{timestamp}`")
+    else:
+        st.markdown(f"### {section['title']}")
+    st.markdown(f"{section['summary']}")
+    if "key_points" in section:
+        st.markdown("## **Key Points:**")
+        st.markdown(f"{section['key_points']}")
+
+
+def current_transcript_hash():
+    transcript_path = current_transcript_path()
+    if not os.path.exists(transcript_path):
+        return None
+    with open(transcript_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def run_structured_info(state_key, iterate, button_label, success_message, error_message, artifact=None,
+                        params=None):
+    """
+    Render structured sections one by one while they are generated.
+
+    Finished sections are kept in the session state, so they survive reruns (including the one
+    triggered by the Stop button, which cancels the running generation). Completed runs are also
+    stored as `artifact` of the lecture's workspace, built with `params()`, and shown again
+    without generating as long as the transcript and parameters are unchanged.
+    """
+    transcript_hash = current_transcript_hash()
+    state = st.session_state.get(state_key)
+    if state is None or state["transcript"] != transcript_hash:
+        state = {"transcript": transcript_hash, "sections": [], "done": False}
+        st.session_state[state_key] = state
+
+    col_start, col_stop = st.columns(2)
+    start = col_start.button(button_label)
+    col_stop.button("Stop", key=f"{state_key}_stop")
+
+    if not start:
+        for section in state["sections"]:
+            render_section(section)
+        if state["sections"] and not state["done"]:
+            st.warning(f"Stopped after {len(state['sections'])} sections. Generate again to continue; "
+                       "finished sections are cached.")
+        return
+
+    state["sections"] = []
+    state["done"] = False
+    workspace = current_workspace() if artifact else None
+    artifact_params = params() if workspace is not None and params else {}
+    if workspace is not None and workspace.is_fresh(artifact, ["transcript"], artifact_params):
+        state["sections"] = workspace.read_json(artifact)
+        state["done"] = True
+        for section in state["sections"]:
+            render_section(section)
+        st.success(f"{success_message} (reused, the transcript is unchanged)")
+        return
+
+    progress = st.progress(0.0, text="Starting...")
+    try:
+        with closing(iterate()) as sections:
+            for idx, total, section in sections:
+                state["sections"].append(section)
+                render_section(section)
+                progress.progress((idx + 1) / total, text=f"Chunk {idx + 1}/{total}")
+    except Exception as e:
+        progress.empty()
+        st.error(f"{error_message} ({e})")
+        return
+
+    progress.empty()
+    state["done"] = True
+    if state["sections"]:
+        if workspace is not None:
+            workspace.write_json(artifact, state["sections"], ["transcript"], artifact_params)
+        st.success(success_message)
+    else:
+        st.error(error_message)
+
+
+def run_topic_outline(backend, state_key, button_label, success_message, error_message):
+    """
+    Map-reduce structuring: chunk summaries merged into one section per topic, in lecture order.
+    """
+    run_structured_info(
+        state_key,
+        lambda: timed_import("mapReduceSummary").iter_summarize_lecture(backend,
+                                                                        transcript_path=current_transcript_path()),
+        button_label,
+        success_message,
+        error_message,
+        artifact=f"topics_{backend}",
+        params=lambda: timed_import("mapReduceSummary").artifact_params(backend),
+    )
 
 
 def structured_info_page():
     st.title("🗂️ Structured Information")
     st.info("Organize lecture transcript into structured sections with titles, summaries, and key points.")
 
-    if st.button("Generate Structured Information"):
-        structured_data = process_transcript()
-        if structured_data:
-            st.success("Structured information generated successfully!")
-            for idx, section in enumerate(structured_data):
-                st.markdown(f"### {section['title']}")
-                st.markdown(f"{section['summary']}")
-                if "key_points" in section:
-                    st.markdown("## **Key Points:**")
-                    st.markdown(f"{section['key_points']}")
-        else:
-            st.error("Failed to generate structured information. Ensure a transcript is available.")
+    if st.checkbox("Merge into topics (fewer sections, outline of the whole lecture)", key="structured_info_merge"):
+        run_topic_outline(
+            "online",
+            "structured_info_topics",
+            "Generate Topic Outline",
+            "Topic outline generated successfully!",
+            "Failed to generate the topic outline. Ensure a transcript is available.",
+        )
+        return
+
+    run_structured_info(
+        "structured_info",
+        lambda: timed_import("structuredInfo").iter_process_transcript(transcript_path=current_transcript_path()),
+        "Generate Structured Information",
+        "Structured information generated successfully!",
+        "Failed to generate structured information. Ensure a transcript is available.",
+        artifact="sections_online",
+        params=lambda: timed_import("structuredInfo").artifact_params(),
+    )
 
 
 def related_articles_page():
@@ -97,7 +276,15 @@ def related_articles_page():
     st.info("Find articles related to the topics discussed in the transcript.")
 
     if st.button("Find Related Articles"):
-        articles = get_related_articles()
+        workspace = current_workspace()
+        articles = None
+        if workspace is not None and workspace.is_fresh("articles", ["transcript"]):
+            # Empty lists from failed searches are searched again
+            articles = workspace.read_json("articles")
+        if not articles:
+            articles = timed_import("relatedArticles").get_related_articles(current_transcript_path())
+            if articles and workspace is not None:
+                workspace.write_json("articles", articles, ["transcript"])
         if articles:
             st.success("Related articles retrieved successfully!")
             for article in articles:
@@ -111,7 +298,7 @@ def chat_course_page():
     st.title("💬 Chat with Course")
     st.info("Chat with the transcript and get answers to your questions. Explore detailed explanations.")
 
-    chat_course_app()
+    timed_import("chatCourse").app(current_transcript_path(), current_workspace())
 
 
 # === Offline Tabs ===
@@ -120,25 +307,34 @@ def structured_info_offline_page():
     st.title("🗂️ Offline Structured Information")
     st.info("Organize the lecture transcript into structured sections completely offline.")
 
-    if st.button("Generate Offline Structured Information"):
-        structured_data = process_transcript_offline()
-        if structured_data:
-            st.success("Offline structured information generated successfully!")
-            for idx, section in enumerate(structured_data):
-                st.markdown(f"### {section['title']}")
-                st.markdown(f"{section['summary']}")
-                if "key_points" in section:
-                    st.markdown("## **Key Points:**")
-                    st.markdown(f"{section['key_points']}")
-        else:
-            st.error("Failed to generate offline structured information. Ensure a transcript is available.")
+    if st.checkbox("Merge into topics (fewer sections, outline of the whole lecture)",
+                   key="structured_info_offline_merge"):
+        run_topic_outline(
+            "offline",
+            "structured_info_offline_topics",
+            "Generate Offline Topic Outline",
+            "Offline topic outline generated successfully!",
+            "Failed to generate the offline topic outline. Ensure a transcript is available.",
+        )
+        return
+
+    run_structured_info(
+        "structured_info_offline",
+        lambda: timed_import("structuredInfoOff").iter_process_transcript_offline(
+            transcript_path=current_transcript_path()),
+        "Generate Offline Structured Information",
+        "Offline structured information generated successfully!",
+        "Failed to generate offline structured information. Ensure a transcript is available.",
+        artifact="sections_offline",
+        params=lambda: timed_import("structuredInfoOff").artifact_params(),
+    )
 
 
 def chat_course_offline_page():
     st.title("💬 Offline Chat with Course")
     st.info("Chat with the transcript completely offline, using local models with no internet required.")
 
-    chat_course_off_app()
+    timed_import("chatCourseOff").app(current_transcript_path(), current_workspace())
 
 
 # === App Runner ===
@@ -152,4 +348,6 @@ if __name__ == "__main__":
     app.add_app("Chat with Course", chat_course_page, "chat")
     app.add_app("Offline Structured Info", structured_info_offline_page, "file-text")
     app.add_app("Offline Chat", chat_course_offline_page, "chat")
+    # Time until the menu is ready, recorded once per process (on the first run)
+    record_startup("main (first paint)", time.perf_counter() - _startup)
     app.run()
@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import argparse
+
+from chunking import CHUNK_PROFILES, chunk_transcript, get_token_counter, load_segments
+
+EXPORT_PATH = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/Export Station"
+
+# Chunk summaries at least this similar (cosine of their MiniLM embeddings) belong to the same topic
+TOPIC_SIMILARITY = float(os.getenv("TOPIC_SIMILARITY", "0.6"))
+
+OVERVIEW_TEMPLATE = "Write a short overview (3-4 sentences) of a lecture covering these topics:\n\n{text}\n"
+OVERVIEW_TEMPLATE_OFFLINE = "Write a short overview (3-4 sentences) of a lecture covering these topics:\n\n{chunk}\n\nOVERVIEW:"
+
+
+def artifact_params(backend):
+    """
+    Settings the topics of a lecture depend on, shared by the app and the pipeline.
+    "clustering" names the grouping in `cluster_topics`, so topics grouped differently are rebuilt.
+    """
+    from chunking import chunking_id
+
+    params = {"threshold": TOPIC_SIMILARITY, "chunking": chunking_id(f"structure_{backend}"), "clustering": "adjacent"}
+    if backend == "offline":
+        from structuredInfoOff import OFFLINE_BACKEND
+        params["backend"] = OFFLINE_BACKEND
+    else:
+        params["backend"] = "openai"
+    return params
+
+
+def cluster_topics(vectors, threshold=TOPIC_SIMILARITY):
+    """
+    Group chunk vectors into topics of consecutive chunks: each chunk joins the topic of the
+    chunk before it if it is at least `threshold` similar to that topic's centroid, otherwise it
+    starts a new topic. Only neighbours are merged, so every topic covers one stretch of the
+    lecture and its time range doesn't overlap other topics. Returns the chunk indexes per topic.
+    """
+    import numpy as np
+
+    topics, centroid = [], None
+    for idx, vector in enumerate(vectors):
+        vector = np.asarray(vector, dtype="float32")
+        vector = vector / (np.linalg.norm(vector) + 1e-9)
+        if centroid is not None and centroid @ vector / (np.linalg.norm(centroid) + 1e-9) >= threshold:
+            topics[-1].append(idx)
+            centroid = centroid + vector
+            continue
+        topics.append([idx])
+        centroid = vector
+    return topics
+
+
+class _OnlineSummarizer:
+    """
+    Map and reduce calls through the OpenAI chains of `structuredInfo`, sharing their cache.
+    """
+
+    profile = "structure_online"
+
+    def __init__(self, llm, use_cache, stats):
+        from langchain.prompts import PromptTemplate
+        from langchain.chains import LLMChain
+        from structuredInfo import make_structurer, MAX_CONCURRENCY, REQUESTS_PER_SECOND
+
+        self.chains, self.run_cached = make_structurer(llm, use_cache, stats)
+        llm = self.chains["summary"].llm
+        self.overview_chain = LLMChain(llm=llm, prompt=PromptTemplate(template=OVERVIEW_TEMPLATE))
+        self.concurrency = MAX_CONCURRENCY
+        self.requests_per_second = REQUESTS_PER_SECOND
+        self.stats = stats
+
+    def _run_all(self, chain, texts):
+        from asyncStructurer import iter_requests
+
+        async def agenerate(text):
+            return await self.run_cached(chain, text)
+
+        return [result for _, result in iter_requests(texts, agenerate, concurrency=self.concurrency,
+                                                      requests_per_second=self.requests_per_second)]
+
+    def summarize(self, texts):
+        return self._run_all(self.chains["summary"], texts)
+
+    def structure(self, texts):
+        from asyncStructurer import iter_structure_chunks
+
+        return [section for _, section in iter_structure_chunks(
+            texts, self.chains, set(range(len(texts))), self.run_cached, single_pass=True,
+            concurrency=self.concurrency, requests_per_second=self.requests_per_second, stats=self.stats,
+        )]
+
+    def overview(self, text):
+        return self._run_all(self.overview_chain, [text])[0]
+
+
+class _OfflineSummarizer:
+    """
+    Map and reduce calls through the batched Flan-T5 generation of `structuredInfoOff`.
+    """
+
+    profile = "structure_offline"
+
+    def __init__(self, use_cache, stats):
+        import structuredInfoOff
+
+        self.module = structuredInfoOff
+        self.options = {"use_cache": use_cache, "stats": stats}
+
+    def summarize(self, texts):
+        template = self.module.SUMMARY_TEMPLATE
+        generated = self.module.generate_fields([(template, text) for text in texts], **self.options)
+        return [self.module.clean_text(generated[(template, text)]) for text in texts]
+
+    def structure(self, texts):
+        sections = self.module.structure_chunks_offline(texts, single_pass=True, **self.options)
+        return [sections[text] for text in texts]
+
+    def overview(self, text):
+        generated = self.module.generate_fields([(OVERVIEW_TEMPLATE_OFFLINE, text)], **self.options)
+        return self.module.clean_text(generated[(OVERVIEW_TEMPLATE_OFFLINE, text)])
+
+
+def _get_summarizer(backend, llm, use_cache, stats):
+    if backend == "offline":
+        return _OfflineSummarizer(use_cache, stats)
+    return _OnlineSummarizer(llm, use_cache, stats)
+
+
+def _reduce_inputs(summarizer, summaries):
+    """
+    Join the summaries of one topic into the text of its section. Topics whose summaries don't
+    fit in one chunk of the model are summarized group by group first, until they do.
+    """
+    settings = CHUNK_PROFILES[summarizer.profile]
+    _, count = get_token_counter(settings["tokenizer"])
+    text = "\n".join(summaries)
+    while count(text) > settings["max_tokens"]:
+        groups = [chunk["text"] for chunk in chunk_transcript(text, profile=summarizer.profile)]
+        if len(groups) <= 1:
+            break
+        text = "\n".join(summarizer.summarize(groups))
+    return text
+
+
+def iter_summarize_lecture(backend="online", transcript_path=None, llm=None, threshold=TOPIC_SIMILARITY,
+                           use_cache=True, stats=None):
+    """
+    Map-reduce structuring of a whole lecture.
+
+    Map: every chunk is summarized (concurrently online, in batches offline).
+    Cluster: consecutive chunk summaries are grouped into topics by their MiniLM embeddings.
+    Reduce: each topic becomes one section (title, summary, key points) written from the
+    summaries of its chunks, recursively summarized first when they are too long.
+
+    Yields `(index, total, section)` for every topic in lecture order, like the flat structurers.
+    Sections also list their `chunks` and their `start`/`end` in seconds (None without segments).
+    """
+    from modelRegistry import get_minilm_embeddings
+
+    if transcript_path is None:
+        transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
+    if not os.path.exists(transcript_path):
+        raise FileNotFoundError(f"Transcript not found: {transcript_path}")
+    with open(transcript_path, "r") as f:
+        transcript = f.read()
+
+    stats = stats if stats is not None else {}
+    summarizer = _get_summarizer(backend, llm, use_cache, stats)
+    chunks = chunk_transcript(transcript, load_segments(transcript_path, transcript), summarizer.profile)
+    if backend == "offline":
+        from structuredInfoOff import is_usable_chunk
+        chunks = [chunk for chunk in chunks if is_usable_chunk(chunk["text"])]
+    if not chunks:
+        print("No usable chunks found.")
+        return
+
+    start = time.perf_counter()
+    summaries = summarizer.summarize([chunk["text"] for chunk in chunks])
+    stats["map_seconds"] = round(time.perf_counter() - start, 2)
+
+    topics = cluster_topics(get_minilm_embeddings().embed_documents(summaries), threshold)
+    stats["chunks"] = len(chunks)
+    stats["topics"] = len(topics)
+    print(f"[MapReduce] {len(chunks)} chunks grouped into {len(topics)} topics")
+
+    start = time.perf_counter()
+    inputs = [_reduce_inputs(summarizer, [summaries[idx] for idx in topic]) for topic in topics]
+    for idx, (topic, section) in enumerate(zip(topics, summarizer.structure(inputs))):
+        section = dict(section, chunks=topic, start=chunks[topic[0]]["start"], end=chunks[topic[-1]]["end"])
+        yield idx, len(topics), section
+    stats["reduce_seconds"] = round(time.perf_counter() - start, 2)
+
+
+def make_outline(sections, backend="online", llm=None, use_cache=True, stats=None):
+    """
+    Lecture-level outline: an overview written from the section titles and summaries,
+    and the list of topics with their time ranges.
+    """
+    stats = stats if stats is not None else {}
+    summarizer = _get_summarizer(backend, llm, use_cache, stats)
+    text = _reduce_inputs(summarizer, [f"{section['title']}: {section['summary']}" for section in sections])
+    return {
+        "overview": summarizer.overview(text),
+        "topics": [{key: section.get(key) for key in ("title", "start", "end")} for section in sections],
+    }
+
+
+def summarize_lecture(backend="online", transcript_path=None, llm=None, threshold=TOPIC_SIMILARITY,
+                      use_cache=True, stats=None):
+    """
+    Run the map-reduce structuring of a lecture and its outline.
+    Returns a dict with the `overview`, the `topics` and the merged `sections`.
+    """
+    stats = stats if stats is not None else {}
+    sections = [section for _, _, section in iter_summarize_lecture(
+        backend, transcript_path, llm, threshold, use_cache, stats)]
+    if not sections:
+        return None
+    return dict(make_outline(sections, backend, llm, use_cache, stats), sections=sections)
+
+
+def format_timestamp(seconds):
+    if seconds is None:
+        return ""
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes // 60:d}:{minutes % 60:02d}:{seconds:02d}" if minutes >= 60 else f"{minutes:d}:{seconds:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a lecture into merged topics and an outline.")
+    parser.add_argument("transcript", nargs="?", help="Transcript file (default: the Export Station transcript)")
+    parser.add_argument("--backend", choices=["online", "offline"], default="online")
+    parser.add_argument("--threshold", type=float, default=TOPIC_SIMILARITY, help="Topic similarity threshold")
+    parser.add_argument("--output", help="Write the outline and sections as JSON to this file")
+    args = parser.parse_args()
+
+    stats = {}
+    result = summarize_lecture(args.backend, args.transcript, threshold=args.threshold, stats=stats)
+    if result is None:
+        raise SystemExit("No sections were generated.")
+    print(result["overview"])
+    for topic in result["topics"]:
+        print(f"- [{format_timestamp(topic['start'])}] {topic['title']}")
+    print(stats)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Outline saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
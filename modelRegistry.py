@@ -0,0 +1,246 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Memory budget for all cached models, configurable through the environment
+DEFAULT_BUDGET_MB = int(os.getenv("MODEL_REGISTRY_BUDGET_MB", "4096"))
+# Models unused for longer than this many seconds are evicted (0 disables idle eviction)
+DEFAULT_IDLE_SECONDS = int(os.getenv("MODEL_REGISTRY_IDLE_SECONDS", "0"))
+
+FLAN_T5_MODEL = "google/flan-t5-base"
+MINILM_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+def estimate_size_bytes(obj, seen=None):
+    """
+    Estimate the memory held by a model (or a dict/tuple of models) from its torch tensors.
+    Modules and tensors reachable more than once (e.g. a model and the pipeline wrapping it)
+    are counted once. Objects without tensors count as zero bytes.
+    """
+    seen = set() if seen is None else seen
+    if isinstance(obj, dict):
+        return sum(estimate_size_bytes(value, seen) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(estimate_size_bytes(value, seen) for value in obj)
+
+    # HuggingFaceEmbeddings keeps its SentenceTransformer in `client`; CrossEncoder and pipelines keep `model`
+    module = getattr(obj, "client", None) or getattr(obj, "model", None) or obj
+    if not hasattr(module, "parameters"):
+        module = obj
+    if not hasattr(module, "parameters") or id(module) in seen:
+        return 0
+    seen.add(id(module))
+    total = 0
+    try:
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            if id(tensor) not in seen:
+                seen.add(id(tensor))
+                total += tensor.numel() * tensor.element_size()
+    except Exception:
+        return 0
+    return total
+
+
+class ModelRegistry:
+    """
+    Process-wide, lazily populated model cache.
+
+    Each model is loaded once by its loader function and kept until it is evicted,
+    either because the memory budget is exceeded (least recently used first) or
+    because it has been idle for longer than `idle_seconds`.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB, idle_seconds=DEFAULT_IDLE_SECONDS):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.idle_seconds = idle_seconds
+        self._entries = OrderedDict()  # key -> {"model", "size", "last_used"}
+        self._lock = threading.RLock()
+        self._key_locks = {}
+        self.stats = {"loads": 0, "hits": 0, "evictions": 0, "load_seconds": 0.0}
+
+    def get(self, key, loader):
+        """
+        Return the model registered under `key`, calling `loader()` on first use.
+        """
+        with self._lock:
+            self._evict_idle()
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._touch(key, entry)
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay available meanwhile
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return self._touch(key, entry)
+
+            print(f"[ModelRegistry] Loading {key}...")
+            start = time.perf_counter()
+            model = loader()
+            elapsed = time.perf_counter() - start
+            size = estimate_size_bytes(model)
+
+            with self._lock:
+                self.stats["loads"] += 1
+                self.stats["load_seconds"] += elapsed
+                self._entries[key] = {"model": model, "size": size, "last_used": time.monotonic()}
+                self._evict_over_budget(keep=key)
+            print(f"[ModelRegistry] Loaded {key} in {elapsed:.1f}s ({size / 1024 / 1024:.0f} MB)")
+            return model
+
+    def _touch(self, key, entry):
+        self.stats["hits"] += 1
+        entry["last_used"] = time.monotonic()
+        self._entries.move_to_end(key)
+        return entry["model"]
+
+    def _evict_over_budget(self, keep):
+        while self.used_bytes() > self.budget_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self.evict(oldest)
+
+    def _evict_idle(self):
+        if not self.idle_seconds:
+            return
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if now - e["last_used"] > self.idle_seconds]:
+            self.evict(key)
+
+    def evict(self, key):
+        """
+        Drop a model from the registry. Returns True if it was loaded.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False
+            self.stats["evictions"] += 1
+            print(f"[ModelRegistry] Evicted {key}")
+            return True
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self.evict(key)
+
+    def used_bytes(self):
+        return sum(entry["size"] for entry in self._entries.values())
+
+    def loaded(self):
+        """
+        Return the keys of the currently loaded models, least recently used first.
+        """
+        with self._lock:
+            return list(self._entries)
+
+    def report(self):
+        """
+        Return load/hit counters together with the current memory usage.
+        """
+        with self._lock:
+            report = dict(self.stats)
+            report["loaded"] = list(self._entries)
+            report["used_mb"] = round(self.used_bytes() / 1024 / 1024, 1)
+            report["budget_mb"] = round(self.budget_bytes / 1024 / 1024, 1)
+            return report
+
+
+# Shared registry for the whole process (survives Streamlit reruns)
+registry = ModelRegistry()
+
+
+def get_whisper_model(size="base"):
+    """
+    Return the shared openai-whisper model of the given size.
+    """
+    def load():
+        import whisper
+        if not hasattr(whisper, "load_model"):
+            raise AttributeError("The Whisper library does not have 'load_model'. Ensure openai-whisper is installed.")
+        return whisper.load_model(size)
+
+    return registry.get(f"whisper:{size}", load)
+
+
+def get_faster_whisper_model(size="base", compute_type="int8"):
+    """
+    Return the shared faster-whisper (CTranslate2) model of the given size and compute type.
+    CPU threads follow OMP_NUM_THREADS when it is set.
+    """
+    def load():
+        from faster_whisper import WhisperModel
+        return WhisperModel(size, device="cpu", compute_type=compute_type)
+
+    return registry.get(f"faster-whisper:{size}:{compute_type}", load)
+
+
+def get_flan_t5(model_name=FLAN_T5_MODEL, max_new_tokens=256, backend=None):
+    """
+    Return a dict with the shared Flan-T5 `tokenizer`, `model`, `generator` pipeline and `backend`.
+    The backend (torch, int8 or onnx, see inferenceBackends) defaults to OFFLINE_BACKEND.
+    """
+    from inferenceBackends import OFFLINE_BACKEND, load_seq2seq, warm_up_seq2seq
+    backend = backend or OFFLINE_BACKEND
+
+    def load():
+        from transformers import pipeline
+        tokenizer, model = load_seq2seq(model_name, backend)
+        print(f"[ModelRegistry] Warmed up {model_name} ({backend}) in {warm_up_seq2seq(tokenizer, model):.2f}s")
+        generator = pipeline("text2text-generation", model=model, tokenizer=tokenizer, max_new_tokens=max_new_tokens)
+        return {"tokenizer": tokenizer, "model": model, "generator": generator, "backend": backend}
+
+    return registry.get(f"flan-t5:{model_name}:{max_new_tokens}:{backend}", load)
+
+
+def get_flan_t5_llm(model_name=FLAN_T5_MODEL, max_new_tokens=256, backend=None):
+    """
+    Return the shared Flan-T5 pipeline wrapped as a LangChain LLM.
+    The wrapper is kept in the "flan-t5" entry, so it is evicted together with the model.
+    """
+    flan = get_flan_t5(model_name, max_new_tokens, backend)
+    if "llm" not in flan:
+        from langchain_community.llms import HuggingFacePipeline
+        flan["llm"] = HuggingFacePipeline(pipeline=flan["generator"])
+    return flan["llm"]
+
+
+def get_minilm_embeddings(model_name=MINILM_MODEL, backend=None):
+    """
+    Return the shared MiniLM sentence embeddings as a LangChain `HuggingFaceEmbeddings`.
+    """
+    from inferenceBackends import OFFLINE_BACKEND, load_sentence_embeddings, warm_up_embeddings
+    backend = backend or OFFLINE_BACKEND
+
+    def load():
+        embeddings = load_sentence_embeddings(model_name, backend)
+        print(f"[ModelRegistry] Warmed up {model_name} ({backend}) in {warm_up_embeddings(embeddings):.2f}s")
+        return embeddings
+
+    return registry.get(f"minilm:{model_name}:{backend}", load)
+
+
+def minilm_embedding_id(model_name=MINILM_MODEL, backend=None):
+    """
+    Return the id under which MiniLM vectors are stored in a lecture index. Quantized and ONNX
+    vectors differ slightly from the fp32 ones, so switching the backend rebuilds the index.
+    """
+    from inferenceBackends import OFFLINE_BACKEND
+    backend = backend or OFFLINE_BACKEND
+    return f"minilm:{model_name}" if backend == "torch" else f"minilm:{model_name}:{backend}"
+
+
+def get_cross_encoder(model_name=CROSS_ENCODER_MODEL):
+    """
+    Return the shared sentence-transformers cross-encoder used to re-rank retrieved chunks.
+    """
+    def load():
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(model_name)
+
+    return registry.get(f"cross-encoder:{model_name}", load)
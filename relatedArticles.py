@@ -1,51 +1,32 @@
 import os
-import requests
 from dotenv import load_dotenv
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain_community.llms import OpenAI
+from keywordExtraction import extract_keywords
+from httpClient import serp_search, merge_results
 
 # Load environment variables
 load_dotenv()
 
 EXPORT_PATH = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/Export Station"
 SERP_API_KEY = os.getenv("SERP_API_KEY")
-SERP_API_URL = "https://serpapi.com/search"
+# Each keyword is searched on its own; the merged list keeps this many articles
+ARTICLES_PER_KEYWORD = int(os.getenv("ARTICLES_PER_KEYWORD", "3"))
+MAX_ARTICLES = int(os.getenv("MAX_RELATED_ARTICLES", "10"))
 
 
-def extract_academic_keywords(transcript, num_keywords=7):
+def extract_academic_keywords(transcript, num_keywords=7, mode=None):
     """
-    Extract academic keywords from the transcript in chunks to avoid exceeding token limits.
+    Extract the most relevant academic keywords of the transcript (see `keywordExtraction`):
+    concurrent LLM calls over large chunks ranked locally, or a fully local TF-IDF/embedding mode.
     """
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    if not openai_api_key:
-        raise ValueError("OPENAI_API_KEY is not set in the .env file.")
+    return extract_keywords(transcript, num_keywords, mode=mode)
 
-    # Initialize the OpenAI model
-    llm = OpenAI(openai_api_key=openai_api_key, temperature=0)
 
-    # Define the prompt template
-    prompt_template = PromptTemplate(
-        template=(
-            "Extract {num_keywords} academic and research-oriented keywords from this text:\n\n{text}\n\n"
-            "Keywords:"
-        )
-    )
-    chain = LLMChain(llm=llm, prompt=prompt_template)
-
-    # Chunk the transcript into smaller parts if too long
-    max_chunk_size = 1000  # Approximate size for safe token count
-    chunks = [transcript[i:i + max_chunk_size] for i in range(0, len(transcript), max_chunk_size)]
-
-    keywords = set()
-    for chunk in chunks:
-        try:
-            chunk_keywords = chain.run({"text": chunk, "num_keywords": num_keywords}).strip()
-            keywords.update(chunk_keywords.split(", "))
-        except Exception as e:
-            print(f"Error during keyword extraction for a chunk: {e}")
-
-    return list(keywords)[:num_keywords]  # Return top `num_keywords`
+def _to_article(result):
+    return {
+        "title": result.get("title"),
+        "link": result.get("link"),
+        "description": result.get("snippet", "No description available."),
+    }
 
 
 def retrieve_articles_online(query, num_results=5):
@@ -55,34 +36,30 @@ def retrieve_articles_online(query, num_results=5):
     if not SERP_API_KEY:
         raise ValueError("SERP_API_KEY is not set in the .env file.")
 
-    params = {
-        "q": query,
-        "api_key": SERP_API_KEY,
-        "num": num_results,
-        "engine": "google_scholar",
-    }
+    results = serp_search([query], SERP_API_KEY, engine="google_scholar", num_results=num_results)[0]
+    return [_to_article(result) for result in results]
 
-    response = requests.get(SERP_API_URL, params=params)
-    response.raise_for_status()
-    search_results = response.json()
 
-    articles = []
-    for result in search_results.get("organic_results", []):
-        articles.append({
-            "title": result.get("title"),
-            "link": result.get("link"),
-            "description": result.get("snippet", "No description available."),
-        })
+def retrieve_articles_for_keywords(keywords, per_keyword=ARTICLES_PER_KEYWORD, max_articles=MAX_ARTICLES):
+    """
+    Search Google Scholar for every keyword concurrently (through the cached, pooled HTTP client)
+    and merge the results, best ranked first and without duplicates.
+    """
+    if not SERP_API_KEY:
+        raise ValueError("SERP_API_KEY is not set in the .env file.")
 
-    return articles
+    results = serp_search(keywords, SERP_API_KEY, engine="google_scholar", num_results=per_keyword)
+    return [_to_article(result) for result in merge_results(results, limit=max_articles)]
 
 
-def get_related_articles():
+def get_related_articles(transcript_path=None):
     """
-    Process the transcript, extract academic keywords, and retrieve related articles.
+    Process the transcript (by default the one in the Export Station), extract academic keywords,
+    and retrieve related articles.
     """
     try:
-        transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
+        if transcript_path is None:
+            transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
         if not os.path.exists(transcript_path):
             raise FileNotFoundError("Transcript file not found. Please generate the transcript first.")
 
@@ -93,12 +70,9 @@ def get_related_articles():
         keywords = extract_academic_keywords(transcript)
         print(f"Generated Academic Keywords: {keywords}")
 
-        # Join keywords for the search query
-        query = ", ".join(keywords)
-        print(f"Query Sent for Article Retrieval: {query}")
-
-        # Retrieve articles online using the keywords
-        articles = retrieve_articles_online(query)
+        # Retrieve articles online, one search per keyword
+        articles = retrieve_articles_for_keywords(keywords)
+        print(f"Retrieved {len(articles)} articles for {len(keywords)} keywords")
         return articles
 
     except FileNotFoundError as e:
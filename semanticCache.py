@@ -0,0 +1,177 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+
+DEFAULT_THRESHOLD = 0.92
+# Cosine similarity needed for a semantic hit, per embedding model: their similarity scales differ
+# (OpenAI ada-002 vectors of unrelated questions are already around 0.8 similar, MiniLM's spread wider)
+EMBEDDING_THRESHOLDS = {
+    "openai": float(os.getenv("SEMANTIC_CACHE_THRESHOLD_OPENAI", "0.95")),
+    "minilm": float(os.getenv("SEMANTIC_CACHE_THRESHOLD_MINILM", "0.88")),
+}
+DEFAULT_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+DEFAULT_MAX_ENTRIES = 2000
+# Past interactions loaded from the chat history when a cache is created
+DEFAULT_WARM_LIMIT = int(os.getenv("SEMANTIC_CACHE_WARM_LIMIT", "500"))
+
+# Caches shared by all sessions of the process
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def normalize_question(question):
+    return re.sub(r"[^\w\s]", "", question.lower()).strip()
+
+
+class SemanticCache:
+    """
+    Answer cache for chat questions, keyed by lecture and question embedding.
+
+    A question is answered from the cache when it matches an earlier question of the same lecture
+    exactly (after normalization) or when their embeddings have a cosine similarity of at least
+    `threshold`. Entries expire after `ttl_seconds` and the least recently used ones are evicted
+    above `max_entries`. `embed_documents` (optional) embeds many questions at once when the
+    cache is warmed from the chat history.
+    """
+
+    def __init__(self, embed_query, threshold=DEFAULT_THRESHOLD,
+                 ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES, embed_documents=None):
+        self.embed_query = embed_query
+        self.embed_documents = embed_documents
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (lecture, normalized question) -> entry
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    @staticmethod
+    def _unit(vector):
+        import numpy as np
+        vector = np.asarray(vector, dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self):
+        if not self.ttl_seconds:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        for key in [key for key, entry in self._entries.items() if entry["created_at"] < cutoff]:
+            del self._entries[key]
+            self.stats["expired"] += 1
+
+    def lookup(self, lecture, question):
+        """
+        Return `(answer, embedding)`; `answer` is None on a miss. Pass the embedding on to `add`
+        so that the question isn't embedded twice.
+        """
+        import numpy as np
+
+        key = (lecture, normalize_question(question))
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry["answer"], entry["embedding"]
+            candidates = [(k, e) for k, e in self._entries.items() if k[0] == lecture]
+
+        embedding = self._unit(self.embed_query(question))
+        if candidates:
+            similarities = np.stack([entry["embedding"] for _, entry in candidates]) @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                with self._lock:
+                    best_key, best_entry = candidates[best]
+                    if best_key in self._entries:
+                        self._entries.move_to_end(best_key)
+                    self.stats["semantic_hits"] += 1
+                print(f"Semantic cache hit ({similarities[best]:.3f}): {best_entry['question']!r}")
+                return best_entry["answer"], embedding
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None, embedding
+
+    def add(self, lecture, question, answer, embedding=None, created_at=None):
+        if embedding is None:
+            embedding = self.embed_query(question)
+        key = (lecture, normalize_question(question))
+        with self._lock:
+            self._entries[key] = {
+                "question": question,
+                "answer": answer,
+                "embedding": self._unit(embedding),
+                "created_at": created_at or time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evicted"] += 1
+
+    def warm(self, interactions):
+        """
+        Add past interactions (dicts with lecture, question, answer and created_at, like the rows of
+        the history store) to the cache. Rows without a lecture or answer and rows older than the
+        TTL are skipped. Returns the number of added entries.
+        """
+        cutoff = time.time() - self.ttl_seconds if self.ttl_seconds else None
+        rows = [
+            row for row in interactions
+            if row.get("lecture") and row.get("answer")
+            and (cutoff is None or (row.get("created_at") or 0) >= cutoff)
+        ]
+        if not rows:
+            return 0
+        # Oldest first, so that the newest interactions are the most recently used entries
+        rows.sort(key=lambda row: row.get("created_at") or 0)
+        questions = [row["question"] for row in rows]
+        if self.embed_documents is not None:
+            embeddings = self.embed_documents(questions)
+        else:
+            embeddings = [self.embed_query(question) for question in questions]
+        for row, embedding in zip(rows, embeddings):
+            self.add(row["lecture"], row["question"], row["answer"], embedding=embedding,
+                     created_at=row.get("created_at"))
+        return len(rows)
+
+    def warm_from_history(self, history_store, limit=DEFAULT_WARM_LIMIT):
+        """
+        Warm the cache from the standalone interactions of a history store (follow-up questions
+        depend on earlier turns, so their answers can't be reused).
+        """
+        since = time.time() - self.ttl_seconds if self.ttl_seconds else None
+        added = self.warm(history_store.standalone_answers(limit=min(limit, self.max_entries), since=since))
+        print(f"Semantic cache warmed with {added} interactions from {history_store.path}")
+        return added
+
+    def report(self):
+        with self._lock:
+            report = dict(self.stats)
+            report["entries"] = len(self._entries)
+        lookups = report["exact_hits"] + report["semantic_hits"] + report["misses"]
+        report["hit_rate"] = round((report["exact_hits"] + report["semantic_hits"]) / lookups, 3) if lookups else 0.0
+        return report
+
+
+def get_semantic_cache(name, embeddings, embedding_model, history_store=None, **options):
+    """
+    Return the process-wide semantic cache `name`, built on a LangChain embeddings object of
+    `embedding_model` (a key of EMBEDDING_THRESHOLDS, which sets its similarity threshold).
+    A new cache is warmed from `history_store` when one is given.
+    """
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            options.setdefault("threshold", EMBEDDING_THRESHOLDS.get(embedding_model, DEFAULT_THRESHOLD))
+            cache = SemanticCache(embeddings.embed_query, embed_documents=embeddings.embed_documents, **options)
+            if history_store is not None:
+                try:
+                    cache.warm_from_history(history_store)
+                except Exception as e:
+                    print(f"Could not warm the semantic cache from the history: {e}")
+            _caches[name] = cache
+        return cache
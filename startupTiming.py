@@ -0,0 +1,76 @@
+import sys
+import time
+import argparse
+import importlib
+import threading
+
+# Modules imported through `timed_import`, in first-use order (kept across Streamlit reruns)
+_timings = {}
+_lock = threading.Lock()
+
+# Page modules of the app, used by the command-line report
+PAGE_MODULES = (
+    "generateTranscript",
+    "structuredInfo",
+    "relatedArticles",
+    "chatCourse",
+    "structuredInfoOff",
+    "chatCourseOff",
+)
+
+
+def timed_import(name):
+    """
+    Import a module on first use and record how long the import took and how many
+    modules it pulled in. Later calls return the already imported module.
+    """
+    module = sys.modules.get(name)
+    if module is not None and name in _timings:
+        return module
+    with _lock:
+        before = len(sys.modules)
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        elapsed = time.perf_counter() - start
+        if name not in _timings:
+            _timings[name] = {"seconds": round(elapsed, 3), "new_modules": len(sys.modules) - before}
+            print(f"[Startup] Imported {name} in {elapsed:.2f}s")
+    return module
+
+
+def record(name, seconds):
+    """
+    Record the duration of a startup step that isn't a module import (e.g. the first paint).
+    """
+    with _lock:
+        _timings.setdefault(name, {"seconds": round(seconds, 3), "new_modules": 0})
+
+
+def report():
+    """
+    Return the recorded import and startup timings, slowest first.
+    """
+    with _lock:
+        return dict(sorted(_timings.items(), key=lambda item: item[1]["seconds"], reverse=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long each page module of the app takes to import.")
+    parser.add_argument("modules", nargs="*", default=list(PAGE_MODULES), help="Modules to import, in order")
+    args = parser.parse_args()
+
+    # Each module is charged only for what earlier modules didn't import already
+    start = time.perf_counter()
+    for name in args.modules:
+        try:
+            timed_import(name)
+        except ImportError as e:
+            print(f"[Startup] Could not import {name}: {e}")
+    total = time.perf_counter() - start
+    for name, timing in report().items():
+        print(f"{name:<24} {timing['seconds']:>8.2f}s {timing['new_modules']:>6} modules")
+    print(f"{'total':<24} {total:>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
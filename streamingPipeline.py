@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+
+from generateTranscript import EXPORT_PATH, iter_transcribe_chunked, save_segments, segments_path_for
+from chunking import make_chunker
+
+# Bounded queues between the stages: a slow stage blocks the ones before it instead of
+# letting finished segments pile up in memory
+QUEUE_SIZE = int(os.getenv("STREAMING_QUEUE_SIZE", "8"))
+# Chunks structured / embedded together once they are queued up
+STRUCTURE_BATCH = 4
+EMBED_BATCH = 16
+
+# Marks the end of a stream in the queues
+_END = object()
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+class StreamingPipeline:
+    """
+    Transcribe one lecture while its finished parts are already chunked, structured and embedded.
+
+    Whisper pieces flow through bounded queues into the chunkers (the same segment chunking as the
+    batch stages), then into structuring and embedding, each running on its own thread. Only
+    finalizing the transcript, the lecture index entry and the related articles waits for the end
+    of the transcription, so the result is the same as transcribing first and processing after.
+    """
+
+    def __init__(self, structure_backend="online", index_backend=None, articles=False, single_pass=False,
+                 use_cache=True, queue_size=QUEUE_SIZE, on_section=None):
+        self.structure_backend = structure_backend
+        # "online" / "offline" chat index, or "none"
+        self.index_backend = structure_backend if index_backend is None else index_backend
+        self.articles = articles
+        self.single_pass = single_pass
+        self.use_cache = use_cache
+        self.queue_size = queue_size
+        self.on_section = on_section
+        self._stop = threading.Event()
+        self._errors = []
+
+    # --- queue helpers ---
+
+    def _put(self, q, item):
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise PipelineStopped()
+
+    def _get_batch(self, q, max_items):
+        """
+        Wait for one item, then take whatever else is queued (up to `max_items`).
+        Returns `(items, ended)`.
+        """
+        while True:
+            if self._stop.is_set():
+                raise PipelineStopped()
+            try:
+                item = q.get(timeout=0.5)
+                break
+            except queue.Empty:
+                continue
+        items = []
+        while item is not _END:
+            items.append(item)
+            if len(items) >= max_items:
+                return items, False
+            try:
+                item = q.get_nowait()
+            except queue.Empty:
+                return items, False
+        return items, True
+
+    def _thread(self, name, target, *args):
+        def run():
+            try:
+                target(*args)
+            except PipelineStopped:
+                pass
+            except Exception as e:
+                print(f"[Streaming] {name} failed: {e}")
+                self._errors.append(e)
+                self._stop.set()
+            # When the stage finished, in seconds since the start of the run
+            self.seconds[name] = round(time.perf_counter() - self._start, 2)
+
+        thread = threading.Thread(target=run, name=f"streaming-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    # --- stages ---
+
+    def _transcribe(self, file_path, transcript_path, segment_q, options):
+        pieces = iter_transcribe_chunked(file_path, **options)
+        try:
+            for piece in pieces:
+                if piece["text"]:
+                    self.texts.append(piece["text"])
+                self.segments.extend(piece["segments"])
+                # Partial transcript on disk, like the chunked transcription of the app
+                with open(transcript_path, "w") as f:
+                    f.write(" ".join(self.texts))
+                print(f"[Streaming] Transcribed piece {piece['index'] + 1}/{piece['total']}")
+                for segment in piece["segments"]:
+                    self._put(segment_q, segment)
+        finally:
+            pieces.close()
+            if not self._stop.is_set():
+                self._put(segment_q, _END)
+
+    def _chunk(self, segment_q, structure_q, embed_q, structure_chunker, index_chunker, is_usable):
+        def emit(chunks_by_queue):
+            for q, chunks in chunks_by_queue:
+                for chunk in chunks:
+                    if q is structure_q and not is_usable(chunk["text"]):
+                        continue
+                    self._put(q, chunk)
+
+        ended = False
+        while not ended:
+            segments, ended = self._get_batch(segment_q, self.queue_size)
+            for segment in segments:
+                emit([(structure_q, structure_chunker.add(segment)),
+                      (embed_q, index_chunker.add(segment) if index_chunker else [])])
+        emit([(structure_q, structure_chunker.finish()), (embed_q, index_chunker.finish() if index_chunker else [])])
+        self._put(structure_q, _END)
+        self._put(embed_q, _END)
+
+    def _structure_online(self, structure_q, stats):
+        from structuredInfo import make_structurer, pick_key_point_chunks, MAX_CONCURRENCY, REQUESTS_PER_SECOND
+        from asyncStructurer import iter_structure_chunks
+
+        chains, run_cached = make_structurer(use_cache=self.use_cache, stats=stats)
+        ended = False
+        while not ended:
+            chunks, ended = self._get_batch(structure_q, STRUCTURE_BATCH)
+            if not chunks:
+                continue
+            first = len(self.chunks)
+            self.chunks.extend(chunk["text"] for chunk in chunks)
+            # Picks of earlier chunks don't depend on the total, so they match the batch run
+            key_point_chunks = {i - first for i in pick_key_point_chunks(len(self.chunks)) if i >= first}
+            for idx, section in iter_structure_chunks(
+                [chunk["text"] for chunk in chunks], chains, key_point_chunks, run_cached,
+                single_pass=self.single_pass, concurrency=MAX_CONCURRENCY,
+                requests_per_second=REQUESTS_PER_SECOND, stats=stats,
+            ):
+                self._add_section(first + idx, section)
+
+    def _structure_offline(self, structure_q, stats):
+        from structuredInfoOff import structure_chunks_offline, dedup_sections, NearDuplicateFilter
+
+        seen_sections = set()
+        near_duplicates = NearDuplicateFilter(stats=stats)
+        ended = False
+        while not ended:
+            chunks, ended = self._get_batch(structure_q, STRUCTURE_BATCH)
+            if not chunks:
+                continue
+            first = len(self.chunks)
+            texts = [chunk["text"] for chunk in chunks]
+            self.chunks.extend(texts)
+            kept = near_duplicates.filter(enumerate(texts, start=first))
+            if not kept:
+                continue
+            sections = structure_chunks_offline([text for _, text in kept], single_pass=self.single_pass,
+                                                use_cache=self.use_cache, stats=stats)
+            indexed = [(idx, sections[text]) for idx, text in kept]
+            for idx, section in dedup_sections(indexed, seen_sections):
+                self._add_section(idx, section)
+
+    def _add_section(self, idx, section):
+        self.sections.append(section)
+        if self.on_section:
+            self.on_section(idx, section)
+
+    def _embed(self, embed_q, index):
+        ended = False
+        while not ended:
+            chunks, ended = self._get_batch(embed_q, EMBED_BATCH)
+            if chunks:
+                vectors = index.embeddings.embed_documents([chunk["text"] for chunk in chunks])
+                self.embedded.extend(zip(chunks, vectors))
+
+    # --- driver ---
+
+    def run(self, file_path, transcript_path=None, workers=None, chunk_seconds=300, backend=None,
+            model_size=None):
+        """
+        Process one recording. Returns a dict with the transcript, sections, lecture hash,
+        related articles, stage finish times (seconds since start) and structuring stats.
+        """
+        if transcript_path is None:
+            os.makedirs(EXPORT_PATH, exist_ok=True)
+            transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
+
+        if self.structure_backend == "offline":
+            from structuredInfoOff import CHUNK_PROFILE, is_usable_chunk as is_usable
+            structure = self._structure_offline
+        else:
+            from structuredInfo import CHUNK_PROFILE
+            structure = self._structure_online
+
+            def is_usable(text):
+                return True
+
+        index = None
+        if self.index_backend == "online":
+            from chatCourse import get_index
+            index = get_index()
+        elif self.index_backend == "offline":
+            from chatCourseOff import get_index
+            index = get_index()
+
+        self.texts, self.segments, self.chunks, self.sections, self.embedded = [], [], [], [], []
+        self.seconds = {}
+        self._stop.clear()
+        self._errors = []
+        self._start = time.perf_counter()
+        stats = {}
+
+        segment_q = queue.Queue(self.queue_size)
+        structure_q = queue.Queue(self.queue_size)
+        embed_q = queue.Queue(self.queue_size)
+        options = {"workers": workers, "chunk_seconds": chunk_seconds, "backend": backend, "model_size": model_size}
+        index_chunker = make_chunker(index.chunk_profile) if index else None
+
+        threads = [
+            self._thread("transcribe", self._transcribe, file_path, transcript_path, segment_q, options),
+            self._thread("chunk", self._chunk, segment_q, structure_q, embed_q,
+                         make_chunker(CHUNK_PROFILE), index_chunker, is_usable),
+            self._thread("structure", structure, structure_q, stats),
+        ]
+        if index:
+            threads.append(self._thread("embed", self._embed, embed_q, index))
+        else:
+            threads.append(self._thread("embed", self._drain, embed_q))
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+        # Everything below needs the complete transcript
+        transcript = " ".join(self.texts)
+        with open(transcript_path, "w") as f:
+            f.write(transcript)
+        save_segments(self.segments, segments_path_for(transcript_path))
+
+        lecture = None
+        if index:
+            lecture = index.add_transcript(transcript, source=transcript_path, segments=self.segments,
+                                           embedded=self.embedded)
+        articles = None
+        if self.articles:
+            from relatedArticles import get_related_articles
+            articles = get_related_articles(transcript_path)
+
+        self.seconds["total"] = round(time.perf_counter() - self._start, 2)
+        return {
+            "transcript_path": transcript_path,
+            "transcript": transcript,
+            "sections": self.sections,
+            "lecture": lecture,
+            "articles": articles,
+            "seconds": self.seconds,
+            "stats": stats,
+        }
+
+    def _drain(self, q):
+        ended = False
+        while not ended:
+            _, ended = self._get_batch(q, self.queue_size)
+
+
+def verify_against_batch(result, structure_backend="online", single_pass=False):
+    """
+    Structure the finished transcript again with the batch stage (cached generations make this
+    cheap) and return whether both runs produced the same sections.
+    """
+    if structure_backend == "offline":
+        from structuredInfoOff import process_transcript_offline as process
+    else:
+        from structuredInfo import process_transcript as process
+    batch_sections = process(transcript_path=result["transcript_path"], single_pass=single_pass) or []
+    return batch_sections == result["sections"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe a lecture while structuring and indexing it.")
+    parser.add_argument("audio", help="Audio file of the lecture")
+    parser.add_argument("--transcript", help="Where to write the transcript (default: the Export Station)")
+    parser.add_argument("--structure-backend", choices=["online", "offline"], default="online")
+    parser.add_argument("--index", choices=["online", "offline", "none"], help="Chat index to add the lecture to "
+                        "(default: same as the structure backend)")
+    parser.add_argument("--articles", action="store_true", help="Also retrieve related articles at the end")
+    parser.add_argument("--single-pass", action="store_true", help="One structuring call per chunk")
+    parser.add_argument("--workers", type=int, help="Transcription worker processes")
+    parser.add_argument("--chunk-seconds", type=int, default=300, help="Length of the transcribed pieces")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Capacity of the stage queues")
+    parser.add_argument("--verify", action="store_true", help="Check the sections against a batch run")
+    parser.add_argument("--output", help="Write the sections and timings as JSON to this file")
+    args = parser.parse_args()
+
+    pipeline = StreamingPipeline(
+        structure_backend=args.structure_backend,
+        index_backend=args.index,
+        articles=args.articles, single_pass=args.single_pass, queue_size=args.queue_size,
+        on_section=lambda idx, section: print(f"[Streaming] Section {idx + 1}: {section['title']}"),
+    )
+    result = pipeline.run(args.audio, args.transcript, workers=args.workers, chunk_seconds=args.chunk_seconds)
+    seconds = result["seconds"]
+    print(f"Finished in {seconds['total']}s (transcription {seconds.get('transcribe')}s, "
+          f"{seconds['total'] - seconds.get('transcribe', 0):.2f}s after it): {seconds}")
+
+    if args.verify:
+        same = verify_against_batch(result, args.structure_backend, args.single_pass)
+        print("Sections match the batch run." if same else "Sections DIFFER from the batch run.")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({key: result[key] for key in ("sections", "lecture", "articles", "seconds", "stats")}, f,
+                      indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
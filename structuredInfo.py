@@ -3,81 +3,154 @@ import random
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 from langchain_openai import OpenAI
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from dotenv import load_dotenv
+from llmCache import get_llm_cache
+from asyncStructurer import iter_structure_chunks
+from structuredOutput import COMBINED_TEMPLATE, COMBINED_TEMPLATE_NO_KEY_POINTS
+from chunking import chunk_transcript, load_segments, chunking_id
 
 # Load environment variables
 load_dotenv()
 
 EXPORT_PATH = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/Export Station"
 
-def process_transcript():
+# Concurrency limits for the OpenAI calls, tune them to the account's rate limits
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+REQUESTS_PER_SECOND = float(os.getenv("OPENAI_REQUESTS_PER_SECOND", "0")) or None
+# Structure each chunk with one JSON call instead of three separate calls
+SINGLE_PASS = os.getenv("STRUCTURED_SINGLE_PASS", "0") == "1"
+# Chunks sized in OpenAI tokens, cut at Whisper segment (or sentence) boundaries (see chunking.CHUNK_PROFILES)
+CHUNK_PROFILE = "structure_online"
+# Seed of the key-point intervals, fixed so that reruns (and cached generations) pick the same chunks
+KEY_POINTS_SEED = int(os.getenv("KEY_POINTS_SEED", "0"))
+
+
+def artifact_params():
     """
-    Load the transcript from the Export Station and process it using LangChain.
-    Each chunk gets a title and a summary, and key points are added at random intervals.
+    Settings the online sections depend on. The app and the pipeline both record their
+    "sections_online" artifact with these, so a changed chunker or setting rebuilds them.
+    """
+    return {
+        "single_pass": SINGLE_PASS,
+        "key_points_seed": KEY_POINTS_SEED,
+        "chunking": chunking_id(CHUNK_PROFILE),
+    }
 
-    Returns:
-        list: A list of dictionaries containing structured sections.
+
+def pick_key_point_chunks(num_chunks, seed=KEY_POINTS_SEED):
     """
-    try:
+    Choose the chunk indexes that get key points, at random intervals of 1 to 5 chunks.
+    The choice for the first chunks doesn't depend on `num_chunks`, so a transcript that is
+    still growing keeps its earlier picks.
+    """
+    rng = random.Random(seed)
+    key_point_chunks = set()
+    next_key_points_chunk = rng.randint(1, 5)
+    while next_key_points_chunk <= num_chunks:
+        key_point_chunks.add(next_key_points_chunk - 1)
+        next_key_points_chunk += rng.randint(1, 5)
+    return key_point_chunks
+
+
+def split_transcript(transcript, segments=None):
+    """
+    Split a transcript into the chunks that are structured, along Whisper segments when available
+    and along sentences otherwise.
+    """
+    return [chunk["text"] for chunk in chunk_transcript(transcript, segments, CHUNK_PROFILE)]
+
+
+def make_structurer(llm=None, use_cache=True, stats=None):
+    """
+    Return the LangChain chains and the cached chain runner used to structure chunks
+    (see `asyncStructurer.iter_structure_chunks`).
+    """
+    if llm is None:
         # Load the OpenAI API key from the environment
         openai_api_key = os.getenv("OPENAI_API_KEY")
         if not openai_api_key:
             raise ValueError("OpenAI API key not found. Please set it in the .env file.")
-
-        # Check if the transcript exists in Export Station
-        transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
-        if not os.path.exists(transcript_path):
-            raise FileNotFoundError(f"Transcript file not found in {EXPORT_PATH}. Please generate it first.")
-
-        # Read the transcript
-        with open(transcript_path, "r") as f:
-            transcript = f.read()
-
-        # Initialize LangChain components
         llm = OpenAI(openai_api_key=openai_api_key, temperature=0)
-        splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=200)
-
-        # Prompt templates
-        title_prompt = PromptTemplate(template="Provide a concise title for the following text:\n\n{text}\n")
-        summary_prompt = PromptTemplate(template="Summarize the following text:\n\n{text}\n")
-        key_points_prompt = PromptTemplate(template="Extract key points from the following text:\n\n{text}\n")
 
-        title_chain = LLMChain(llm=llm, prompt=title_prompt)
-        summary_chain = LLMChain(llm=llm, prompt=summary_prompt)
-        key_points_chain = LLMChain(llm=llm, prompt=key_points_prompt)
+    # Prompt templates
+    title_prompt = PromptTemplate(template="Provide a concise title for the following text:\n\n{text}\n")
+    summary_prompt = PromptTemplate(template="Summarize the following text:\n\n{text}\n")
+    key_points_prompt = PromptTemplate(template="Extract key points from the following text:\n\n{text}\n")
+
+    chains = {
+        "title": LLMChain(llm=llm, prompt=title_prompt),
+        "summary": LLMChain(llm=llm, prompt=summary_prompt),
+        "key_points": LLMChain(llm=llm, prompt=key_points_prompt),
+        "combined": LLMChain(llm=llm, prompt=PromptTemplate(template=COMBINED_TEMPLATE_NO_KEY_POINTS)),
+        "combined_key_points": LLMChain(llm=llm, prompt=PromptTemplate(template=COMBINED_TEMPLATE)),
+    }
+
+    # Generations are cached on disk by model, prompt template and chunk
+    cache = get_llm_cache()
+    model_id = f"openai:{llm.model_name}:t{llm.temperature}"
+    stats = stats if stats is not None else {}
+    stats.setdefault("calls", 0)
+
+    async def run_cached(chain, chunk):
+        text = cache.get(model_id, chain.prompt.template, chunk) if use_cache else None
+        if text is None:
+            stats["calls"] += 1
+            text = (await chain.arun({"text": chunk})).strip()
+            # Forced and benchmark runs (use_cache=False) leave the cache as it was
+            if use_cache:
+                cache.set(model_id, chain.prompt.template, chunk, text)
+        return text
+
+    return chains, run_cached
+
+
+def iter_process_transcript(llm=None, concurrency=MAX_CONCURRENCY, requests_per_second=REQUESTS_PER_SECOND,
+                            single_pass=SINGLE_PASS, transcript_path=None, use_cache=True, stats=None):
+    """
+    Load the transcript from the Export Station and process it using LangChain.
+    Each chunk gets a title and a summary, and key points are added at random intervals.
+    All generations are dispatched concurrently (at most `concurrency` at a time).
+    With `single_pass`, each chunk is structured by one JSON call instead of one call per field.
 
-        # Split and process transcript
-        chunks = splitter.split_text(transcript)
-        structured_data = []
+    Yields:
+        tuple: `(index, total, section)` for every chunk, in order, as soon as it is ready.
+        Closing the generator cancels the generations that are still pending.
+    """
+    # Check if the transcript exists in Export Station
+    if transcript_path is None:
+        transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
+    if not os.path.exists(transcript_path):
+        raise FileNotFoundError(f"Transcript file not found in {EXPORT_PATH}. Please generate it first.")
 
-        # Initialize random interval for key points
-        key_points_interval = random.randint(1, 5)
-        next_key_points_chunk = key_points_interval
+    # Read the transcript
+    with open(transcript_path, "r") as f:
+        transcript = f.read()
 
-        for idx, chunk in enumerate(chunks):
-            print(f"Processing chunk {idx + 1}/{len(chunks)}...")
+    stats = stats if stats is not None else {}
+    chains, run_cached = make_structurer(llm, use_cache, stats)
 
-            title = title_chain.run({"text": chunk}).strip()
-            summary = summary_chain.run({"text": chunk}).strip()
+    # Split and process transcript
+    chunks = split_transcript(transcript, load_segments(transcript_path, transcript))
+    print(f"Processing {len(chunks)} chunks...")
 
-            section = {
-                "title": title,
-                "summary": summary,
-            }
+    for idx, section in iter_structure_chunks(
+        chunks, chains, pick_key_point_chunks(len(chunks)), run_cached, single_pass=single_pass,
+        concurrency=concurrency, requests_per_second=requests_per_second, stats=stats,
+    ):
+        yield idx, len(chunks), section
 
-            # Add key points at random intervals
-            if idx + 1 == next_key_points_chunk:
-                key_points = key_points_chain.run({"text": chunk}).strip()
-                section["key_points"] = key_points
+    print(f"LLM cache: {get_llm_cache().stats()}")
 
-                # Set the next interval
-                key_points_interval = random.randint(1, 5)
-                next_key_points_chunk = idx + 1 + key_points_interval
 
-            structured_data.append(section)
+def process_transcript(**kwargs):
+    """
+    Structure the whole transcript at once (see `iter_process_transcript` for the options).
 
-        return structured_data
+    Returns:
+        list: A list of dictionaries containing structured sections.
+    """
+    try:
+        return [section for _, _, section in iter_process_transcript(**kwargs)]
 
     except FileNotFoundError as e:
         print(f"Error: {e}")
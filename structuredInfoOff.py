@@ -1,19 +1,49 @@
 import os
 import re
+import time
 from dotenv import load_dotenv
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from modelRegistry import get_flan_t5
+from inferenceBackends import OFFLINE_BACKEND
+from llmCache import get_llm_cache
+from structuredOutput import COMBINED_TEMPLATE_OFFLINE, OFFLINE_ANSWER_PREFIX, parse_labeled_fields
+from chunking import chunk_transcript, load_segments, chunking_id
 
 # Load .env (for consistent config even if unused here)
 load_dotenv()
 
 EXPORT_PATH = "/home/fafnir/Alpha/_Python/Python Current/Youssef Thesis/Export Station"
 
-# Load the local model once
+# The local model is shared through the model registry and loaded on first use
 model_name = "google/flan-t5-base"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-generator = pipeline("text2text-generation", model=model, tokenizer=tokenizer, max_new_tokens=256)
+
+# Stronger, more directive prompts
+TITLE_TEMPLATE = "Write a clear, academic-style TITLE (max 10 words) for this lecture text:\n\n{chunk}\n\nTITLE:"
+SUMMARY_TEMPLATE = "Write a CONCISE summary (2-3 sentences, avoid repeating phrases):\n\n{chunk}\n\nSUMMARY:"
+KEY_POINTS_TEMPLATE = "List 3-5 clear bullet-point KEY POINTS (short phrases):\n\n{chunk}\n\nKEY POINTS:"
+
+# Batched CPU inference settings (threads and backend are set in inferenceBackends)
+BATCH_SIZE = int(os.getenv("OFFLINE_BATCH_SIZE", "8"))
+MAX_INPUT_TOKENS = 512
+MAX_NEW_TOKENS = 256
+# Structure each chunk with one labeled generation (title, summary, key points) instead of three
+SINGLE_PASS = os.getenv("STRUCTURED_SINGLE_PASS", "0") == "1"
+# Chunks sized in Flan-T5 tokens so that chunk and prompt fit in MAX_INPUT_TOKENS (see chunking.CHUNK_PROFILES)
+CHUNK_PROFILE = "structure_offline"
+MIN_CHUNK_WORDS = 20
+# Chunks at least this similar (MiniLM cosine) to an earlier chunk are skipped before generation; 0 turns it off
+DEDUP_SIMILARITY = float(os.getenv("OFFLINE_DEDUP_SIMILARITY", "0"))
+
+def artifact_params():
+    """
+    Settings the offline sections depend on. The app and the pipeline both record their
+    "sections_offline" artifact with these, so that each reuses the other's sections.
+    """
+    return {
+        "single_pass": SINGLE_PASS,
+        "backend": OFFLINE_BACKEND,
+        "chunking": chunking_id(CHUNK_PROFILE),
+        "dedup_similarity": DEDUP_SIMILARITY,
+    }
 
 def clean_text(text):
     """Remove redundant whitespace, repeated words, or filler."""
@@ -21,69 +51,252 @@ def clean_text(text):
     text = re.sub(r'(Cloud computing\s*){2,}', 'Cloud computing ', text)
     return text.strip()
 
-def generate_offline(prompt):
-    """Call the offline model with a given prompt and return cleaned text."""
-    result = generator(prompt)
-    return clean_text(result[0]['generated_text'])
+def local_model_id():
+    """Cache id of the local model; quantized and ONNX generations are cached separately."""
+    return f"local:{model_name}" if OFFLINE_BACKEND == "torch" else f"local:{model_name}:{OFFLINE_BACKEND}"
 
-def process_transcript_offline():
-    try:
+def generate_offline_batch(prompts, batch_size=BATCH_SIZE):
+    """
+    Run many prompts through the offline model in padded batches.
+
+    Prompts are sorted by token length first so that each batch needs little padding. The CPU
+    threads are set once when the model is loaded (see inferenceBackends.load_seq2seq).
+    Returns the cleaned outputs in the order of `prompts` and a dict with throughput stats.
+    """
+    import torch
+
+    flan = get_flan_t5(model_name)
+    tokenizer, model = flan["tokenizer"], flan["model"]
+
+    lengths = [len(ids) for ids in tokenizer(prompts, truncation=True, max_length=MAX_INPUT_TOKENS)["input_ids"]]
+    order = sorted(range(len(prompts)), key=lambda i: lengths[i])
+
+    outputs = [None] * len(prompts)
+    input_tokens = 0
+    output_tokens = 0
+    start = time.perf_counter()
+    for batch_start in range(0, len(order), batch_size):
+        batch = order[batch_start:batch_start + batch_size]
+        encoded = tokenizer([prompts[i] for i in batch], padding=True, truncation=True,
+                            max_length=MAX_INPUT_TOKENS, return_tensors="pt")
+        with torch.inference_mode():
+            generated = model.generate(**encoded, max_new_tokens=MAX_NEW_TOKENS)
+
+        input_tokens += int(encoded["attention_mask"].sum())
+        output_tokens += int((generated != tokenizer.pad_token_id).sum())
+        for i, text in zip(batch, tokenizer.batch_decode(generated, skip_special_tokens=True)):
+            outputs[i] = clean_text(text)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "prompts": len(prompts),
+        "backend": flan["backend"],
+        "batch_size": batch_size,
+        "threads": torch.get_num_threads(),
+        "seconds": round(elapsed, 2),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "tokens_per_second": round((input_tokens + output_tokens) / elapsed, 1) if elapsed else 0.0,
+    }
+    print(f"[Offline] Batched generation: {stats}")
+    return outputs, stats
+
+def generate_fields(requests, batch_size=BATCH_SIZE, use_cache=True, stats=None):
+    """
+    Generate the answers for a list of (template, chunk) requests.
+    Cached answers are reused, all others are generated together in batches.
+    Returns a dict mapping each request to its answer.
+    """
+    cache = get_llm_cache()
+    model_id = local_model_id()
+    generated = {}
+    missing = []
+    for template, chunk in dict.fromkeys(requests):
+        cached = cache.get(model_id, template, chunk) if use_cache else None
+        if cached is None:
+            missing.append((template, chunk))
+        else:
+            generated[(template, chunk)] = cached
+
+    if missing:
+        print(f"[Offline] Generating {len(missing)} answers...")
+        prompts = [template.format(chunk=chunk) for template, chunk in missing]
+        outputs, batch_stats = generate_offline_batch(prompts, batch_size=batch_size)
+        for (template, chunk), text in zip(missing, outputs):
+            if use_cache:
+                cache.set(model_id, template, chunk, text)
+            generated[(template, chunk)] = text
+        if stats is not None:
+            stats["calls"] = stats.get("calls", 0) + len(missing)
+            stats["input_tokens"] = stats.get("input_tokens", 0) + batch_stats["input_tokens"]
+            stats["output_tokens"] = stats.get("output_tokens", 0) + batch_stats["output_tokens"]
+    return generated
+
+def split_transcript_offline(transcript, segments=None):
+    """
+    Split a transcript into the chunks that are structured, along Whisper segments when available
+    and along sentences otherwise. Empty or very short chunks are skipped.
+    """
+    chunks = [chunk["text"] for chunk in chunk_transcript(transcript, segments, CHUNK_PROFILE)]
+    return [chunk for chunk in chunks if is_usable_chunk(chunk)]
+
+def is_usable_chunk(chunk):
+    return len(chunk.strip().split()) >= MIN_CHUNK_WORDS
+
+def dedup_sections(indexed_sections, seen_sections):
+    """
+    Yield the `(index, section)` pairs whose title and summary weren't seen before,
+    recording them in `seen_sections`.
+    """
+    for idx, section in indexed_sections:
+        unique_signature = (section["title"].lower(), section["summary"].lower())
+        if unique_signature in seen_sections:
+            continue
+        seen_sections.add(unique_signature)
+        yield idx, section
+
+class NearDuplicateFilter:
+    """
+    Skip chunks that are nearly identical to a chunk already kept, before any generation runs.
+
+    Chunks are embedded with the MiniLM model of the offline chat (or `embed_documents`), and a
+    chunk whose cosine similarity to a kept chunk reaches `threshold` is skipped. Works
+    incrementally, so batch and streaming runs skip the same chunks. Kept vectors live in one
+    matrix that doubles its capacity when full, so each chunk costs one matrix-vector product.
+    """
+
+    def __init__(self, threshold=DEDUP_SIMILARITY, stats=None, embed_documents=None):
+        self.threshold = threshold
+        self.stats = stats
+        self.embed_documents = embed_documents
+        self.kept = None  # rows [:len(self.kept_indexes)] hold the kept unit vectors
+        self.kept_indexes = []
+
+    def _keep(self, idx, vector):
+        import numpy as np
+
+        count = len(self.kept_indexes)
+        if self.kept is None:
+            self.kept = np.empty((16, len(vector)), dtype="float32")
+        elif count == len(self.kept):
+            grown = np.empty((2 * count, self.kept.shape[1]), dtype="float32")
+            grown[:count] = self.kept
+            self.kept = grown
+        self.kept[count] = vector
+        self.kept_indexes.append(idx)
+
+    def filter(self, indexed_chunks):
+        """
+        Return the `(index, chunk)` pairs worth generating, reporting every skipped chunk.
+        """
+        import numpy as np
+
+        indexed_chunks = list(indexed_chunks)
+        if not self.threshold or not indexed_chunks:
+            return indexed_chunks
+        embed_documents = self.embed_documents
+        if embed_documents is None:
+            from modelRegistry import get_minilm_embeddings
+            embed_documents = get_minilm_embeddings().embed_documents
+        vectors = np.array(embed_documents([chunk for _, chunk in indexed_chunks]), dtype="float32")
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9
+
+        kept = []
+        for (idx, chunk), vector in zip(indexed_chunks, vectors):
+            if self.kept_indexes:
+                similarity = self.kept[:len(self.kept_indexes)] @ vector
+                best = int(similarity.argmax())
+                if similarity[best] >= self.threshold:
+                    print(f"[Offline] Skipping chunk {idx + 1}: {similarity[best]:.2f} similar to chunk "
+                          f"{self.kept_indexes[best] + 1}")
+                    if self.stats is not None:
+                        self.stats.setdefault("near_duplicates", []).append(
+                            {"chunk": idx, "similar_to": self.kept_indexes[best],
+                             "similarity": round(float(similarity[best]), 3)})
+                    continue
+            self._keep(idx, vector)
+            kept.append((idx, chunk))
+        return kept
+
+def structure_chunks_offline(chunks, single_pass=SINGLE_PASS, **options):
+    """
+    Generate the sections of a group of chunks, returning a dict mapping each chunk to its section.
+    With `single_pass`, each chunk is structured by one labeled plain-text generation; only the
+    fields missing from that answer are then generated separately.
+    """
+    fields = dict(zip(("title", "summary", "key_points"), (TITLE_TEMPLATE, SUMMARY_TEMPLATE, KEY_POINTS_TEMPLATE)))
+    stats = options.get("stats")
+
+    sections = {chunk: {} for chunk in chunks}
+    if single_pass:
+        combined = generate_fields([(COMBINED_TEMPLATE_OFFLINE, chunk) for chunk in chunks], **options)
+        for chunk in sections:
+            answer = combined[(COMBINED_TEMPLATE_OFFLINE, chunk)]
+            sections[chunk] = parse_labeled_fields(f"{OFFLINE_ANSWER_PREFIX} {answer}")
+        if stats is not None:
+            stats["fallbacks"] = stats.get("fallbacks", 0) + sum(len(section) < len(fields) for section in sections.values())
+
+    # Fields the single-pass answer didn't contain get one generation each
+    missing = [(template, chunk) for chunk, section in sections.items()
+               for field, template in fields.items() if field not in section]
+    generated = generate_fields(missing, **options)
+    for chunk, section in sections.items():
+        sections[chunk] = {field: section.get(field) or generated[(template, chunk)] for field, template in fields.items()}
+    return sections
+
+def iter_process_transcript_offline(batch_size=BATCH_SIZE, single_pass=SINGLE_PASS, transcript_path=None,
+                                    use_cache=True, stats=None, dedup_similarity=DEDUP_SIMILARITY):
+    """
+    Structure the transcript into sections with the local Flan-T5 model.
+
+    Chunks are generated in groups of `batch_size`, and `(index, total, section)` is yielded for
+    every new section as soon as its group is done. With `dedup_similarity`, chunks nearly
+    identical to an earlier one are skipped before generation (see `NearDuplicateFilter`).
+    Sections repeating an earlier title and summary are skipped. Closing the generator stops
+    before the next group.
+    """
+    if transcript_path is None:
         transcript_path = os.path.join(EXPORT_PATH, "transcript.txt")
-        if not os.path.exists(transcript_path):
-            raise FileNotFoundError(f"Transcript not found in {EXPORT_PATH}")
+    if not os.path.exists(transcript_path):
+        raise FileNotFoundError(f"Transcript not found in {EXPORT_PATH}")
 
-        with open(transcript_path, "r") as f:
-            transcript = f.read()
+    with open(transcript_path, "r") as f:
+        transcript = f.read()
 
-        # Split into smaller, overlapping chunks for better offline summarization
-        splitter = RecursiveCharacterTextSplitter(chunk_size=512, chunk_overlap=100)
-        chunks = splitter.split_text(transcript)
+    chunks = split_transcript_offline(transcript, load_segments(transcript_path, transcript))
+    if not chunks:
+        print("No usable chunks found.")
+        return
 
-        if not chunks:
-            print("No usable chunks found.")
-            return None
+    options = {"batch_size": batch_size, "use_cache": use_cache, "stats": stats}
+    seen_sections = set()
+    near_duplicates = NearDuplicateFilter(dedup_similarity, stats)
+
+    for group_start in range(0, len(chunks), batch_size):
+        group = near_duplicates.filter(enumerate(chunks[group_start:group_start + batch_size], start=group_start))
+        if not group:
+            continue
+        group_end = min(group_start + batch_size, len(chunks))
+        print(f"[Offline] Processing chunks {group_start + 1}-{group_end}/{len(chunks)}...")
+        sections = structure_chunks_offline([chunk for _, chunk in group], single_pass=single_pass, **options)
 
-        structured_data = []
-        seen_sections = set()
-
-        for idx, chunk in enumerate(chunks):
-            # Skip empty or very short chunks
-            if len(chunk.strip().split()) < 20:
-                continue
-
-            print(f"[Offline] Processing chunk {idx + 1}/{len(chunks)}...")
-
-            # Stronger, more directive prompts
-            title_prompt = (
-                "Write a clear, academic-style TITLE (max 10 words) for this lecture text:\n\n"
-                f"{chunk}\n\nTITLE:"
-            )
-            summary_prompt = (
-                "Write a CONCISE summary (2-3 sentences, avoid repeating phrases):\n\n"
-                f"{chunk}\n\nSUMMARY:"
-            )
-            key_points_prompt = (
-                "List 3-5 clear bullet-point KEY POINTS (short phrases):\n\n"
-                f"{chunk}\n\nKEY POINTS:"
-            )
-
-            title = generate_offline(title_prompt)
-            summary = generate_offline(summary_prompt)
-            key_points = generate_offline(key_points_prompt)
-
-            # Deduplicate sections
-            unique_signature = (title.lower(), summary.lower())
-            if unique_signature in seen_sections:
-                continue
-            seen_sections.add(unique_signature)
-
-            # Append structured section
-            section = {
-                "title": title,
-                "summary": summary,
-                "key_points": key_points
-            }
-            structured_data.append(section)
+        # Deduplicate sections
+        ordered = [(idx, sections[chunk]) for idx, chunk in group]
+        for idx, section in dedup_sections(ordered, seen_sections):
+            yield idx, len(chunks), section
+
+    if near_duplicates.kept_indexes and len(near_duplicates.kept_indexes) < len(chunks):
+        print(f"[Offline] Skipped {len(chunks) - len(near_duplicates.kept_indexes)} near-duplicate chunks "
+              f"of {len(chunks)}")
+
+    print(f"LLM cache: {get_llm_cache().stats()}")
+
+def process_transcript_offline(**kwargs):
+    """
+    Structure the whole transcript at once (see `iter_process_transcript_offline` for the options).
+    """
+    try:
+        structured_data = [section for _, _, section in iter_process_transcript_offline(**kwargs)]
 
         if not structured_data:
             print("Structured info generation resulted in no usable sections.")
@@ -0,0 +1,117 @@
+import re
+import json
+
+SECTION_FIELDS = ("title", "summary", "key_points")
+
+# Single-pass prompts asking for all fields of a section at once
+COMBINED_TEMPLATE = (
+    "Read the following lecture text and answer with a JSON object with the keys "
+    "\"title\" (a concise title), \"summary\" (a short summary) and "
+    "\"key_points\" (a list of the key points).\n\n{text}\n\nJSON:"
+)
+COMBINED_TEMPLATE_NO_KEY_POINTS = (
+    "Read the following lecture text and answer with a JSON object with the keys "
+    "\"title\" (a concise title) and \"summary\" (a short summary).\n\n{text}\n\nJSON:"
+)
+# Flan-T5's SentencePiece vocabulary has no "{" or "}", so it can't write JSON; the offline model
+# is asked for labeled plain text instead. The prompt ends with the first label, which the answer
+# continues (see OFFLINE_ANSWER_PREFIX).
+COMBINED_TEMPLATE_OFFLINE = (
+    "Read this lecture text and write a clear academic title (max 10 words), a concise summary "
+    "(2-3 sentences) and 3-5 short key points, in the form \"Title: ... Summary: ... Key points: ...\"."
+    "\n\n{chunk}\n\nTitle:"
+)
+OFFLINE_ANSWER_PREFIX = "Title:"
+
+LABEL_PATTERN = re.compile(r"(title|summary|key[ _-]?points)\s*[:=]", re.IGNORECASE)
+
+
+def _format_key_points(key_points):
+    if isinstance(key_points, list):
+        return "\n".join(f"- {str(point).strip().lstrip('-• ').strip()}" for point in key_points if str(point).strip())
+    return str(key_points).strip()
+
+
+def _repair_json(text):
+    """
+    Fix the most common ways models break JSON: code fences, text around the object,
+    smart or single quotes, trailing commas and a missing closing brace.
+    """
+    text = text.strip()
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    text = text.replace("“", '"').replace("”", '"').replace("’", "'")
+
+    start = text.find("{")
+    if start == -1:
+        return None
+    end = text.rfind("}")
+    text = text[start:end + 1] if end > start else text[start:] + "}"
+
+    if '"' not in text:
+        text = text.replace("'", '"')
+    text = re.sub(r",\s*([}\]])", r"\1", text)
+    return text
+
+
+def _parse_labeled(text):
+    """
+    Parse "Title: ... Summary: ... Key points: ..." style answers.
+    """
+    matches = list(LABEL_PATTERN.finditer(text))
+    if not matches:
+        return None
+    fields = {}
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        label = match.group(1).lower()
+        label = "key_points" if label.startswith("key") else label
+        value = text[match.end():next_match.start() if next_match else len(text)]
+        fields[label] = value.strip().strip(",").strip().strip('"').strip()
+    return fields
+
+
+def parse_labeled_fields(text):
+    """
+    Return the non-empty section fields found in a labeled plain-text answer (possibly none).
+    """
+    fields = _parse_labeled(text) or {}
+    return {field: fields[field] for field in SECTION_FIELDS if fields.get(field)}
+
+
+def parse_section_output(text, with_key_points=True):
+    """
+    Turn a single-pass model answer into a section dictionary.
+
+    Strict JSON is tried first, then a repaired version, then labeled plain text.
+    Returns None if the required fields can't be recovered, so the caller can fall back
+    to one call per field.
+    """
+    fields = None
+    repaired = _repair_json(text)
+    for candidate in (text, repaired):
+        if not candidate:
+            continue
+        try:
+            parsed = json.loads(candidate)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        if isinstance(parsed, dict):
+            fields = {str(key).lower().replace(" ", "_").replace("-", "_"): value for key, value in parsed.items()}
+            fields = {("key_points" if key == "keypoints" else key): value for key, value in fields.items()}
+            break
+    if fields is None:
+        fields = _parse_labeled(text)
+    if fields is None:
+        return None
+
+    required = SECTION_FIELDS if with_key_points else SECTION_FIELDS[:2]
+    section = {}
+    for field in required:
+        value = fields.get(field)
+        if field == "key_points":
+            value = _format_key_points(value) if value else ""
+        elif not isinstance(value, str):
+            value = str(value) if value else ""
+        if not value.strip():
+            return None
+        section[field] = value.strip()
+    return section
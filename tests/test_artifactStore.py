@@ -0,0 +1,63 @@
+import os
+import time
+import tempfile
+import unittest
+import threading
+
+from artifactStore import ArtifactStore
+
+
+class ArtifactStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ArtifactStore(os.path.join(self.tmp.name, "store"))
+        transcript_path = os.path.join(self.tmp.name, "lecture.txt")
+        with open(transcript_path, "w") as f:
+            f.write("A lecture about cloud computing.")
+        self.lecture_id = self.store.add_transcript(transcript_path).id
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_workspaces_of_one_lecture_keep_each_others_artifacts(self):
+        structure = self.store.workspace(self.lecture_id)
+        articles = self.store.workspace(self.lecture_id)
+        structure.write_json("sections_online", [{"title": "Cloud"}], ["transcript"])
+        articles.write_json("articles", [{"title": "Paper"}], ["transcript"])
+
+        workspace = self.store.workspace(self.lecture_id)
+        self.assertEqual(sorted(workspace.manifest["artifacts"]), ["articles", "sections_online", "transcript"])
+        self.assertTrue(workspace.is_fresh("sections_online", ["transcript"]))
+        self.assertTrue(workspace.is_fresh("articles", ["transcript"]))
+
+    def test_concurrent_produce_records_every_artifact(self):
+        names = ["sections_online", "sections_offline", "articles", "topics_online"]
+
+        def produce(name):
+            def build(path):
+                time.sleep(0.05)
+                with open(path, "w") as f:
+                    f.write(name)
+            self.store.workspace(self.lecture_id).produce(name, build, inputs=["transcript"])
+
+        threads = [threading.Thread(target=produce, args=(name,)) for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        workspace = self.store.workspace(self.lecture_id)
+        for name in names:
+            self.assertTrue(workspace.is_fresh(name, ["transcript"]), name)
+        self.assertTrue(workspace.produce(names[0], lambda path: self.fail("rebuilt"), inputs=["transcript"])[1])
+
+    def test_gc_keeps_recently_used_workspaces(self):
+        self.assertEqual(self.store.gc(quota_mb=0), [])
+        self.store.workspace(self.lecture_id).update(lambda manifest: manifest.update(last_used=0))
+        self.assertEqual(self.store.gc(quota_mb=0), [self.lecture_id])
+        self.assertIsNone(self.store.workspace(self.lecture_id))
+
+
+if __name__ == "__main__":
+    unittest.main()
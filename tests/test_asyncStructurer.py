@@ -0,0 +1,124 @@
+import time
+import asyncio
+import unittest
+
+import llmStubs
+from asyncStructurer import iter_requests, iter_structure_chunks
+
+
+class Tracker:
+    """
+    Fake async LLM call recording how many calls run at once and when they start.
+    """
+
+    def __init__(self, latency=0.02, answer=lambda request: f"answer {request}"):
+        self.latency = latency
+        self.answer = answer
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started = []
+        self.finished = 0
+
+    async def __call__(self, request):
+        self.started.append(time.monotonic())
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        self.finished += 1
+        return self.answer(request)
+
+
+CHAINS = {
+    "title": "Title: {chunk}",
+    "summary": "Summary: {chunk}",
+    "key_points": "Key points: {chunk}",
+    "combined": "JSON (title, summary): {chunk}",
+    "combined_key_points": "JSON (title, summary, \"key_points\"): {chunk}",
+}
+
+
+class IterRequestsTest(unittest.TestCase):
+
+    def test_results_in_order_within_concurrency_limit(self):
+        tracker = Tracker()
+        results = list(iter_requests(range(12), tracker, concurrency=3))
+        self.assertEqual(results, [(i, f"answer {i}") for i in range(12)])
+        self.assertEqual(tracker.max_in_flight, 3)
+
+    def test_requests_per_second(self):
+        tracker = Tracker(latency=0)
+        start = time.monotonic()
+        list(iter_requests(range(15), tracker, concurrency=15, requests_per_second=10))
+        # A burst of 10, then one request every 0.1s
+        self.assertGreaterEqual(time.monotonic() - start, 0.4)
+
+    def test_retries_failed_calls(self):
+        failures = {"left": 2}
+
+        async def flaky(request):
+            if failures["left"]:
+                failures["left"] -= 1
+                raise RuntimeError("rate limited")
+            return request
+
+        self.assertEqual(list(iter_requests(["a"], flaky, retries=3, backoff=0.01)), [(0, "a")])
+
+    def test_gives_up_after_retries(self):
+        async def failing(request):
+            raise RuntimeError("down")
+
+        with self.assertRaises(RuntimeError):
+            list(iter_requests(["a"], failing, retries=1, backoff=0.01))
+
+    def test_closing_cancels_pending_requests(self):
+        tracker = Tracker(latency=0.05)
+        results = iter_requests(range(20), tracker, concurrency=2)
+        self.assertEqual(next(results), (0, "answer 0"))
+        results.close()
+        finished = tracker.finished
+        time.sleep(0.2)
+        self.assertEqual(tracker.finished, finished)
+        self.assertLess(len(tracker.started), 20)
+
+
+class IterStructureChunksTest(unittest.TestCase):
+
+    def test_single_pass_fallbacks_respect_limits(self):
+        # Unparseable answers make every chunk fall back to three per-field calls
+        tracker = Tracker(latency=0.02, answer=lambda request: "no json here")
+
+        async def run_chain(chain, chunk):
+            return await tracker((chain, chunk))
+
+        stats = {}
+        chunks = [f"chunk {i}" for i in range(6)]
+        start = time.monotonic()
+        sections = list(iter_structure_chunks(chunks, CHAINS, set(range(6)), run_chain, single_pass=True,
+                                              concurrency=2, requests_per_second=12, stats=stats))
+        elapsed = time.monotonic() - start
+
+        self.assertEqual([idx for idx, _ in sections], list(range(6)))
+        self.assertEqual(stats["fallbacks"], 6)
+        self.assertEqual(len(tracker.started), 6 * 4)
+        self.assertLessEqual(tracker.max_in_flight, 2)
+        # 24 calls at 12 per second after a burst of 12
+        self.assertGreaterEqual(elapsed, 0.9)
+
+    @unittest.skipUnless(llmStubs.LLM is not None, "LangChain is not installed")
+    def test_single_pass_with_stub_llm(self):
+        llm = llmStubs.StubLLM(latency=0.01)
+
+        async def run_chain(chain, chunk):
+            return await llm._acall(chain.format(chunk=chunk))
+
+        chunks = [f"The lecture part {i} explains cloud computing." for i in range(5)]
+        sections = list(iter_structure_chunks(chunks, CHAINS, {1, 3}, run_chain, single_pass=True, concurrency=2))
+        self.assertEqual(llm.calls, 5)
+        self.assertEqual([("key_points" in section) for _, section in sections], [False, True, False, True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
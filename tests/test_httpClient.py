@@ -0,0 +1,75 @@
+import os
+import time
+import tempfile
+import unittest
+
+from llmStubs import MockSerpServer
+from httpClient import HttpClient, ResponseCache, merge_results, serp_search
+
+
+class HttpClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = MockSerpServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def client(self, ttl_hours=1, retries=2):
+        cache = ResponseCache(os.path.join(self.tmp.name, "cache.sqlite"), ttl_hours=ttl_hours)
+        return HttpClient(cache=cache, retries=retries)
+
+    def test_repeated_search_is_answered_from_cache(self):
+        client = self.client()
+        first = serp_search(["cloud computing"], "key", client=client, url=self.server.url)
+        second = serp_search(["cloud computing"], "other key", client=client, url=self.server.url)
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(client.cache.stats()["hits"], 1)
+
+    def test_expired_responses_are_fetched_again(self):
+        client = self.client(ttl_hours=0.2 / 3600)
+        serp_search(["cloud computing"], "key", client=client, url=self.server.url)
+        time.sleep(0.3)
+        serp_search(["cloud computing"], "key", client=client, url=self.server.url)
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(client.cache.stats()["misses"], 2)
+
+    def test_server_errors_are_retried(self):
+        self.server.failures = 1
+        results = serp_search(["virtualization"], "key", client=self.client(), url=self.server.url)
+        self.assertEqual(len(results[0]), 5)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_failed_search_returns_no_results(self):
+        self.server.failures = 10
+        results = serp_search(["virtualization", "elasticity"], "key", client=self.client(retries=1),
+                              url=self.server.url)
+        self.assertEqual(results, [[], []])
+
+    def test_get_many_keeps_request_order(self):
+        queries = [f"query {i}" for i in range(8)]
+        responses = self.client().get_many(self.server.url, [{"q": query, "num": 3} for query in queries])
+        self.assertEqual([data["search_parameters"]["q"] for data, _ in responses], queries)
+        self.assertTrue(all(error is None for _, error in responses))
+
+    def test_repeated_queries_are_sent_once(self):
+        results = serp_search(["cloud", "storage", "cloud"], "key", client=self.client(), url=self.server.url)
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(results[0], results[2])
+
+    def test_merge_results_drops_duplicates_round_robin(self):
+        results = serp_search(["cloud", "storage"], "key", client=self.client(), url=self.server.url)
+        merged = merge_results(results)
+        links = [result["link"] for result in merged]
+        self.assertEqual(len(links), len(set(links)))
+        # Both searches share their first two results, so 2 shared + 3 specific per query remain
+        self.assertEqual(len(merged), 8)
+        self.assertEqual(links[:2], ["https://example.org/shared/0", "https://example.org/shared/1"])
+        self.assertEqual(len(merge_results(results, limit=3)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
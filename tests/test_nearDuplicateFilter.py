@@ -0,0 +1,42 @@
+import unittest
+
+from structuredInfoOff import NearDuplicateFilter
+
+
+def embed_documents(chunks):
+    # Chunks "topic <n> ..." point along axis n, so chunks of the same topic are duplicates
+    vectors = []
+    for chunk in chunks:
+        vector = [0.0] * 40
+        vector[int(chunk.split()[1])] = 1.0
+        vectors.append(vector)
+    return vectors
+
+
+class NearDuplicateFilterTest(unittest.TestCase):
+
+    def test_skips_chunks_similar_to_kept_ones_across_calls(self):
+        stats = {}
+        near_duplicates = NearDuplicateFilter(0.9, stats, embed_documents=embed_documents)
+        first = near_duplicates.filter(enumerate(["topic 1 a", "topic 2 b", "topic 1 c"]))
+        second = near_duplicates.filter(enumerate(["topic 2 d", "topic 3 e"], start=3))
+
+        self.assertEqual(first, [(0, "topic 1 a"), (1, "topic 2 b")])
+        self.assertEqual(second, [(4, "topic 3 e")])
+        self.assertEqual([(d["chunk"], d["similar_to"]) for d in stats["near_duplicates"]], [(2, 0), (3, 1)])
+
+    def test_kept_vectors_grow_past_the_initial_capacity(self):
+        near_duplicates = NearDuplicateFilter(0.9, embed_documents=embed_documents)
+        chunks = [(i, f"topic {i} text") for i in range(40)]
+        self.assertEqual(near_duplicates.filter(chunks[:20]), chunks[:20])
+        self.assertEqual(near_duplicates.filter(chunks[20:] + [(40, "topic 17 again")]), chunks[20:])
+        self.assertEqual(len(near_duplicates.kept_indexes), 40)
+        self.assertGreaterEqual(len(near_duplicates.kept), 40)
+
+    def test_disabled_without_threshold(self):
+        chunks = [(0, "topic 1 a"), (1, "topic 1 a")]
+        self.assertEqual(NearDuplicateFilter(0, embed_documents=embed_documents).filter(chunks), chunks)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from historyStore import HistoryStore
+from semanticCache import SemanticCache
+
+
+def embed(question):
+    # One dimension per known word, enough to tell the test questions apart
+    words = ["cloud", "storage", "network", "virtualization"]
+    return [float(word in question.lower()) for word in words] + [0.1]
+
+
+class SemanticCacheWarmTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.history = HistoryStore(os.path.join(self.tmp.name, "history.sqlite"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_warms_from_standalone_lecture_answers_only(self):
+        self.history.append("What is cloud storage?", "Storage on servers.", lecture="a", standalone=True)
+        self.history.append("And the network?", "It depends.", lecture="a", standalone=False)
+        self.history.append("What is virtualization?", "Many machines on one.", standalone=True)
+
+        embedded = []
+        cache = SemanticCache(embed, embed_documents=lambda questions: embedded.extend(questions) or
+                              [embed(question) for question in questions])
+        self.assertEqual(cache.warm_from_history(self.history), 1)
+        self.assertEqual(embedded, ["What is cloud storage?"])
+        self.assertEqual(cache.lookup("a", "what is cloud storage")[0], "Storage on servers.")
+        self.assertIsNone(cache.lookup("a", "And the network?")[0])
+        self.assertIsNone(cache.lookup("b", "What is cloud storage?")[0])
+
+    def test_old_stores_get_the_standalone_column(self):
+        path = os.path.join(self.tmp.name, "old.sqlite")
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE qa (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, lecture TEXT, "
+                         "question TEXT NOT NULL, answer TEXT NOT NULL, created_at REAL NOT NULL)")
+            conn.execute("INSERT INTO qa (lecture, question, answer, created_at) VALUES ('a', 'q', 'a', 0)")
+        store = HistoryStore(path)
+        store.append("What is cloud storage?", "Storage on servers.", lecture="a", standalone=True)
+        self.assertEqual([row["question"] for row in store.standalone_answers()], ["What is cloud storage?"])
+        self.assertEqual(store.count(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+
+from modelRegistry import get_whisper_model, get_faster_whisper_model
+
+# Transcription engine: "whisper" (openai-whisper, PyTorch fp32) or "faster-whisper" (CTranslate2)
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "whisper")
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")
+# CTranslate2 compute type of faster-whisper, int8 is the fastest on CPU
+FASTER_WHISPER_COMPUTE_TYPE = os.getenv("FASTER_WHISPER_COMPUTE_TYPE", "int8")
+# Skip silences longer than this with voice-activity detection before decoding (faster-whisper only)
+VAD_FILTER = os.getenv("TRANSCRIPTION_VAD", "1") == "1"
+VAD_MIN_SILENCE_MS = int(os.getenv("TRANSCRIPTION_VAD_MIN_SILENCE_MS", "1000"))
+
+
+def load_audio(file_path):
+    """
+    Decode an audio file into 16 kHz mono float32 samples, with whichever decoder is installed.
+    """
+    try:
+        import whisper
+        return whisper.load_audio(file_path)
+    except ImportError:
+        from faster_whisper import decode_audio
+        return decode_audio(file_path)
+
+
+class WhisperBackend:
+    """
+    openai-whisper running in PyTorch. This is the reference engine the others are compared with.
+    """
+
+    name = "whisper"
+
+    def __init__(self, model_size=WHISPER_MODEL_SIZE):
+        self.model_size = model_size
+
+    def transcribe(self, audio):
+        """
+        Transcribe a file path or an array of 16 kHz samples.
+        Returns a dict with the `text` and a list of `segments` (start, end, text).
+        """
+        result = get_whisper_model(self.model_size).transcribe(audio)
+        return {"text": result["text"], "segments": result.get("segments", [])}
+
+
+class FasterWhisperBackend:
+    """
+    faster-whisper (CTranslate2) with int8 CPU decoding and Silero voice-activity detection,
+    so long silences are dropped before they reach the decoder.
+    """
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size=WHISPER_MODEL_SIZE, compute_type=FASTER_WHISPER_COMPUTE_TYPE,
+                 vad_filter=VAD_FILTER, min_silence_ms=VAD_MIN_SILENCE_MS):
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.vad_filter = vad_filter
+        self.min_silence_ms = min_silence_ms
+
+    def transcribe(self, audio):
+        model = get_faster_whisper_model(self.model_size, self.compute_type)
+        segments, _ = model.transcribe(
+            audio,
+            vad_filter=self.vad_filter,
+            vad_parameters={"min_silence_duration_ms": self.min_silence_ms},
+        )
+        # Segments are decoded lazily while the generator is consumed
+        segments = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+        return {"text": "".join(segment["text"] for segment in segments), "segments": segments}
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def get_transcription_backend(name=None, model_size=None, **options):
+    """
+    Return a transcription backend by name (default TRANSCRIPTION_BACKEND) and model size
+    (default WHISPER_MODEL_SIZE). Extra options go to the backend class.
+    """
+    name = name or TRANSCRIPTION_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend {name!r}, expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](model_size or WHISPER_MODEL_SIZE, **options)